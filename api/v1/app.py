@@ -3,10 +3,11 @@
 Create flask app register blueprint app_views with flask instance 'app'
 """
 from os import getenv
-from flask import Flask, jsonify
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from models import storage
-from api.v1.views import app_views
+from api.v1.cache import cache
+from api.v1.views import app_views, negotiate
 
 app = Flask(__name__)
 # Enable CORS
@@ -14,7 +15,60 @@ CORS(app, resources={r'/api/v1/*': {'origins': '0.0.0.0'}})
 
 # Register the app_views blueprint
 app.register_blueprint(app_views)
-app.url.strict_slashes = False
+app.url_map.strict_slashes = False
+# Drop the cached responses built from objects as they change
+storage.on_change(cache.on_change)
+
+# Key of the cached response of a request, its path and representation
+def cache_key():
+    """
+    Returns the key of the response to the current request in the cache
+    """
+    return (request.full_path,) + negotiate()
+
+# Serve GET requests from the response cache
+@app.before_request
+def cached_response():
+    """
+    Returns the cached response of a GET request, if any
+    """
+    if request.method != 'GET' or not cache.size:
+        return None
+    g.cache_generation = cache.generation
+    hit = cache.get(cache_key())
+    if hit is None:
+        return None
+    g.cache_hit = True
+    body, status, headers = hit
+    response = Response(body, status, headers)
+    response.headers['X-Cache'] = 'HIT'
+    # Reply 304 if the client has the version that was cached
+    return response.make_conditional(request)
+
+# Cache the responses of GET requests which named their objects
+@app.after_request
+def cache_response(response):
+    """
+    Stores the response of a GET request whose view called depends_on()
+    """
+    if (request.method == 'GET' and response.status_code == 200 and
+            'cache_generation' in g and not g.get('cache_hit')):
+        # Views name the objects of a body as they encode it
+        tags = g.setdefault('cache_tags', set())
+        headers = [(name, value) for name, value in response.headers
+                   if name not in ('Content-Length', 'Set-Cookie')]
+        if response.is_streamed:
+            # Cache a streamed body once sent, if it is small enough
+            response.response = cache.tee(
+                response.response, cache_key(), response.status_code,
+                headers, tags, g.cache_generation)
+        elif tags:
+            cache.put(cache_key(), (response.get_data(),
+                                    response.status_code, headers),
+                      frozenset(tags), g.cache_generation)
+        if tags or response.is_streamed:
+            response.headers['X-Cache'] = 'MISS'
+    return response
 
 # Teardown function to close SQLAlchemy session
 @app.teardown_appcontext
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+"""
+In-process cache of the GET responses of the API
+
+A view makes its response cacheable by naming the objects it was built
+from with depends_on():
+
+    ("State",)                  any State, for the list of all states
+    ("State", id)               the State with that id
+    ("City", "state_id", id)    the cities whose state_id is id
+
+jsonify_list() names each object it encodes. The cache is registered
+with storage.on_change() and drops the responses depending on each object
+stored, updated or deleted. Changes made by other processes are only
+seen once an entry expires, after HBNB_API_CACHE_TTL seconds when set.
+"""
+from collections import OrderedDict
+from flask import g, has_request_context
+from os import getenv
+from threading import Lock
+from time import monotonic
+from werkzeug.wsgi import ClosingIterator
+
+
+def depends_on(*tags):
+    """
+    Declares that the response of the current request is built from the
+    objects named by tags, making it cacheable until one of them changes
+    """
+    if cache.size and has_request_context():
+        g.setdefault("cache_tags", set()).update(tags)
+
+
+def uncacheable():
+    """
+    Declares that the response of the current request must not be cached
+    """
+    depends_on(None)
+
+
+class ResponseCache:
+    """LRU cache of responses by request path, with an optional time to
+    live, whose entries are dropped by tag"""
+
+    def __init__(self, size=1024, ttl=None, max_bytes=1 << 20):
+        """Instantiate a cache of at most size responses kept at most ttl
+        seconds, or until dropped when ttl is None; streamed responses
+        larger than max_bytes are not kept"""
+        self.size = size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # OrderedDict - (expiry, response, tags) by path, oldest used first
+        self.entries = OrderedDict()
+        # dictionary - set of the paths of the entries by tag
+        self.tagged = {}
+        # integer - number of invalidations so far, to discard responses
+        # built while one happened
+        self.generation = 0
+        self.lock = Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, path):
+        """returns the response cached for path, or None"""
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and self.ttl and entry[0] < monotonic():
+                self._drop(path)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, path, response, tags, generation):
+        """caches response for path until one of tags is invalidated,
+        unless an invalidation happened since generation or tags holds
+        None, set by uncacheable()"""
+        if not self.size or None in tags:
+            return
+        expiry = monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            if generation != self.generation:
+                return
+            if path in self.entries:
+                self._drop(path)
+            self.entries[path] = (expiry, response, tags)
+            for tag in tags:
+                self.tagged.setdefault(tag, set()).add(path)
+            while len(self.entries) > self.size:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def tee(self, chunks, path, status, headers, tags, generation):
+        """returns an iterator over the chunks of a streamed response body
+        which then caches the response for path as put() does, if the
+        body holds at most max_bytes; tags is the set the view adds to as
+        it streams; closing the iterator closes chunks"""
+        close = getattr(chunks, "close", None)
+        return ClosingIterator(self._tee(chunks, path, status, headers,
+                                         tags, generation),
+                               [close] if close else None)
+
+    def _tee(self, chunks, path, status, headers, tags, generation):
+        """yields chunks, then caches them as the body of the response
+        for path if they hold at most max_bytes"""
+        body, size = [], 0
+        for chunk in chunks:
+            if body is not None:
+                size += len(chunk)
+                if size <= self.max_bytes:
+                    body.append(chunk)
+                else:
+                    body = None
+            yield chunk
+        if body is not None and tags:
+            self.put(path, (b"".join(body), status, headers),
+                     frozenset(tags), generation)
+
+    def _drop(self, path):
+        """removes the entry of path"""
+        expiry, response, tags = self.entries.pop(path)
+        for tag in tags:
+            paths = self.tagged.get(tag)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self.tagged[tag]
+
+    def invalidate(self, tags):
+        """drops the entries depending on any of tags"""
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                for path in list(self.tagged.get(tag, ())):
+                    self._drop(path)
+                    self.invalidations += 1
+
+    def on_change(self, name, id, related):
+        """storage listener: drops the entries depending on the object of
+        class name with that id, on its class or on its parents"""
+        tags = [(name,), (name, id)]
+        tags += [(name, field, value) for field, value in related]
+        self.invalidate(tags)
+
+    def clear(self):
+        """drops all the entries"""
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.tagged.clear()
+
+    def stats(self):
+        """returns the counters of the cache"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self.entries), "max_size": self.size,
+                    "ttl": self.ttl, "hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions,
+                    "invalidations": self.invalidations}
+
+
+# responses cached by the API, up to HBNB_API_CACHE_SIZE (0 disables it)
+cache = ResponseCache(int(getenv("HBNB_API_CACHE_SIZE", 1024)),
+                      float(getenv("HBNB_API_CACHE_TTL", 0)) or None,
+                      int(getenv("HBNB_API_CACHE_MAX_BYTES", 1 << 20)))
@@ -3,9 +3,254 @@
 Create blueprint instance with url prefix set to '/api/v1'
 """
 
-from flask import Blueprint
+from api.v1.cache import cache, depends_on, uncacheable
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timezone
+from flask import Blueprint, Response, abort, current_app, g, request
+from flask import stream_with_context, url_for
+from flask.json.provider import DefaultJSONProvider
+from hashlib import sha1
+import json
+from models import storage
+import zlib
 
 app_views = Blueprint('app_views', __name__, url_prefix='/api/v1')
+# objects per page when ?after= is given without ?limit=, and at most
+page_size = 100
+max_page_size = 1000
+# characters of encoded objects gathered into each chunk of a stream
+chunk_size = 16384
+# zlib window bits of the content codings of streamed collections
+encodings = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+
+def json_encoder():
+    """
+    Returns the function encoding one value to JSON as the app does, a
+    reused JSONEncoder unless the app has its own JSON provider
+    """
+    provider = current_app.json
+    if type(provider) is not DefaultJSONProvider:
+        return provider.dumps
+    return json.JSONEncoder(default=provider.default,
+                            ensure_ascii=provider.ensure_ascii,
+                            sort_keys=provider.sort_keys).encode
+
+
+def negotiate():
+    """
+    Returns the mimetype, application/json or application/x-ndjson, and
+    the content coding, gzip, deflate or None, of a collection sent for
+    the Accept and Accept-Encoding headers of the current request
+    """
+    mimetype = "application/json"
+    accept = request.accept_mimetypes
+    if accept and accept.best_match(["application/json",
+                                     "application/x-ndjson"]) \
+            == "application/x-ndjson":
+        mimetype = "application/x-ndjson"
+    accept = request.accept_encodings
+    encoding = accept.best_match(list(encodings)) if accept else None
+    return mimetype, encoding
+
+
+def jsonify_list(objects, to_dict=None):
+    """
+    Returns a response streaming the to_dict() of objects, or what the
+    to_dict function given returns for each, as a JSON list, or as one
+    JSON object per line if the client accepts NDJSON, encoded one object
+    at a time and sent in chunks compressed on the fly with the gzip or
+    deflate coding the client accepts
+    """
+    mimetype, encoding = negotiate()
+
+    def encoded():
+        """Yields the JSON of each object, naming the objects for the
+        response cache until the body is too large to be cached"""
+        dumps = json_encoder()
+        budget = cache.max_bytes if cache.size else 0
+        for obj in objects:
+            text = dumps(obj.to_dict() if to_dict is None else to_dict(obj))
+            if budget > 0:
+                budget -= len(text)
+                depends_on((obj.__class__.__name__, obj.id))
+                if budget <= 0:
+                    uncacheable()
+            yield text
+
+    def generate():
+        """Yields the JSON list piece by piece"""
+        if mimetype == "application/x-ndjson":
+            for text in encoded():
+                yield text + "\n"
+            return
+        separator = "["
+        for text in encoded():
+            yield separator + text
+            separator = ","
+        yield "[]\n" if separator == "[" else "]\n"
+
+    def chunks():
+        """Yields the pieces gathered into chunks of about chunk_size
+        characters, each compressed and flushed if a coding was chosen"""
+        compressor = None
+        if encoding is not None:
+            compressor = zlib.compressobj(6, zlib.DEFLATED,
+                                          encodings[encoding])
+        pieces, size = [], 0
+        for piece in generate():
+            pieces.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                data = "".join(pieces).encode()
+                pieces, size = [], 0
+                if compressor is None:
+                    yield data
+                else:
+                    yield (compressor.compress(data) +
+                           compressor.flush(zlib.Z_SYNC_FLUSH))
+        data = "".join(pieces).encode()
+        if compressor is None:
+            yield data
+        else:
+            yield compressor.compress(data) + compressor.flush()
+
+    response = Response(stream_with_context(chunks()), mimetype=mimetype)
+    response.vary.update(("Accept", "Accept-Encoding"))
+    if encoding is not None:
+        response.content_encoding = encoding
+    return response
+
+
+def paged():
+    """
+    Tells whether the request asks for one page of a collection, with
+    ?limit= or ?after=
+    """
+    return "limit" in request.args or "after" in request.args
+
+
+def encode_cursor(obj):
+    """
+    Returns the opaque cursor of the page following obj
+    """
+    value = json.dumps([obj.created_at.isoformat(), obj.id])
+    return urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (created_at, id) of an opaque cursor, aborts with 400 if
+    it is not one; created_at is naive UTC, as the objects store it
+    """
+    try:
+        value = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(value)
+        created_at = datetime.fromisoformat(created_at)
+        if created_at.tzinfo is not None:
+            raise ValueError("cursor with a UTC offset")
+        return (created_at, str(id))
+    except (TypeError, ValueError):
+        abort(400, description="Invalid cursor")
+
+
+def limit_arg():
+    """
+    Returns the ?limit= of the request, page_size if not given, aborts
+    with 400 if it is not a number from 1 to max_page_size
+    """
+    try:
+        limit = int(request.args.get("limit", page_size))
+    except ValueError:
+        abort(400, description="Invalid limit")
+    if not 0 < limit <= max_page_size:
+        abort(400, description="Invalid limit")
+    return limit
+
+
+def jsonify_page(query):
+    """
+    Returns the response of the page of query selected by ?limit= and
+    ?after=, in (created_at, id) order; when more objects follow, the
+    cursor of the next page is given in the X-Next-Cursor header and its
+    URL in the Link header
+    """
+    limit = limit_arg()
+    after = request.args.get("after")
+    cursor = decode_cursor(after) if after else None
+    name = query.cls if isinstance(query.cls, str) else query.cls.__name__
+    depends_on(*[(name, field, value) for field, op, value
+                 in query.conditions if op == "eq"] or [(name,)])
+    objs = query.after(cursor).limit(limit + 1).all()
+    response = jsonify_list(objs[:limit])
+    if len(objs) > limit:
+        following = encode_cursor(objs[limit - 1])
+        args = dict(request.view_args, limit=limit, after=following)
+        response.headers["X-Next-Cursor"] = following
+        response.headers["Link"] = '<{}>; rel="next"'.format(
+            url_for(request.endpoint, _external=True, **args))
+    return response
+
+
+def unchanged(etag, last_modified):
+    """
+    Sets the ETag and Last-Modified (a naive UTC datetime) of the
+    response of the current request; returns a 304 response if the copy
+    of the client, named by If-None-Match or else If-Modified-Since, is
+    current, else None
+    """
+    last_modified = last_modified.replace(microsecond=0,
+                                          tzinfo=timezone.utc)
+    g.validators = (etag, last_modified)
+    if request.if_none_match:
+        current = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        current = since is not None and last_modified <= since
+    if not current:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+def unchanged_object(obj):
+    """
+    Returns a 304 response if the client has the current version of obj,
+    told by its updated_at, else None
+    """
+    key = "{}.{}@{}".format(obj.__class__.__name__, obj.id,
+                            obj.updated_at.isoformat())
+    return unchanged(sha1(key.encode()).hexdigest()[:20], obj.updated_at)
+
+
+def unchanged_collection(*tags):
+    """
+    Returns a 304 response if the client has the current version of the
+    collections named by tags, as counted by storage.versions(), else
+    None
+    """
+    versions = storage.versions()
+    # the representations sent for other Accept headers get other ETags
+    mimetype, encoding = negotiate()
+    variant = "".join("-" + name for name in (mimetype[12:], encoding)
+                      if name not in ("json", None))
+    return unchanged(versions.version(*tags) + variant,
+                     versions.modified(*tags))
+
+
+@app_views.after_request
+def set_validators(response):
+    """
+    Adds the ETag and Last-Modified set by unchanged() to a 200 response
+    """
+    validators = g.get("validators")
+    if validators is not None and response.status_code == 200:
+        response.set_etag(validators[0])
+        response.last_modified = validators[1]
+    return response
+
 
 from api.v1.views.index import *
 from api.v1.views.states import *
@@ -13,5 +258,5 @@ from api.v1.views.cities import *
 from api.v1.views.amenities import *
 from api.v1.views.users import *
 from api.v1.views.places import *
-from api.v1.views.places-reviews import *
-from api.v1.views.places-amenities import *
+from api.v1.views.places_reviews import *
+from api.v1.views.places_amenities import *
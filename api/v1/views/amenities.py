@@ -3,7 +3,9 @@
 Creates a view for amenity object with default restful API actions
 """
 
-from api.v1.views import app_views
+from api.v1.cache import depends_on
+from api.v1.views import app_views, jsonify_list, jsonify_page, paged
+from api.v1.views import unchanged_collection, unchanged_object
 from flask import jsonify, abort, request
 from models.amenity import Amenity
 from models import storage
@@ -12,19 +14,32 @@ from models import storage
 @app_views.route('/amenities', methods=['GET'], strict_slashes=False)
 def get_all_amenities():
     """Get list of all amenity objects"""
-    # Get all amenity objects from storage
-    amenities = storage.all(Amenity).values()
-    # Convert to dict and jsonify
-    return jsonify([amenity.to_dict() for amenity in amenities])
+    # Cache the response until an amenity changes
+    depends_on(('Amenity',))
+    # Reply 304 if the client has the current version of the list
+    not_modified = unchanged_collection(('Amenity',))
+    if not_modified:
+        return not_modified
+    # Return one page, in creation order, when ?limit= or ?after= is given
+    if paged():
+        return jsonify_page(storage.query(Amenity))
+    # Stream the amenity objects from storage, converted to json
+    return jsonify_list(storage.iter(Amenity))
 
 # Route to retrieve specific amenity object by id
 @app_views.route('/amenities/<amenity_id>',
                  methods=['GET'], strict_slashes=False)
 def get_amenity(amenity_id):
     """Get specified amenity object"""
+    # Cache the response until the amenity changes
+    depends_on(('Amenity', amenity_id))
     # Get amenity object with the specified ID from storage
     amenity = storage.get(Amenity, amenity_id)
     if amenity:
+        # Reply 304 if the client has the current version
+        not_modified = unchanged_object(amenity)
+        if not_modified:
+            return not_modified
         # Return amenity object in JSON format
         return jsonify(amenity.to_dict())
     else:
@@ -81,12 +96,13 @@ def update_amenity(amenity_id):
         # Get json data from the request
         data = request.get_json()
         ignore_keys = ['id', 'created_at', 'updated_at']
-        for key, value in data.items():
-            if key not in ignore_keys:
-                setattr(amenity, key, value)
-
-        # Save the updated amenity object to storage
-        amenity.save()
+        # Saved together, or rolled back if any of them fails
+        with storage.batch():
+            for key, value in data.items():
+                if key not in ignore_keys:
+                    setattr(amenity, key, value)
+            # Save the updated amenity object to storage
+            amenity.save()
         # Return the updated amenity object
         return jsonify(amenity.to_dict()), 200
     else:
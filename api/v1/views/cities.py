@@ -5,7 +5,9 @@ Create a new view for city objects
 from flask import abort, jsonify, request
 from models.state import State
 from models.city import City
-from api.v1.views import app_views
+from api.v1.cache import depends_on
+from api.v1.views import app_views, jsonify_list, jsonify_page, paged
+from api.v1.views import unchanged_collection, unchanged_object
 from models import storage
 
 # Route for retrieving all city objects for a specific state
@@ -15,15 +17,21 @@ def get_cities_by_state(state_id):
     """
     Retrieves list of all city objects of a state
     """
-    # Get state with given id from the storage
-    state = storage.get(State, state_id)
-    if not state:
+    # Cache the response until the state or its cities change
+    depends_on(('State', state_id), ('City', 'state_id', state_id))
+    if not storage.get(State, state_id):
         # Return 404 error
         abort(404)
-
-    # Get all city objects associated with the state
-    cities = [city.to_dict() for city in state.cities]
-    return jsonify(cities)
+    # Reply 304 if the client has the current version of the list
+    not_modified = unchanged_collection(('City', 'state_id', state_id))
+    if not_modified:
+        return not_modified
+    if paged():
+        # Return one page of the cities, in creation order
+        return jsonify_page(storage.query(City).filter(state_id=state_id))
+    # Stream the city objects associated with the state
+    state = storage.get(State, state_id, load=["cities"])
+    return jsonify_list(state.cities)
 
 # Retrieving a specific city object by id
 @app_views.route('/cities/<city_id>', methods=['GET'], strict_slashes=False)
@@ -31,9 +39,15 @@ def get_city(city_id):
     """
     Retrieves city object
     """
+    # Cache the response until the city changes
+    depends_on(('City', city_id))
     # Get city with the given id in the storage
     city = storage.get(City, city_id)
     if city:
+        # Reply 304 if the client has the current version
+        not_modified = unchanged_object(city)
+        if not_modified:
+            return not_modified
         # Return city object in JSON format
         return jsonify(city.to_dict())
     else:
@@ -84,7 +98,7 @@ def create_city(state_id):
     # Create a new city object with the JSON data
     city = City(**data)
     # Save the city object to the storage
-    storage.save(city)
+    city.save()
     # Return new city object with 201 status code
     return jsonify(city.to_dict()), 201
 
@@ -105,12 +119,13 @@ def update_city(city_id):
         data = request.get_json()
         ignore_keys = ['id', 'state_id', 'created_at', 'updated_at']
         # Update attributes of the city object with the data
-        for key, value in data.items():
-            if key not in ignore_keys:
-                setattr(city, key, value)
-
-        # Save updated city
-        city.save()
+        # Saved together, or rolled back if any of them fails
+        with storage.batch():
+            for key, value in data.items():
+                if key not in ignore_keys:
+                    setattr(city, key, value)
+            # Save updated city
+            city.save()
         # Return updated city object
         return jsonify(city.to_dict()), 200
     else:
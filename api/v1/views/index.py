@@ -4,6 +4,7 @@ Create a route 'status' from the object 'app_views'
 """
 
 from flask import jsonify
+from api.v1.cache import cache
 from api.v1.views import app_views
 from models import storage
 
@@ -30,3 +31,20 @@ def get_stats():
         'users': storage.count('User')
     }
     return jsonify(stats)
+
+# Counters of the storage engine, such as connection pool statistics
+@app_views.route('/stats/storage', methods=['GET'])
+def get_storage_stats():
+    """
+    Returns the counters kept by the storage engine
+    """
+    return jsonify(storage.stats())
+
+# Counters of the response cache
+@app_views.route('/stats/cache', methods=['GET'])
+def get_cache_stats():
+    """
+    Returns the hit, miss, eviction and invalidation counters of the
+    response cache
+    """
+    return jsonify(cache.stats())
@@ -2,7 +2,10 @@
 """
 Create a view for places objects - all default API actions
 """
-from api.v1.views import app_views
+from api.v1.cache import depends_on
+from api.v1.views import app_views, jsonify_list, jsonify_page, limit_arg
+from api.v1.views import paged
+from api.v1.views import unchanged_collection, unchanged_object
 from flask import abort, jsonify, request
 from models.amenity import Amenity
 from models.city import City
@@ -11,29 +14,142 @@ from models.review import Review
 from models.state import State
 from models.user import User
 from models import storage
+from models.engine.spatial import cluster_degrees, cluster_level
+
+# numeric attributes places_search() takes {"min": x, "max": y} ranges of
+search_ranges = ('price_by_night', 'max_guest', 'number_rooms')
+# highest zoom of the web maps places_clusters() serves
+max_zoom = 22
 
 # Route for retrieving all Place objects of a city
-@app_views.route('/city/<city_id>/places', methods=['GET'],
+@app_views.route('/cities/<city_id>/places', methods=['GET'],
                  strict_slashes=False)
 def places_by_city(city_id):
     """List of all places by city specified"""
-    # Get selected city from storage
-    city = storage.get(City, city_id)
-    if not city:
-        # Return 404 error if city is not found
+    # Cache the response until the city or its places change
+    depends_on(('City', city_id), ('Place', 'city_id', city_id))
+    if not storage.get(City, city_id):
+        # Return 404 error
         abort(404)
-    # Get all place objects and convert to dictionaries
-    places = [place.to_dict() for place in city.places]
-    return jsonify(places)
+    # Reply 304 if the client has the current version of the list
+    not_modified = unchanged_collection(('Place', 'city_id', city_id))
+    if not_modified:
+        return not_modified
+    if paged():
+        # Return one page of the places, in creation order
+        return jsonify_page(storage.query(Place).filter(city_id=city_id))
+    # Stream the place objects of the city, converted to json
+    city = storage.get(City, city_id, load=["places"])
+    return jsonify_list(city.places)
+
+# Route for retrieving the places nearest to a point
+@app_views.route('/places/near', methods=['GET'], strict_slashes=False)
+def places_near():
+    """List places within radius_km of lat, lng, nearest first"""
+    # Cache the response until a place changes
+    depends_on(('Place',))
+    lat = number_arg('lat', -90, 90)
+    lng = number_arg('lng', -180, 180)
+    radius_km = number_arg('radius_km', 0, 20038)
+    limit = limit_arg()
+    # Reply 304 if the client has the current version of the places
+    not_modified = unchanged_collection(('Place',))
+    if not_modified:
+        return not_modified
+    # Read the spatial index, or the bounding box of the circle in SQL
+    return jsonify_located(storage.near(Place, lat, lng, radius_km, limit))
+
+# Route for retrieving the places within a bounding box
+@app_views.route('/places/within', methods=['GET'], strict_slashes=False)
+def places_within():
+    """List places within bbox=west,south,east,north, nearest to its
+    center first"""
+    # Cache the response until a place changes
+    depends_on(('Place',))
+    west, south, east, north = bbox_arg()
+    limit = limit_arg()
+    # Reply 304 if the client has the current version of the places
+    not_modified = unchanged_collection(('Place',))
+    if not_modified:
+        return not_modified
+    return jsonify_located(storage.within(Place, south, west, north, east,
+                                          limit))
+
+
+# Route for retrieving the clusters of places shown on a map
+@app_views.route('/places/clusters', methods=['GET'], strict_slashes=False)
+def places_clusters():
+    """List the count, centroid and prices of the places of each cell of
+    the zoom level overlapping bbox=west,south,east,north"""
+    # Cache the response until a place changes
+    depends_on(('Place',))
+    west, south, east, north = bbox_arg()
+    zoom = int(number_arg('zoom', 0, max_zoom))
+    # Reply 304 if the client has the current version of the places
+    not_modified = unchanged_collection(('Place',))
+    if not_modified:
+        return not_modified
+    # One aggregate per cell, however many places it holds
+    clusters = storage.clusters(Place, south, west, north, east, zoom)
+    return jsonify({'zoom': zoom,
+                    'cell_degrees': cluster_degrees(cluster_level(zoom)),
+                    'clusters': clusters})
+
+def number_arg(name, low, high):
+    """Returns the number given as ?name=, aborts with 400 if it is missing
+    or not from low to high"""
+    try:
+        value = float(request.args[name])
+    except (KeyError, ValueError):
+        abort(400, 'Invalid ' + name)
+    if not low <= value <= high:
+        abort(400, 'Invalid ' + name)
+    return value
+
+
+def bbox_arg():
+    """Returns the (west, south, east, north) of ?bbox=, in degrees, east
+    being past 180 for a box across the antimeridian; aborts with 400 if
+    it is not a valid box"""
+    try:
+        west, south, east, north = map(float,
+                                       request.args['bbox'].split(','))
+    except (KeyError, ValueError):
+        abort(400, 'Invalid bbox')
+    valid = -90 <= south <= north <= 90
+    valid = valid and all(-180 <= lng <= 180 for lng in (west, east))
+    if not valid:
+        abort(400, 'Invalid bbox')
+    if west > east:
+        east += 360
+    return west, south, east, north
+
+
+def jsonify_located(located):
+    """Returns the response streaming the places of the (distance in km,
+    place) pairs located, each with its distance_km"""
+    distances = {place.id: distance for distance, place in located}
+
+    def to_dict(place):
+        """place json with its distance"""
+        return dict(place.to_dict(),
+                    distance_km=round(distances[place.id], 3))
+    return jsonify_list([place for distance, place in located], to_dict)
 
 # Route for retrieving specific place by ID
 @app_views.route('/places/<place_id>', methods=['GET'],
                  strict_slashes=False)
 def place_by_id(place_id):
     """List places by id"""
+    # Cache the response until the place changes
+    depends_on(('Place', place_id))
     # Get selected place by id
     place = storage.get(Place, place_id)
     if place:
+        # Reply 304 if the client has the current version
+        not_modified = unchanged_object(place)
+        if not_modified:
+            return not_modified
         # Return place json
         return jsonify(place.to_dict())
     else:
@@ -41,7 +157,7 @@ def place_by_id(place_id):
         abort(404)
 
 # Route for deleting place object by id
-@app_views.route('/places/<place_id>', method=['DELETE'])
+@app_views.route('/places/<place_id>', methods=['DELETE'])
 def delete_place(place_id):
     """Delete place with specified id"""
     # Get selected place by id
@@ -57,7 +173,7 @@ def delete_place(place_id):
         abort(404)
 
 # Route for creating a new place object
-@app_views.route('/city/<city_id>/places', method=['POST'],
+@app_views.route('/cities/<city_id>/places', methods=['POST'],
                  strict_slashes=False)
 def create_place(city_id):
     """Create place under city specified"""
@@ -94,7 +210,7 @@ def create_place(city_id):
     return jsonify(place.to_dict()), 201
 
 # Route for updating existing place object by id
-@app_views.route('/place/<place_id>', methods=['PUT'],
+@app_views.route('/places/<place_id>', methods=['PUT'],
                  strict_slashes=False)
 def update_place(place_id):
     """Update place by id"""
@@ -109,17 +225,67 @@ def update_place(place_id):
         data = request.get_json()
         ignore_keys = ['id', 'user_id', 'city_id', 'created_at', 'updated_at']
         # Update attributes of the place object with the JSON data
-        for key, value in data.items():
-            if key not in ignore_keys:
-                setattr(place, key, value)
-
-        # Save the updated place object
-        place.save()
+        # Saved together, or rolled back if any of them fails
+        with storage.batch():
+            for key, value in data.items():
+                if key not in ignore_keys:
+                    setattr(place, key, value)
+            # Save the updated place object
+            place.save()
         # Return updated place object
         return jsonify(place.to_dict()), 200
     else:
         abort(404)
 
+# Route for searching places
+@app_views.route('/places_search', methods=['POST'], strict_slashes=False)
+def places_search():
+    """Search places by states, cities, amenities and ranges of numbers"""
+    # Check if request data is a json object
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, 'Not a JSON')
+    query = storage.query(Place)
+    # Keep the places of the cities listed and of the states listed, the
+    # cities of the states being a subquery
+    states = search_ids(data, 'states')
+    cities = search_ids(data, 'cities')
+    if states:
+        query.filter(city_id__in=storage.query(City).filter_any(
+            id__in=cities, state_id__in=states))
+    elif cities:
+        query.filter(city_id__in=cities)
+    # Keep the places having all the amenities listed
+    amenities = search_ids(data, 'amenities')
+    if amenities:
+        query.filter(amenity_ids__all=amenities)
+    # Keep the places within the ranges given
+    for field in search_ranges:
+        bounds = data.get(field)
+        if bounds is None:
+            continue
+        if not isinstance(bounds, dict):
+            abort(400, 'Invalid ' + field)
+        for key, op in (('min', 'gte'), ('max', 'lte')):
+            value = bounds.get(key)
+            if value is None:
+                continue
+            if type(value) not in (int, float):
+                abort(400, 'Invalid ' + field)
+            query.filter(**{field + '__' + op: value})
+    # The query starts from its most selective index, or runs in SQL
+    return jsonify_list(query.all())
+
+
+def search_ids(data, name):
+    """Returns the ids listed under name in a search, aborts with 400 if
+    they are not a list of strings"""
+    ids = data.get(name) or []
+    if (not isinstance(ids, list) or
+            not all(isinstance(id, str) for id in ids)):
+        abort(400, 'Invalid ' + name)
+    return ids
+
 # Error Handlers:
 @app_views.errorhandler(404)
 def not_found(error):
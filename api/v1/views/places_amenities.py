@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+"""
+Creates a view for the links between place and amenity objects
+"""
+
+from api.v1.cache import depends_on
+from api.v1.views import app_views, jsonify_list
+from flask import abort, jsonify, request
+from models.amenity import Amenity
+from models.place import Place
+from models import storage
+
+# Route for retrieving the amenity objects of a place
+@app_views.route('/places/<place_id>/amenities', methods=['GET'],
+                 strict_slashes=False)
+def get_place_amenities(place_id):
+    """Get list of the amenity objects of a place"""
+    # Cache the response until the place or its amenities change
+    depends_on(('Place', place_id))
+    place = storage.get(Place, place_id)
+    if not place:
+        # Return 404 error
+        abort(404)
+    # Stream the amenity objects of the place, converted to json
+    return jsonify_list(place.amenities)
+
+# Route for linking an amenity object to a place
+@app_views.route('/places/<place_id>/amenities/<amenity_id>',
+                 methods=['POST'], strict_slashes=False)
+def link_place_amenity(place_id, amenity_id):
+    """Link amenity object to a place"""
+    place = storage.get(Place, place_id)
+    amenity = storage.get(Amenity, amenity_id)
+    if not place or not amenity:
+        # Return 404 error
+        abort(404)
+    # Return 201 if the link is new, 200 if it already existed
+    if storage.link(place, [amenity]):
+        return jsonify(amenity.to_dict()), 201
+    return jsonify(amenity.to_dict()), 200
+
+# Route for unlinking an amenity object from a place
+@app_views.route('/places/<place_id>/amenities/<amenity_id>',
+                 methods=['DELETE'], strict_slashes=False)
+def unlink_place_amenity(place_id, amenity_id):
+    """Unlink amenity object from a place"""
+    place = storage.get(Place, place_id)
+    amenity = storage.get(Amenity, amenity_id)
+    if not place or not amenity:
+        # Return 404 error
+        abort(404)
+    # Return 404 error if the amenity is not linked to the place
+    if not storage.unlink(place, [amenity]):
+        abort(404)
+    # Return empty json
+    return jsonify({}), 200
+
+# Route for linking several amenity objects to a place
+@app_views.route('/places/<place_id>/amenities', methods=['POST'],
+                 strict_slashes=False)
+def link_place_amenities(place_id):
+    """Link the amenity objects listed in amenity_ids to a place"""
+    place, amenities = place_and_amenities(place_id)
+    storage.link(place, amenities)
+    # Stream the amenity objects of the place, converted to json
+    return jsonify_list(place.amenities)
+
+# Route for unlinking several amenity objects from a place
+@app_views.route('/places/<place_id>/amenities', methods=['DELETE'],
+                 strict_slashes=False)
+def unlink_place_amenities(place_id):
+    """Unlink the amenity objects listed in amenity_ids from a place"""
+    place, amenities = place_and_amenities(place_id)
+    storage.unlink(place, amenities)
+    # Return empty json
+    return jsonify({}), 200
+
+
+def place_and_amenities(place_id):
+    """Returns the place and the amenities listed in the amenity_ids of
+    the json data of a bulk request, aborts with 404 if one of them does
+    not exist and with 400 if the data is not valid"""
+    place = storage.get(Place, place_id)
+    if not place:
+        abort(404)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, 'Not a JSON')
+    ids = data.get('amenity_ids')
+    if (not isinstance(ids, list) or
+            not all(isinstance(id, str) for id in ids)):
+        abort(400, 'Missing amenity_ids')
+    ids = list(dict.fromkeys(ids))
+    # Get the amenities with one query
+    amenities = storage.query(Amenity).filter(id__in=ids).all()
+    if len(amenities) != len(ids):
+        abort(404)
+    return place, amenities
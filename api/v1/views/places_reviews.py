@@ -2,7 +2,9 @@
 """
 Create new view for review objects - Handles all default restful api calls
 """
-from api.v1.views import app_views
+from api.v1.cache import depends_on
+from api.v1.views import app_views, jsonify_list, jsonify_page, paged
+from api.v1.views import unchanged_collection, unchanged_object
 from flask import abort, jsonify, request
 from models.place import Place
 from models.review import Review
@@ -16,24 +18,37 @@ def get_reviews_by_place(place_id):
     """
     Get list of all review objects by place
     """
-    # Get specified place
-    place = storage.get(Place, place_id)
-    if not place:
+    # Cache the response until the place or its reviews change
+    depends_on(('Place', place_id),
+               ('Review', 'place_id', place_id))
+    if not storage.get(Place, place_id):
         # Return 404 error
         abort(404)
-
-    # Get all reviews for the place and convert to dictionary
-    reviews = [review.to_dict() for review in place.reviews]
-    return jsonify(reviews)
+    # Reply 304 if the client has the current version of the list
+    not_modified = unchanged_collection(('Review', 'place_id', place_id))
+    if not_modified:
+        return not_modified
+    if paged():
+        # Return one page of the reviews, in creation order
+        return jsonify_page(storage.query(Review).filter(place_id=place_id))
+    # Stream the reviews of the place, converted to json
+    place = storage.get(Place, place_id, load=["reviews"])
+    return jsonify_list(place.reviews)
 
 # Route for retrieving specific review object by id
-@app_views.route('/reviews/review_id', methods=['GET'],
+@app_views.route('/reviews/<review_id>', methods=['GET'],
                  strict_slashes=False)
 def get_review(review_id):
     """Get specified review object"""
+    # Cache the response until the review changes
+    depends_on(('Review', review_id))
     # Get review with passed id
     review = storage.get(Review, review_id)
     if review:
+        # Reply 304 if the client has the current version
+        not_modified = unchanged_object(review)
+        if not_modified:
+            return not_modified
         # Return the Review object in JSON format
         return jsonify(review.to_dict())
     else:
@@ -53,7 +68,7 @@ def delete_review(review_id):
     return jsonify({})
 
 # Route for creating a new review object
-@app_views.route('/places/place_id/reviews', methods=['POST'],
+@app_views.route('/places/<place_id>/reviews', methods=['POST'],
                  strict_slashes=False)
 def create_review(place_id):
     """Create new review for specified place"""
@@ -103,12 +118,13 @@ def update_review(review_id):
         ignore_keys = ['id', 'user_id', 'place_id', 'created_at', 'updated_at']
 
         # Update the selected review with the data in the request
-        for key, value in data.items():
-            if key not in ignore_keys:
-                setattr(review, key, value)
-
-        # Save the updated review object to storage
-        review.save()
+        # Saved together, or rolled back if any of them fails
+        with storage.batch():
+            for key, value in data.items():
+                if key not in ignore_keys:
+                    setattr(review, key, value)
+            # Save the updated review object to storage
+            review.save()
 
         # Return update review object in json format with 200 status
         return jsonify(review.to_dict()), 200
@@ -4,7 +4,9 @@ Create e new view for state objects.All default RESTAPI functions
 """
 from flask import abort, jsonify, request
 from models.state import State
-from api.v1.views import app_views
+from api.v1.cache import depends_on
+from api.v1.views import app_views, jsonify_list, jsonify_page, paged
+from api.v1.views import unchanged_collection, unchanged_object
 from models import storage
 
 # Route to retrieve all state objects
@@ -13,11 +15,17 @@ def get_all_states():
     """
     Retrieves the list of all state objects
     """
-    # Get all states from storage
-    states = storage.all(State).values()
-    # Convert them to json
-    state_list = [state.to_dict() for state in states]
-    return jsonify(state_list)
+    # Cache the response until a state changes
+    depends_on(('State',))
+    # Reply 304 if the client has the current version of the list
+    not_modified = unchanged_collection(('State',))
+    if not_modified:
+        return not_modified
+    # Return one page, in creation order, when ?limit= or ?after= is given
+    if paged():
+        return jsonify_page(storage.query(State))
+    # Stream the states from storage, converted to json one at a time
+    return jsonify_list(storage.iter(State))
 
 # Retrieve single state by id
 @app_views.route('/states/<state_id>', methods=['GET'], strict_slashes=False)
@@ -25,9 +33,15 @@ def get_state(state_id):
     """
     Retrieves a single state by id
     """
+    # Cache the response until the state changes
+    depends_on(('State', state_id))
     # Retrieve the single state from storage
     state = storage.get(State, state_id)
     if state:
+        # Reply 304 if the client has the current version
+        not_modified = unchanged_object(state)
+        if not_modified:
+            return not_modified
         # Return state object in json
         return jsonify(state.to_dict())
     else:
@@ -75,7 +89,7 @@ def create_state():
     return jsonify(state.to_dict()), 201
 
 # Route for updating state object by id
-@app_views.route('/states/<state_id>', methods=['POST'], strict_slashes=False)
+@app_views.route('/states/<state_id>', methods=['PUT'], strict_slashes=False)
 def update_state(state_id):
     """
     Updates state by id
@@ -90,12 +104,13 @@ def update_state(state_id):
         data = request.get_json()
         ignore_keys = ['id', 'created_at', 'updated_at']
         # Update attributes of state object with JSON data
-        for key, value in data.items():
-            if key not in ignore_keys:
-                setattr(state, key, value)
-
-        # Save updated state to storage
-        state.save()
+        # Saved together, or rolled back if any of them fails
+        with storage.batch():
+            for key, value in data.items():
+                if key not in ignore_keys:
+                    setattr(state, key, value)
+            # Save updated state to storage
+            state.save()
         # Return update state object in JSON format with 200 status code
         return jsonify(state.to_dict()), 200
     else:
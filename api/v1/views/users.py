@@ -2,7 +2,9 @@
 """
 Create a new view for user objects, handles all default restapi actions
 """
-from api.v1.views import app_views
+from api.v1.cache import depends_on
+from api.v1.views import app_views, jsonify_list, jsonify_page, paged
+from api.v1.views import unchanged_collection, unchanged_object
 from flask import abort, jsonify, request
 from models import storage
 from models.user import User
@@ -12,18 +14,32 @@ from models.user import User
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def all_users():
     """Return all user objects"""
-    # Get all user objects and convert to dictionaries
-    users = storage.all(User).values()
-    return jsonify([user.to_dict() for user in users])
+    # Cache the response until a user changes
+    depends_on(('User',))
+    # Reply 304 if the client has the current version of the list
+    not_modified = unchanged_collection(('User',))
+    if not_modified:
+        return not_modified
+    # Return one page, in creation order, when ?limit= or ?after= is given
+    if paged():
+        return jsonify_page(storage.query(User))
+    # Stream the user objects from storage, converted to json
+    return jsonify_list(storage.iter(User))
 
 # Route for retrieving specific user object by ID
 @app_views.route('/users/<user_id>', methods=['GET'],
                  strict_slashes=False)
 def get_user(user_id):
     """ Retrieve user by id """
+    # Cache the response until the user changes
+    depends_on(('User', user_id))
     # Find user with specified id
     user = storage.get(User, user_id)
     if user:
+        # Reply 304 if the client has the current version
+        not_modified = unchanged_object(user)
+        if not_modified:
+            return not_modified
         # Return user object in json
         return jsonify(user.to_dict())
     else:
@@ -31,7 +47,7 @@ def get_user(user_id):
         abort(404)
 
 # Deleting specific user object by ID
-@app_views.route('/users/user_id', methods=['DELETE'])
+@app_views.route('/users/<user_id>', methods=['DELETE'])
 def delete_user(user_id):
     """Delete user by ID"""
     # Find user with specified ID
@@ -86,12 +102,13 @@ def update_user(user_id):
         data = request.get_json()
         ignore_keys = ['id', 'email', 'created_at', 'updated_at']
         # Update the attributes of the json data with the json attributes
-        for key,value in data.items():
-            if key not in ignore_keys:
-                setattr(user, key, value)
-
-        # Save updated user object and return json of the object
-        user.save()
+        # Saved together, or rolled back if any of them fails
+        with storage.batch():
+            for key, value in data.items():
+                if key not in ignore_keys:
+                    setattr(user, key, value)
+            # Save updated user object and return json of the object
+            user.save()
         return jsonify(user.to_dict()), 201
     else:
         # Return error 404 if object is not found
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""
+Measures GET /api/v1/states for growing numbers of states: time to the
+first chunk, total time and peak memory (tracemalloc) of the streamed
+response, plain and gzip, against jsonify() of the whole list as the
+views did before streaming; each size runs in a fresh process on a
+temporary file storage, with the response cache off
+
+usage: ./benchmarks/api_streaming.py [number of states...]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = """
+import sys, time, tracemalloc
+sys.path.insert(0, {root!r})
+from flask import jsonify
+from models import storage
+from models.state import State
+from api.v1.app import app
+storage.bulk_new(State, [{{"name": "State {{}}".format(i)}}
+                         for i in range({size})])
+
+
+def measure(label, get):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = get()
+    first = None
+    size = 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("{{:>8}} {{:<8}} first {{:8.2f}} ms  total {{:8.1f}} ms  "
+          "peak {{:8.1f}} MiB  {{:9d}} bytes".format(
+              {size}, label, first * 1e3, total * 1e3, peak / 2 ** 20, size))
+
+
+def whole():
+    with app.test_request_context():
+        return [jsonify([s.to_dict() for s in storage.all(State).values()])
+                .get_data()]
+
+
+def streamed(headers):
+    def get():
+        client = app.test_client()
+        return client.get("/api/v1/states", headers=headers,
+                          buffered=False).response
+    return get
+
+
+measure("jsonify", whole)
+measure("stream", streamed({{}}))
+measure("gzip", streamed({{"Accept-Encoding": "gzip"}}))
+"""
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, HBNB_API_CACHE_SIZE="0")
+            env.pop("HBNB_TYPE_STORAGE", None)
+            subprocess.run([sys.executable, "-c", PROBE.format(
+                root=ROOT, size=size)], env=env, cwd=tmp, check=True)
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""
+Compares the ways of inserting and updating rows with DBStorage, on a
+local SQLite database file: one commit per object (BaseModel.save()),
+new() per object and one save(), and bulk_new() / bulk_update()
+
+usage: ./benchmarks/db_storage_bulk.py [number of rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+os.environ["HBNB_TYPE_STORAGE"] = "db"
+os.environ["HBNB_DB_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(),
+                                                        "hbnb.db")
+import models
+from models.review import Review
+
+storage = models.storage
+
+
+def rows(size):
+    """returns the attributes of size reviews"""
+    return [{"text": "Great place " * 4, "place_id": "p{}".format(i % 100),
+             "user_id": "u{}".format(i % 50)} for i in range(size)]
+
+
+def timed(label, size, function):
+    """runs function and prints its throughput"""
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    print("{:<32} {:8.3f} s {:10.0f} rows/s".format(label, seconds,
+                                                    size / seconds))
+
+
+def save_each(reviews):
+    """inserts reviews with one commit each"""
+    for row in reviews:
+        Review(**row).save()
+
+
+def save_once(reviews):
+    """inserts reviews with new() each and one commit"""
+    for row in reviews:
+        storage.new(Review(**row))
+    storage.save()
+
+
+def update_each(ids):
+    """updates the text of reviews with one commit each"""
+    for id in ids:
+        review = storage.get(Review, id)
+        review.text = "Updated"
+        review.save()
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("{} rows, {}".format(size, os.environ["HBNB_DB_URL"]))
+    slow = max(size // 10, 1)
+    timed("insert, commit per object", slow, lambda: save_each(rows(slow)))
+    timed("insert, new() + one save()", size, lambda: save_once(rows(size)))
+    ids = []
+    timed("insert, bulk_new()", size,
+          lambda: ids.extend(storage.bulk_new(Review, rows(size))))
+    storage.close()
+    storage.reload()
+    timed("update, commit per object", slow, lambda: update_each(ids[:slow]))
+    timed("update, bulk_update()", size, lambda: storage.bulk_update(
+        Review, [{"id": id, "text": "Bulk"} for id in ids]))
+    print("{} reviews stored".format(storage.count(Review)))
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""
+Load-tests the connection pool of DBStorage through the API on a local
+SQLite database: threads send GET requests for states through the Flask
+app, for several HBNB_MYSQL_POOL_SIZE / HBNB_MYSQL_MAX_OVERFLOW settings,
+and the pool counters of /api/v1/stats/storage are printed
+
+usage: ./benchmarks/db_storage_pool.py [threads] [requests per thread]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = """
+import sys, threading, time
+sys.path.insert(0, {root!r})
+from models import storage
+from models.state import State
+from api.v1.app import app
+ids = storage.bulk_new(State, [{{"name": "State"}}] * 100)
+storage.close()
+errors = []
+
+
+def client(requests):
+    with app.test_client() as c:
+        for i in range(requests):
+            response = c.get("/api/v1/states/" + ids[i % len(ids)])
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+
+threads = [threading.Thread(target=client, args=({requests},))
+           for i in range({threads})]
+start = time.perf_counter()
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+seconds = time.perf_counter() - start
+with app.test_client() as c:
+    stats = c.get("/api/v1/stats/storage").get_json()
+print("{{:>8.0f}} req/s  errors {{:3d}}  checkouts {{:6d}}  timeouts {{:3d}}  "
+      "wait {{:8.6f}} s avg".format(
+          {threads} * {requests} / seconds, len(errors),
+          stats["pool_checkouts"], stats["pool_timeouts"],
+          stats["pool_wait_seconds_average"]))
+"""
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        for size, overflow in ((1, 0), (4, 0), (4, 12), (16, 0)):
+            print("pool {:2d} + overflow {:2d}:".format(size, overflow),
+                  end=" ", flush=True)
+            env = dict(os.environ, HBNB_TYPE_STORAGE="db",
+                       HBNB_DB_URL="sqlite:///" + os.path.join(
+                           tmp, "pool{}-{}.db".format(size, overflow)),
+                       HBNB_MYSQL_POOL_SIZE=str(size),
+                       HBNB_MYSQL_MAX_OVERFLOW=str(overflow),
+                       HBNB_MYSQL_POOL_TIMEOUT="5")
+            subprocess.run([sys.executable, "-c", PROBE.format(
+                root=ROOT, threads=threads, requests=requests)],
+                env=env, check=True)
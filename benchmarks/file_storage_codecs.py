@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+"""
+Compares the FileStorage codecs on generated records: encoded size, save
+(encode) time, decode time and load time (decode and create the models)
+
+usage: ./benchmarks/file_storage_codecs.py [number of objects]
+"""
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+from models.engine.codecs import codecs
+from models.engine.file_storage import classes
+
+
+def records(size):
+    """returns (key, record) pairs of about size objects, mostly reviews
+    pointing at a few thousand places and users"""
+    def record(cls, **attrs):
+        """returns a record of class cls"""
+        attrs.update({"id": str(uuid.uuid4()), "__class__": cls,
+                      "created_at": "2017-09-28T21:03:54.052298",
+                      "updated_at": "2017-09-28T21:03:54.052302"})
+        return (cls + "." + attrs["id"], attrs)
+    users = [record("User", email="a@b.c", password="pwd",
+                    first_name="Betty", last_name="Holberton")
+             for i in range(max(size // 100, 1))]
+    places = [record("Place", name="Lovely place", city_id=str(i % 1000),
+                     user_id=users[i % len(users)][1]["id"],
+                     number_rooms=3, max_guest=6, price_by_night=120,
+                     latitude=37.77, longitude=-122.41)
+              for i in range(max(size // 20, 1))]
+    reviews = [record("Review", text="Great place to stay",
+                      place_id=places[i % len(places)][1]["id"],
+                      user_id=users[i % len(users)][1]["id"])
+               for i in range(size - len(users) - len(places))]
+    return users + places + reviews
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    pairs = records(size)
+    print("{} objects".format(len(pairs)))
+    for codec in codecs.values():
+        start = time.perf_counter()
+        data = codec.encode(pairs)
+        save = time.perf_counter() - start
+        start = time.perf_counter()
+        decoded = codec.decode(data)
+        decode = time.perf_counter() - start
+        by_class = {}
+        for record in decoded.values():
+            by_class.setdefault(record["__class__"], []).append(record)
+        for name, records in by_class.items():
+            classes[name].from_records(records)
+        load = time.perf_counter() - start
+        print("{:<7} {:6.1f} MiB  save {:6.2f} s  decode {:6.2f} s  "
+              "load {:6.2f} s".format(codec.name, len(data) / 2 ** 20,
+                                      save, decode, load))
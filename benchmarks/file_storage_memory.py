@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+"""
+Measures the memory FileStorage takes per stored object of each class,
+with regular and with compact (HBNB_FILE_COMPACT=1) objects: a file per
+class is reloaded under tracemalloc in a fresh process, so the figures
+include attribute values and the storage indexes
+
+usage: ./benchmarks/file_storage_memory.py [number of objects per class]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = """
+import sys, tracemalloc
+sys.path.insert(0, {root!r})
+from models import storage
+from models.engine.file_storage import FileStorage
+FileStorage._FileStorage__file_path = sys.argv[2]
+tracemalloc.start()
+storage.reload()
+print(tracemalloc.get_traced_memory()[0] // storage.count(sys.argv[1]))
+"""
+# attributes of a typical object, references to 100 distinct parents
+parents = [str(uuid.uuid4()) for i in range(100)]
+attributes = {
+    "Amenity": lambda i: {"name": "Wifi"},
+    "City": lambda i: {"name": "San Francisco", "state_id": parents[i % 100]},
+    "Place": lambda i: {"city_id": parents[i % 100],
+                        "user_id": parents[i * 7 % 100],
+                        "name": "Lovely place", "description": "Quiet " * 8,
+                        "number_rooms": 3, "number_bathrooms": 1,
+                        "max_guest": 6, "price_by_night": 120,
+                        "latitude": 37.77, "longitude": -122.43},
+    "Review": lambda i: {"place_id": parents[i % 100],
+                         "user_id": parents[i * 7 % 100],
+                         "text": "Great place " * 4},
+    "State": lambda i: {"name": "California"},
+    "User": lambda i: {"email": "guest{}@mail.com".format(i),
+                       "password": "c2VjcmV0", "first_name": "Betty",
+                       "last_name": "Holberton"}}
+
+
+def generate(path, name, size):
+    """writes a store of size objects of the class name"""
+    records = {}
+    for i in range(size):
+        record = {"id": str(uuid.uuid4()), "__class__": name,
+                  "created_at": "2017-09-28T21:03:54.052298",
+                  "updated_at": "2017-09-28T21:03:54.052302"}
+        record.update(attributes[name](i))
+        records[name + "." + record["id"]] = record
+    with open(path, 'w') as f:
+        json.dump(records, f)
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        print("{:<10} {:>9} {:>9}".format("class", "regular", "compact"))
+        for name in sorted(attributes):
+            path = os.path.join(tmp, name + ".json")
+            generate(path, name, size)
+            used = []
+            for compact in ("0", "1"):
+                env = dict(os.environ, HBNB_FILE_COMPACT=compact)
+                env.pop("HBNB_TYPE_STORAGE", None)
+                used.append(int(subprocess.run(
+                    [sys.executable, "-c", PROBE.format(root=ROOT), name,
+                     path], cwd=tmp, env=env, check=True,
+                    capture_output=True, text=True).stdout))
+            print("{:<10} {:>7} B {:>7} B".format(name, *used))
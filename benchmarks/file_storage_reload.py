@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""
+Measures the cold start of FileStorage, eager and lazy, on a generated
+file.json: time to import models (which reloads the storage), resident
+memory, reload throughput (objects created, or indexed when lazy, per
+second) and the time of the first get() and all(cls) calls
+
+usage: ./benchmarks/file_storage_reload.py [number of objects]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from models import storage
+loaded = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+start = time.perf_counter()
+storage.get("Review", {review!r})
+get = time.perf_counter() - start
+start = time.perf_counter()
+states = len(storage.all("State"))
+all_cls = time.perf_counter() - start
+print("{{:<6}} start {{:6.2f}} s  rss {{:5d}} MiB  reload {{:9.0f}} obj/s  "
+      "get {{:6.4f}} s  all(State) {{:6.4f}} s ({{}} states)".format(
+          sys.argv[1], loaded, rss,
+          storage.stats()["reload_objects_per_second"], get, all_cls,
+          states))
+"""
+
+
+def record(cls, **attrs):
+    """returns a stored record of class cls"""
+    attrs.update({"id": str(uuid.uuid4()), "__class__": cls,
+                  "created_at": "2017-09-28T21:03:54.052298",
+                  "updated_at": "2017-09-28T21:03:54.052302"})
+    return attrs
+
+
+def generate(path, size):
+    """writes a store of about size objects, mostly reviews, laid out one
+    record per line as FileStorage writes it, and returns a review id"""
+    with open(path, 'w') as f:
+        f.write("{\n")
+        first = True
+        states = [record("State", name="State") for i in range(50)]
+        cities = [record("City", name="City", state_id=s["id"])
+                  for s in states for i in range(20)]
+        users = [record("User", email="a@b.c", password="pwd")
+                 for i in range(size // 100)]
+        places = [record("Place", name="Place", city_id=c["id"],
+                         user_id=users[i % len(users)]["id"],
+                         price_by_night=100, latitude=37.7,
+                         longitude=-122.4)
+                  for i, c in enumerate(cities * (size // 50000 + 1))]
+        rest = size - len(states) - len(cities) - len(users) - len(places)
+        for rec in states + cities + users + places:
+            f.write(("" if first else ",\n") + json.dumps(
+                rec["__class__"] + "." + rec["id"]) + ": " + json.dumps(rec))
+            first = False
+        for i in range(rest):
+            rec = record("Review", text="Great place " * 4,
+                         place_id=places[i % len(places)]["id"],
+                         user_id=users[i % len(users)]["id"])
+            f.write(",\n" + json.dumps("Review." + rec["id"]) + ": " +
+                    json.dumps(rec))
+        f.write("\n}\n")
+    return rec["id"]
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as tmp:
+        review = generate(os.path.join(tmp, "file.json"), size)
+        print("{} objects, {:.0f} MiB".format(
+            size, os.path.getsize(os.path.join(tmp, "file.json")) / 2 ** 20))
+        for mode, lazy in (("eager", "0"), ("lazy", "1")):
+            env = dict(os.environ, HBNB_FILE_LAZY=lazy)
+            env.pop("HBNB_TYPE_STORAGE", None)
+            subprocess.run([sys.executable, "-c",
+                            PROBE.format(root=ROOT, review=review), mode],
+                           cwd=tmp, env=env, check=True)
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+"""
+Measures the latency of storage.near(), storage.within() and
+storage.clusters() on a file storage holding a million places, most of
+them around 200 cities and the rest spread over the earth, against a scan
+of storage.all(Place); also times GET /api/v1/places/near and
+/api/v1/places/clusters through the app, with the response cache off.
+Runs in a temporary directory, with compact objects, without saving
+
+usage: ./benchmarks/places_near.py [number of places]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp())
+os.environ.pop("HBNB_TYPE_STORAGE", None)
+os.environ["HBNB_FILE_COMPACT"] = "1"
+os.environ["HBNB_API_CACHE_SIZE"] = "0"
+from models import storage
+from models.engine.spatial import distance_km
+from models.place import Place
+
+
+def populate(size, cities):
+    """stores size places, 90% of them within about 20 km of cities"""
+    rand = random.Random(1)
+    start = time.perf_counter()
+    for i in range(size):
+        if i % 10:
+            lat, lng = rand.choice(cities)
+            lat = max(-90.0, min(90.0, rand.gauss(lat, 0.1)))
+            lng = (rand.gauss(lng, 0.15) + 540) % 360 - 180
+        else:
+            lat, lng = rand.uniform(-60, 70), rand.uniform(-180, 180)
+        storage.new(Place(name="Place {}".format(i), latitude=lat,
+                          longitude=lng, price_by_night=i % 300))
+    print("{} places stored in {:.1f} s".format(
+        size, time.perf_counter() - start))
+
+
+def timed(label, function, calls):
+    """prints the median and 95th percentile latency of function called
+    with each of calls, and the mean number of results"""
+    times, found = [], 0
+    for args in calls:
+        start = time.perf_counter()
+        found += len(function(*args))
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print("{:<36} median {:8.3f} ms  p95 {:8.3f} ms  {:8.1f} results"
+          .format(label, statistics.median(times) * 1e3,
+                  times[int(len(times) * 0.95)] * 1e3, found / len(calls)))
+
+
+def scan(lat, lng, radius_km, limit):
+    """the places within radius_km, nearest first, from all the places"""
+    pairs = []
+    for place in storage.all(Place).values():
+        distance = distance_km(lat, lng, place.latitude, place.longitude)
+        if distance <= radius_km:
+            pairs.append((distance, place.id))
+    return sorted(pairs)[:limit]
+
+
+def wrap(lng):
+    """returns lng brought back between -180 and 180"""
+    return (lng + 540) % 360 - 180
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rand = random.Random(2)
+    cities = [(rand.uniform(-50, 65), rand.uniform(-180, 180))
+              for i in range(200)]
+    populate(size, cities)
+    start = time.perf_counter()
+    storage.near(Place, 0, 0, 1)
+    print("spatial index built in {:.1f} s".format(
+        time.perf_counter() - start))
+    centers = [rand.choice(cities) for i in range(200)]
+    for radius_km in (1, 5, 25, 100):
+        timed("near(), {:3d} km, limit 100".format(radius_km),
+              storage.near, [(Place, lat, lng, radius_km, 100)
+                             for lat, lng in centers])
+    timed("near(),  25 km, no limit", storage.near,
+          [(Place, lat, lng, 25) for lat, lng in centers])
+    timed("within(), 0.2 x 0.2 degrees", storage.within,
+          [(Place, lat - 0.1, lng - 0.1, lat + 0.1, lng + 0.1, 100)
+           for lat, lng in centers])
+    start = time.perf_counter()
+    storage.clusters(Place, 0, 0, 0, 0, 0)
+    print("cluster aggregates built in {:.1f} s".format(
+        time.perf_counter() - start))
+    timed("clusters(), whole earth, zoom 2", storage.clusters,
+          [(Place, -90, -180, 90, 180, 2)] * 20)
+    timed("clusters(), 1 x 2 degrees, zoom 9", storage.clusters,
+          [(Place, lat - 0.5, lng - 1, lat + 0.5, lng + 1, 9)
+           for lat, lng in centers])
+    timed("scan of all places, 5 km", scan,
+          [(lat, lng, 5, 100) for lat, lng in centers[:3]])
+    from api.v1.app import app
+    client = app.test_client()
+    timed("GET /places/near, 5 km, limit 100",
+          lambda url: client.get(url).get_json(),
+          [("/api/v1/places/near?lat={}&lng={}&radius_km=5&limit=100"
+            .format(lat, lng),) for lat, lng in centers])
+    timed("GET /places/clusters, zoom 9",
+          lambda url: client.get(url).get_json()["clusters"],
+          [("/api/v1/places/clusters?bbox={},{},{},{}&zoom=9"
+            .format(wrap(lng - 1), lat - 0.5, wrap(lng + 1), lat + 0.5),)
+           for lat, lng in centers])
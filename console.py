@@ -20,6 +20,8 @@ classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
 class HBNBCommand(cmd.Cmd):
     """ HBNH console """
     prompt = '(hbnb) '
+    # storage batch started by begin, until commit or rollback
+    batch = None
 
     def do_EOF(self, arg):
         """Exits console"""
@@ -33,6 +35,36 @@ class HBNBCommand(cmd.Cmd):
         """Quit command to exit the program"""
         return True
 
+    def postloop(self):
+        """ commits the batch left open on exit """
+        if self.batch is not None:
+            self.do_commit("")
+
+    def do_begin(self, arg):
+        """Starts a batch: changes are saved together by commit"""
+        if self.batch is not None:
+            print("** batch already started **")
+            return False
+        self.batch = models.storage.batch()
+        self.batch.__enter__()
+
+    def do_commit(self, arg):
+        """Saves the changes made since begin"""
+        if self.batch is None:
+            print("** no batch started **")
+            return False
+        batch, self.batch = self.batch, None
+        batch.__exit__(None, None, None)
+
+    def do_rollback(self, arg):
+        """Discards the changes made since begin"""
+        if self.batch is None:
+            print("** no batch started **")
+            return False
+        batch, self.batch = self.batch, None
+        error = RuntimeError("rollback")
+        batch.__exit__(RuntimeError, error, None)
+
     def _key_value_parser(self, args):
         """creates a dictionary from a list of strings"""
         new_dict = {}
@@ -77,9 +109,9 @@ class HBNBCommand(cmd.Cmd):
             return False
         if args[0] in classes:
             if len(args) > 1:
-                key = args[0] + "." + args[1]
-                if key in models.storage.all():
-                    print(models.storage.all()[key])
+                obj = models.storage.get(args[0], args[1])
+                if obj is not None:
+                    print(obj)
                 else:
                     print("** no instance found **")
             else:
@@ -94,9 +126,9 @@ class HBNBCommand(cmd.Cmd):
             print("** class name missing **")
         elif args[0] in classes:
             if len(args) > 1:
-                key = args[0] + "." + args[1]
-                if key in models.storage.all():
-                    models.storage.all().pop(key)
+                obj = models.storage.get(args[0], args[1])
+                if obj is not None:
+                    models.storage.delete(obj)
                     models.storage.save()
                 else:
                     print("** no instance found **")
@@ -108,19 +140,18 @@ class HBNBCommand(cmd.Cmd):
     def do_all(self, arg):
         """Prints string representations of instances"""
         args = shlex.split(arg)
-        obj_list = []
         if len(args) == 0:
-            obj_dict = models.storage.all()
+            objs = models.storage.iter()
         elif args[0] in classes:
-            obj_dict = models.storage.all(classes[args[0]])
+            objs = models.storage.iter(classes[args[0]])
         else:
             print("** class doesn't exist **")
             return False
-        for key in obj_dict:
-            obj_list.append(str(obj_dict[key]))
-        print("[", end="")
-        print(", ".join(obj_list), end="")
-        print("]")
+        separator = "["
+        for obj in objs:
+            print(separator + str(obj), end="")
+            separator = ", "
+        print("[]" if separator == "[" else "]")
 
     def do_update(self, arg):
         """Update an instance based on the class name, id, attribute & value"""
@@ -132,8 +163,8 @@ class HBNBCommand(cmd.Cmd):
             print("** class name missing **")
         elif args[0] in classes:
             if len(args) > 1:
-                k = args[0] + "." + args[1]
-                if k in models.storage.all():
+                obj = models.storage.get(args[0], args[1])
+                if obj is not None:
                     if len(args) > 2:
                         if len(args) > 3:
                             if args[0] == "Place":
@@ -147,8 +178,8 @@ class HBNBCommand(cmd.Cmd):
                                         args[3] = float(args[3])
                                     except:
                                         args[3] = 0.0
-                            setattr(models.storage.all()[k], args[2], args[3])
-                            models.storage.all()[k].save()
+                            setattr(obj, args[2], args[3])
+                            obj.save()
                         else:
                             print("** value missing **")
                     else:
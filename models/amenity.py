@@ -19,3 +19,12 @@ class Amenity(BaseModel, Base):
     def __init__(self, *args, **kwargs):
         """initializes Amenity"""
         super().__init__(*args, **kwargs)
+
+    if models.storage_t != 'db':
+        @property
+        def place_amenities(self):
+            """getter attribute returns the list of Place instances having
+            the amenity"""
+            from models.place import Place
+            return list(models.storage.related(Place, "amenity_ids",
+                                               self.id).values())
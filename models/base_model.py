@@ -23,7 +23,8 @@ class BaseModel:
     """The BaseModel class from which future classes will be derived"""
     if models.storage_t == "db":
         id = Column(String(60), primary_key=True)
-        created_at = Column(DateTime, default=datetime.utcnow)
+        # indexed for the (created_at, id) keyset pages of storage.query()
+        created_at = Column(DateTime, default=datetime.utcnow, index=True)
         updated_at = Column(DateTime, default=datetime.utcnow)
 
     def __init__(self, *args, **kwargs):
@@ -34,11 +35,11 @@ class BaseModel:
                     setattr(self, key, value)
             if kwargs.get("created_at", None) and type(self.created_at) is str:
                 self.created_at = datetime.strptime(kwargs["created_at"], time)
-            else:
+            elif type(kwargs.get("created_at", None)) is not datetime:
                 self.created_at = datetime.utcnow()
             if kwargs.get("updated_at", None) and type(self.updated_at) is str:
                 self.updated_at = datetime.strptime(kwargs["updated_at"], time)
-            else:
+            elif type(kwargs.get("updated_at", None)) is not datetime:
                 self.updated_at = datetime.utcnow()
             if kwargs.get("id", None) is None:
                 self.id = str(uuid.uuid4())
@@ -47,6 +48,57 @@ class BaseModel:
             self.created_at = datetime.utcnow()
             self.updated_at = self.created_at
 
+    @classmethod
+    def from_records(cls, records):
+        """returns a list of instances of cls built from records, the
+        dictionaries to_dict() returns, without running __init__ per
+        instance: timestamps are parsed as ISO 8601 and the attributes
+        go straight into __dict__"""
+        if models.storage_t == "db":
+            return [cls(**record) for record in records]
+        instances = []
+        new = object.__new__
+        parse = datetime.fromisoformat
+        now = datetime.utcnow
+        for record in records:
+            instance = new(cls)
+            attrs = instance.__dict__
+            attrs.update(record)
+            attrs.pop("__class__", None)
+            for name in ("created_at", "updated_at"):
+                value = attrs.get(name)
+                if type(value) is str:
+                    attrs[name] = parse(value)
+                elif type(value) is not datetime:
+                    attrs[name] = now()
+            if attrs.get("id") is None:
+                attrs["id"] = str(uuid.uuid4())
+            instances.append(instance)
+        return instances
+
+    @staticmethod
+    def new_record(attrs):
+        """returns a copy of attrs, the attributes of a new instance, with
+        id, created_at and updated_at filled in as __init__ does"""
+        record = dict(attrs)
+        record.pop("__class__", None)
+        now = datetime.utcnow()
+        for name in ("created_at", "updated_at"):
+            value = record.get(name)
+            if value and type(value) is str:
+                record[name] = datetime.fromisoformat(value)
+            elif type(value) is not datetime:
+                record[name] = now
+        if record.get("id") is None:
+            record["id"] = str(uuid.uuid4())
+        return record
+
+    if models.storage_t != "db":
+        def __setattr__(self, name, value):
+            """marks the instance dirty in storage and sets an attribute"""
+            models.storage.mark_dirty(self)
+            object.__setattr__(self, name, value)
+
     def __str__(self):
         """String representation of the BaseModel class"""
         return "[{:s}] ({:s}) {}".format(self.__class__.__name__, self.id,
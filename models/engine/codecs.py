@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+"""
+Contains the codecs FileStorage persists its records with
+
+A codec turns (key, record) pairs, records being BaseModel.to_dict()
+dictionaries, into the bytes of the storage file and back. Decoded
+records may hold created_at and updated_at as datetime objects rather
+than strings. The codec is picked with HBNB_FILE_CODEC (json by default).
+"""
+
+from array import array
+from datetime import datetime, timedelta
+import json
+import struct
+import sys
+
+time = "%Y-%m-%dT%H:%M:%S.%f"
+epoch = datetime(1970, 1, 1)
+
+
+def _default(value):
+    """JSON encoding of the datetime objects of decoded records"""
+    if isinstance(value, datetime):
+        return value.strftime(time)
+    raise TypeError("{!r} is not JSON serializable".format(value))
+
+
+class JSONCodec:
+    """one JSON object, one "key": {record} line per record"""
+    name = "json"
+    extension = ".json"
+    # records can be encoded one at a time and spliced together
+    incremental = True
+
+    @staticmethod
+    def fragment(key, record):
+        """returns the encoded "key": {record} line of a record"""
+        return json.dumps(key) + ": " + json.dumps(record, default=_default)
+
+    @staticmethod
+    def join(fragments):
+        """returns the file content made of the encoded fragments"""
+        return ("{\n" + ",\n".join(fragments) + "\n}\n").encode()
+
+    def encode(self, records):
+        """returns the file content holding the (key, record) pairs"""
+        return self.join(self.fragment(key, record)
+                         for key, record in records)
+
+    @staticmethod
+    def decode(data):
+        """returns the records of the file content data by key"""
+        return json.loads(data)
+
+
+class BinaryCodec:
+    """struct-packed columns with a shared string table
+
+    Records are grouped in blocks of one class and one set of attribute
+    names and types. Each block stores one packed array per attribute:
+    strings as indexes into a table where every distinct string (ids,
+    class and attribute names, values) is kept once, created_at and
+    updated_at as integer microseconds since the epoch (decoded to
+    datetime objects), numbers as 64-bit integers or doubles, anything
+    else as JSON text.
+
+    Layout, little-endian:
+        b"HBNB" version:B table_size:I table (strings joined by NUL)
+        blocks:I, then per block
+            class:I count:I columns:H (name:I type:c)*columns
+            one array of count values per column that has data
+    """
+    name = "binary"
+    extension = ".hbnb"
+    incremental = False
+    magic = b"HBNB\x01"
+    # column type code -> array typecode, None for types without data
+    arrays = {b"s": "I", b"t": "q", b"i": "q", b"f": "d", b"b": "B",
+              b"j": "I", b"n": None}
+    timestamps = ("created_at", "updated_at")
+
+    def _type(self, name, value):
+        """returns the column type code of an attribute value"""
+        if value is None:
+            return b"n"
+        kind = type(value)
+        if kind is datetime and name in self.timestamps:
+            return b"t"
+        if kind is str:
+            if name in self.timestamps and len(value) == 26:
+                try:
+                    datetime.fromisoformat(value)
+                    return b"t"
+                except ValueError:
+                    pass
+            return b"j" if "\0" in value else b"s"
+        if kind is bool:
+            return b"b"
+        if kind is int and -2 ** 63 <= value < 2 ** 63:
+            return b"i"
+        if kind is float:
+            return b"f"
+        return b"j"
+
+    @staticmethod
+    def _datetime(value):
+        """returns a timestamp attribute value as a datetime"""
+        if isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(value)
+
+    def encode(self, records):
+        """returns the file content holding the (key, record) pairs"""
+        strings = {}
+        intern = strings.setdefault
+        blocks = {}
+        for key, record in records:
+            cls = record["__class__"]
+            if key != cls + "." + record.get("id", ""):
+                raise ValueError("key {} does not match its record"
+                                 .format(key))
+            schema = tuple((name, self._type(name, value))
+                           for name, value in record.items()
+                           if name != "__class__")
+            blocks.setdefault((cls, schema), []).append(record)
+        out = [b""]
+        out.append(struct.pack("<I", len(blocks)))
+        for (cls, schema), rows in blocks.items():
+            out.append(struct.pack("<IIH", intern(cls, len(strings)),
+                                   len(rows), len(schema)))
+            for name, code in schema:
+                out.append(struct.pack("<Ic", intern(name, len(strings)),
+                                       code))
+            for name, code in schema:
+                if code == b"s":
+                    values = [intern(row[name], len(strings))
+                              for row in rows]
+                elif code == b"j":
+                    values = [intern(json.dumps(row[name]), len(strings))
+                              for row in rows]
+                elif code == b"t":
+                    values = [(self._datetime(row[name]) - epoch) //
+                              timedelta(microseconds=1) for row in rows]
+                elif code == b"n":
+                    continue
+                else:
+                    values = [row[name] for row in rows]
+                column = array(self.arrays[code], values)
+                if sys.byteorder == "big":
+                    column.byteswap()
+                out.append(column.tobytes())
+        table = "\0".join(strings).encode()
+        out[0] = self.magic + struct.pack("<I", len(table)) + table
+        return b"".join(out)
+
+    def decode(self, data):
+        """returns the records of the file content data by key"""
+        try:
+            return self._decode(memoryview(data))
+        except (struct.error, IndexError) as e:
+            raise ValueError("truncated binary storage file") from e
+
+    def _decode(self, data):
+        """decode() of a memoryview"""
+        if bytes(data[:5]) != self.magic:
+            raise ValueError("not a binary storage file")
+        size, = struct.unpack_from("<I", data, 5)
+        offset = 9 + size
+        strings = str(data[9:offset], "utf-8").split("\0")
+        blocks, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        records = {}
+        for i in range(blocks):
+            cls, count, width = struct.unpack_from("<IIH", data, offset)
+            offset += 10
+            schema = []
+            for j in range(width):
+                name, code = struct.unpack_from("<Ic", data, offset)
+                offset += 5
+                schema.append((strings[name], code))
+            names = ["__class__"]
+            columns = [[strings[cls]] * count]
+            for name, code in schema:
+                typecode = self.arrays[code]
+                if typecode is None:
+                    values = [None] * count
+                else:
+                    column = array(typecode)
+                    end = offset + column.itemsize * count
+                    column.frombytes(data[offset:end])
+                    offset = end
+                    if sys.byteorder == "big":
+                        column.byteswap()
+                    values = self._values(code, column, strings)
+                names.append(name)
+                columns.append(values)
+            for values in zip(*columns):
+                record = dict(zip(names, values))
+                records[record["__class__"] + "." + record["id"]] = record
+        return records
+
+    @staticmethod
+    def _values(code, column, strings):
+        """returns the attribute values stored in a packed column"""
+        if code == b"s":
+            return list(map(strings.__getitem__, column))
+        if code == b"j":
+            return [json.loads(strings[i]) for i in column]
+        if code == b"t":
+            return [epoch + timedelta(microseconds=micros)
+                    for micros in column]
+        if code == b"b":
+            return [bool(value) for value in column]
+        return column.tolist()
+
+
+codecs = {codec.name: codec for codec in (JSONCodec(), BinaryCodec())}
+
+
+def codec_for(path):
+    """returns the codec of a storage file, picked by its extension"""
+    for codec in codecs.values():
+        if path.endswith(codec.extension):
+            return codec
+    return codecs["json"]
+
+
+def convert(source, destination):
+    """rewrites the storage file source as destination, each in the codec
+    of its file extension, and returns the number of records"""
+    with open(source, 'rb') as f:
+        records = codec_for(source).decode(f.read())
+    with open(destination, 'wb') as f:
+        f.write(codec_for(destination).encode(records.items()))
+    return len(records)
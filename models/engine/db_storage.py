@@ -3,21 +3,190 @@
 Contains the class DBStorage
 """
 
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain, islice
 import models
 from models.amenity import Amenity
 from models.base_model import BaseModel, Base
 from models.city import City
+from models.engine.query import DBQuery
+from models.engine.spatial import bounding_box, cell_range, cluster
+from models.engine.spatial import cluster_degrees, cluster_level, merge
+from models.engine.spatial import nearest, rank
+from models.engine.versions import Versions
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
+from math import cos, radians
 from os import getenv
 import sqlalchemy
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy import Integer, bindparam, cast, create_engine, func
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy import event
+from sqlalchemy.orm import Session, scoped_session, selectinload
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from threading import Lock, Thread
+from time import monotonic, perf_counter
 
 classes = {"Amenity": Amenity, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
+# rows per INSERT or UPDATE executemany of bulk_new() and bulk_update()
+bulk_chunk = int(getenv("HBNB_BULK_CHUNK", 500))
+# rows fetched at a time by iter()
+iter_batch = int(getenv("HBNB_ITER_BATCH", 1000))
+# seconds after which count() recounts the rows in the background, to take
+# in the changes of other processes
+count_reconcile = float(getenv("HBNB_COUNT_RECONCILE", 60))
+# times a count overlapping a commit of this process is run again
+count_retries = int(getenv("HBNB_COUNT_RETRIES", 3))
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool keeping count of the checkouts, timeouts and time spent
+    waiting for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        """Instantiate a TimedQueuePool"""
+        super().__init__(*args, **kwargs)
+        self.stats_lock = Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait = 0.0
+
+    def recreate(self):
+        """returns a new pool with the same settings"""
+        pool = super().recreate()
+        pool.checkouts, pool.timeouts = self.checkouts, self.timeouts
+        pool.wait = self.wait
+        return pool
+
+    def _do_get(self):
+        """checks out a connection, timing the wait for it"""
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except sqlalchemy.exc.TimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            with self.stats_lock:
+                self.checkouts += 1
+                self.wait += perf_counter() - start
+
+
+def _engine_options(url):
+    """returns the create_engine() arguments set by the HBNB_MYSQL_*
+    environment variables for the database url"""
+    options = {"echo": getenv("HBNB_MYSQL_ECHO") == "1"}
+    isolation = getenv("HBNB_MYSQL_ISOLATION")
+    if isolation:
+        options["isolation_level"] = isolation
+    # in-memory SQLite keeps one connection per thread, without a pool
+    if url.startswith("sqlite") and url.rstrip("/").endswith(
+            ("sqlite:", ":memory:")):
+        return options
+    options.update({
+        "poolclass": TimedQueuePool,
+        "pool_size": int(getenv("HBNB_MYSQL_POOL_SIZE", 5)),
+        "max_overflow": int(getenv("HBNB_MYSQL_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(getenv("HBNB_MYSQL_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(getenv("HBNB_MYSQL_POOL_RECYCLE", 3600)),
+        "pool_pre_ping": getenv("HBNB_MYSQL_POOL_PRE_PING", "1") == "1"})
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def _loaders(cls, load):
+    """returns the selectinload() options loading the relationships named
+    in load, dotted paths from cls such as "places.reviews" for a City"""
+    options = []
+    for path in load or ():
+        option, owner = None, cls
+        for name in path.split("."):
+            attr = getattr(owner, name)
+            if option is None:
+                option = selectinload(attr)
+            else:
+                option = option.selectinload(attr)
+            owner = attr.property.mapper.class_
+        options.append(option)
+    return options
+
+
+def _chunks(rows, size):
+    """yields lists of up to size items of the iterable rows"""
+    rows = iter(rows)
+    chunk = list(islice(rows, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(rows, size))
+
+
+def _links(cls):
+    """returns the (column of cls, column of the other class) of the link
+    table of each many-to-many relationship of cls, by the name of the
+    list of ids it stands for in file mode, such as "amenity_ids" for a
+    Place"""
+    return {relationship.mapper.class_.__name__.lower() + "_ids":
+            _link_columns(cls, relationship)
+            for relationship in sqlalchemy.inspect(cls).relationships
+            if relationship.secondary is not None}
+
+
+def _link_columns(cls, relationship):
+    """returns the (column of cls, column of the other class) of the link
+    table of a many-to-many relationship of cls"""
+    own = other = None
+    for column in relationship.secondary.columns:
+        for key in column.foreign_keys:
+            if key.column.table is cls.__table__:
+                own = column
+            else:
+                other = column
+    return own, other
+
+
+def _link_relationship(cls, other):
+    """returns the many-to-many relationship of cls with class other"""
+    for relationship in sqlalchemy.inspect(cls).relationships:
+        if (relationship.secondary is not None and
+                relationship.mapper.class_ is other):
+            return relationship
+    raise ValueError("{} is not linked to {}".format(cls.__name__,
+                                                     other.__name__))
+
+
+def _change(obj):
+    """returns the class name, the id and the (foreign key, value) pairs,
+    before and after the pending change, of obj"""
+    state = sqlalchemy.inspect(obj)
+    related = []
+    for key in obj.__table__.foreign_keys:
+        field = key.parent.name
+        history = state.attrs[field].history
+        for value in chain(history.added, history.unchanged,
+                           history.deleted):
+            if (field, value) not in related:
+                related.append((field, value))
+    return (obj.__class__.__name__, obj.id, related)
+
+
+def _row_change(cls, record, old=None):
+    """returns the change of a row of class cls inserted or updated by
+    bulk_new() or bulk_update(), as _change() does; old holds the
+    foreign key values of an updated row before the update"""
+    related = []
+    for key in cls.__table__.foreign_keys:
+        name = key.parent.name
+        for values in (record, old or {}):
+            if name in values and (name, values[name]) not in related:
+                related.append((name, values[name]))
+    return (cls.__name__, record["id"], related)
 
 
 class DBStorage:
@@ -26,38 +195,559 @@ class DBStorage:
     __session = None
 
     def __init__(self):
-        """Instantiate a DBStorage object"""
+        """Instantiate a DBStorage object, on the MySQL database of the
+        HBNB_MYSQL_* variables or on the database URL HBNB_DB_URL (such as
+        sqlite:///hbnb.db)"""
         HBNB_MYSQL_USER = getenv('HBNB_MYSQL_USER')
         HBNB_MYSQL_PWD = getenv('HBNB_MYSQL_PWD')
         HBNB_MYSQL_HOST = getenv('HBNB_MYSQL_HOST')
         HBNB_MYSQL_DB = getenv('HBNB_MYSQL_DB')
         HBNB_ENV = getenv('HBNB_ENV')
-        self.__engine = create_engine('mysql+mysqldb://{}:{}@{}/{}'.
-                                      format(HBNB_MYSQL_USER,
-                                             HBNB_MYSQL_PWD,
-                                             HBNB_MYSQL_HOST,
-                                             HBNB_MYSQL_DB))
+        url = getenv('HBNB_DB_URL') or 'mysql+mysqldb://{}:{}@{}/{}'.format(
+            HBNB_MYSQL_USER, HBNB_MYSQL_PWD, HBNB_MYSQL_HOST, HBNB_MYSQL_DB)
+        self.__engine = create_engine(url, **_engine_options(url))
+        timeout = int(getenv('HBNB_MYSQL_STATEMENT_TIMEOUT', 0))
+        if timeout and self.__engine.dialect.name == "mysql":
+            @event.listens_for(self.__engine, "connect")
+            def set_timeout(connection, record):
+                """limits the run time of statements, in milliseconds"""
+                cursor = connection.cursor()
+                cursor.execute("SET SESSION max_execution_time = {:d}"
+                               .format(timeout))
+                cursor.close()
         if HBNB_ENV == "test":
             Base.metadata.drop_all(self.__engine)
+        # functions called with the changes of each commit
+        self.__listeners = []
+        # version numbers of the collections, bumped on commit
+        self.__versions = Versions()
+        # dictionary - number of rows by class name, kept up to date by
+        # the commits of this process, or None until counted
+        self.__counts = None
+        # monotonic time of the last count, and whether a background
+        # recount is running
+        self.__counted = 0.0
+        self.__recounting = False
+        # list - per count running, the changes of the number of rows
+        # committed since its snapshot, by class name
+        self.__collecting = []
+        # dictionaries - by class name, number of starts and ends of the
+        # commits of this process changing its rows, and of those under way
+        self.__commits = {}
+        self.__busy = {}
+        self.__counts_lock = Lock()
 
-    def all(self, cls=None):
-        """query on the current database session"""
+    def all(self, cls=None, load=None):
+        """query on the current database session; the relationships named
+        in load are loaded for all the objects of cls in one query each"""
         new_dict = {}
         for clss in classes:
             if cls is None or cls is classes[clss] or cls is clss:
-                objs = self.__session.query(classes[clss]).all()
+                query = self.__session.query(classes[clss])
+                if cls is not None:
+                    query = query.options(*_loaders(classes[clss], load))
+                objs = query.all()
                 for obj in objs:
                     key = obj.__class__.__name__ + '.' + obj.id
                     new_dict[key] = obj
         return (new_dict)
 
+    def iter(self, cls=None, batch_size=None, load=None):
+        """yields the objects of class cls (class or class name), or of
+        all classes, fetching batch_size rows at a time from a server-side
+        cursor instead of loading whole tables; the relationships named in
+        load are loaded with one query per batch; there are none for a
+        class without a table, such as BaseModel"""
+        if cls is not None:
+            cls = classes.get(cls if isinstance(cls, str) else cls.__name__)
+            if cls is None:
+                return
+        for clss in classes.values() if cls is None else (cls,):
+            query = select(clss).execution_options(
+                yield_per=batch_size or iter_batch)
+            if cls is not None:
+                query = query.options(*_loaders(clss, load))
+            for obj in self.__session.scalars(query):
+                yield obj
+
+    def on_change(self, listener):
+        """registers listener, called once committed with the class name,
+        the id and the (foreign key, value) pairs, before and after the
+        change, of each object inserted, updated or deleted, such as
+        ("City", id, [("state_id", state_id)])"""
+        self.__listeners.append(listener)
+
+    def versions(self):
+        """returns the Versions of the collections of objects, see
+        models.engine.versions"""
+        return self.__versions
+
+    def _flushed(self, session, context):
+        """records the changes written by a flush of session, for the
+        versions and the listeners on commit"""
+        changes = session.info.setdefault("changes", [])
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, BaseModel):
+                changes.append(_change(obj))
+        counts = session.info.setdefault("counts", {})
+        for objs, change in ((session.new, 1), (session.deleted, -1)):
+            for obj in objs:
+                if isinstance(obj, BaseModel):
+                    name = obj.__class__.__name__
+                    counts[name] = counts.get(name, 0) + change
+        if "committing" in session.info:
+            self._touched(session, counts)
+
+    def _committing(self, session):
+        """records that session is committing, with the classes whose
+        rows it adds or deletes; those of the flush of the commit are
+        added by _flushed()"""
+        session.info["committing"] = set()
+        self._touched(session, chain(
+            session.info.get("counts", ()),
+            (obj.__class__.__name__ for obj in chain(session.new,
+                                                     session.deleted)
+             if isinstance(obj, BaseModel))))
+
+    def _touched(self, session, names):
+        """records that the commit of session changes the number of rows
+        of the classes of names, for the counts running"""
+        committing = session.info["committing"]
+        with self.__counts_lock:
+            for name in set(names) - committing:
+                committing.add(name)
+                self.__commits[name] = self.__commits.get(name, 0) + 1
+                self.__busy[name] = self.__busy.get(name, 0) + 1
+
+    def _committed(self, session):
+        """bumps the versions and calls the listeners on the changes
+        committed by session"""
+        for change in session.info.pop("changes", ()):
+            self.__versions.changed(*change)
+            for listener in self.__listeners:
+                listener(*change)
+        counts = session.info.pop("counts", None)
+        if counts:
+            with self.__counts_lock:
+                for kept in [self.__counts] + self.__collecting:
+                    if kept is not None:
+                        for name, change in counts.items():
+                            if name in kept:
+                                kept[name] += change
+
+    def _transaction_ended(self, session, transaction):
+        """records that the commit of session, if any, is over"""
+        if transaction.parent is None:
+            names = session.info.pop("committing", None)
+            if names:
+                with self.__counts_lock:
+                    for name in names:
+                        self.__commits[name] += 1
+                        self.__busy[name] -= 1
+
+    def _rolled_back(self, session):
+        """forgets the changes rolled back by session"""
+        session.info.pop("changes", None)
+        session.info.pop("counts", None)
+
+    def query(self, cls):
+        """returns a query on the rows of class cls (class or class name),
+        see models.engine.query"""
+        if isinstance(cls, str):
+            cls = classes[cls]
+        return DBQuery(self.__session, cls, _links(cls))
+
+    def near(self, cls, lat, lng, radius_km, limit=None):
+        """returns the (distance in km, object) pairs of the rows of class
+        cls (class or class name) within radius_km of (lat, lng), nearest
+        first, at most limit of them; the bounding box of the circle is
+        selected in SQL, on the (latitude, longitude) index"""
+        return self._located(cls, bounding_box(lat, lng, radius_km),
+                             (lat, lng), radius_km, limit)
+
+    def within(self, cls, south, west, north, east, limit=None):
+        """returns the (distance in km, object) pairs of the rows of class
+        cls (class or class name) within the box, in degrees, nearest to
+        its center first, at most limit of them"""
+        return self._located(cls, (south, west, north, east),
+                             ((south + north) / 2, (west + east) / 2),
+                             None, limit)
+
+    def clusters(self, cls, south, west, north, east, zoom):
+        """returns the aggregates of the rows of class cls (class or class
+        name) in the cells of the zoom level overlapping the box, in
+        degrees, see models.engine.spatial.cluster(); computed with one
+        GROUP BY on the cells, over the rows of the box widened to whole
+        cells"""
+        if isinstance(cls, str):
+            cls = classes[cls]
+        level = cluster_level(zoom)
+        size = cluster_degrees(level)
+        first, last, cols = cell_range(size, south, west, north, east)
+        if east - west < 360:
+            west = (west + 180) // size * size - 180
+            east = ((east + 180) // size + 1) * size - 180
+        box = (first * size - 90, west, (last + 1) * size - 90, east)
+        if self.__engine.dialect.name == "sqlite":
+            def floor(value):
+                """SQLite floor of a positive value"""
+                return cast(value, Integer)
+        else:
+            floor = func.floor
+        row = floor((cls.latitude + 90) / size)
+        col = floor((cls.longitude + 180) / size)
+        price = cls.price_by_night
+        statement = select(
+            row, col, func.count(), func.sum(cls.latitude),
+            func.sum(cls.longitude), func.count(price), func.sum(price),
+            func.min(price)).where(*self._box_criteria(cls, *box)) \
+            .group_by(row, col)
+        rows, total, cols = int(180 / size), int(360 / size), set(cols)
+        cells = {}
+        for record in self.__session.execute(statement):
+            # points on the north pole and the antimeridian fall in the
+            # last row and the first column, as in a ClusterPyramid
+            key = (min(int(record[0]), rows - 1), int(record[1]) % total)
+            if not first <= key[0] <= last or key[1] not in cols:
+                continue
+            aggregate = [record[2], record[3], record[4], record[5],
+                         record[6] or 0, record[7]]
+            if key in cells:
+                merge(cells[key], aggregate)
+            else:
+                cells[key] = aggregate
+        return [cluster(level, key, aggregate)
+                for key, aggregate in cells.items()]
+
+    @staticmethod
+    def _box_criteria(cls, south, west, north, east):
+        """returns the SQL expressions keeping the rows of class cls in
+        the box, in degrees"""
+        criteria = [cls.latitude.between(south, north)]
+        if east - west < 360:
+            # a box across the antimeridian is two ranges of longitudes
+            ranges = [(max(west, -180), min(east, 180))]
+            if west < -180:
+                ranges.append((west + 360, 180))
+            if east > 180:
+                ranges.append((-180, east - 360))
+            criteria.append(or_(*[cls.longitude.between(low, high)
+                                  for low, high in ranges]))
+        return criteria
+
+    def _located(self, cls, box, center, radius_km, limit):
+        """returns the (distance in km from center, object) pairs of the
+        rows of class cls in box, within radius_km if it is not None,
+        nearest first"""
+        if isinstance(cls, str):
+            cls = classes[cls]
+        objs = {obj.id: obj for obj in self.__session.scalars(
+            select(cls).where(*self._box_criteria(cls, *box)))}
+        rows = [(obj.id, radians(obj.latitude), radians(obj.longitude))
+                for obj in objs.values()]
+        ids, lats, lngs = zip(*rows) if rows else ((), (), ())
+        pairs = rank(center[0], center[1], ids, lats, lngs,
+                     [cos(phi) for phi in lats], radius_km)
+        return [(distance, objs[id])
+                for distance, id in nearest(pairs, limit)]
+
+    def get(self, cls, id, load=None):
+        """returns the object of class cls (class or class name) with the
+        given id by primary key, or None if there is no such row; the
+        relationships named in load, such as ["cities"] for a State, are
+        loaded with one query each"""
+        if isinstance(cls, str):
+            cls = classes.get(cls)
+        if cls is None or id is None:
+            return None
+        if not load:
+            return self.__session.get(cls, id)
+        return self.__session.scalars(select(cls).where(cls.id == id).options(
+            *_loaders(cls, load))).first()
+
+    def count(self, cls=None):
+        """returns the number of rows in the table of class cls (class or
+        class name), or in all tables if cls is None, from counts kept up
+        to date by the commits of this process and recounted in the
+        background every count_reconcile seconds"""
+        if cls is None:
+            return sum(self.count(clss) for clss in classes)
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        if cls not in classes:
+            return 0
+        counts = self.__counts
+        if counts is None:
+            counts = self._recount()
+        elif monotonic() - self.__counted > count_reconcile:
+            self._reconcile()
+        return counts[cls]
+
+    @staticmethod
+    def _count_rows(session, names):
+        """returns the number of rows of each class of names seen by
+        session"""
+        return {name: session.scalar(select(func.count())
+                                     .select_from(classes[name]))
+                for name in names}
+
+    def _count_snapshot(self, session, fresh=False):
+        """counts the rows of each class in session and returns the counts,
+        the changes of the number of rows committed by this process since
+        each count and the names of the classes whose count may be off;
+        the lock is not held while counting, so commits never wait for a
+        count: a class whose commits started or ended while it was
+        counted, which may or may not be in its count, is counted again,
+        up to count_retries times, in a new transaction if fresh is True
+        (the session is then rolled back), and is off if that fails"""
+        counts, changes = {}, {}
+        names = list(classes)
+        with self.__counts_lock:
+            self.__collecting.append(changes)
+        try:
+            for attempt in range(count_retries + 1):
+                if attempt and fresh:
+                    session.rollback()
+                with self.__counts_lock:
+                    commits = {name: self.__commits.get(name, 0)
+                               for name in names
+                               if not self.__busy.get(name)}
+                counts.update(self._count_rows(session, names))
+                with self.__counts_lock:
+                    for name in names:
+                        changes[name] = 0
+                    names = [name for name in names
+                             if commits.get(name) !=
+                             self.__commits.get(name, 0)]
+                if not names:
+                    break
+        finally:
+            with self.__counts_lock:
+                self.__collecting.remove(changes)
+        return counts, changes, set(names)
+
+    def _set_counts(self, counts, changes, off):
+        """replaces the counts with counts plus changes, by class name,
+        keeping the current counts of the classes of off if there are
+        any; called holding the lock"""
+        for name, change in changes.items():
+            counts[name] += change
+        if self.__counts is not None:
+            for name in off:
+                counts[name] = self.__counts[name]
+        self.__counts = counts
+
+    def _recount(self):
+        """counts the rows of each class in the current session, leaving
+        out its uncommitted changes, and returns the counts"""
+        counts, changes, off = self._count_snapshot(self.__session())
+        for name, change in self.__session.info.get("counts", {}).items():
+            counts[name] -= change
+        with self.__counts_lock:
+            self._set_counts(counts, changes, off)
+            self.__counted = monotonic()
+        return counts
+
+    def _reconcile(self):
+        """starts recounting the rows in a background thread, unless one
+        is running"""
+        with self.__counts_lock:
+            if self.__recounting:
+                return
+            self.__recounting = True
+            self.__counted = monotonic()
+        Thread(target=self._recount_background, daemon=True).start()
+
+    def _recount_background(self):
+        """replaces the counts with the rows counted in a session of its
+        own, plus the changes committed since its snapshot; the classes
+        whose count is off keep their counts"""
+        counts = None
+        try:
+            with Session(self.__engine) as session:
+                counts, changes, off = self._count_snapshot(session, True)
+        except sqlalchemy.exc.SQLAlchemyError:
+            pass
+        with self.__counts_lock:
+            self.__recounting = False
+            if counts is not None:
+                self._set_counts(counts, changes, off)
+
+    def bulk_new(self, cls, rows, chunk_size=None):
+        """inserts rows, dictionaries of attributes of new objects of class
+        cls (class or class name), with one INSERT executemany per chunk
+        of chunk_size rows, bypassing the ORM; id, created_at and
+        updated_at are filled in as BaseModel does; returns the ids of the
+        rows"""
+        if isinstance(cls, str):
+            cls = classes[cls]
+        table = cls.__table__
+        columns = set(table.columns.keys())
+        ids = []
+        for chunk in _chunks(rows, chunk_size or bulk_chunk):
+            # rows by set of columns, which executemany needs to be equal
+            groups = {}
+            for row in chunk:
+                record = BaseModel.new_record(row)
+                ids.append(record["id"])
+                self.__session.info.setdefault("changes", []).append(
+                    _row_change(cls, record))
+                values = {name: value for name, value in record.items()
+                          if name in columns}
+                groups.setdefault(frozenset(values), []).append(values)
+            for values in groups.values():
+                self.__session.execute(insert(table), values)
+            counts = self.__session.info.setdefault("counts", {})
+            counts[cls.__name__] = counts.get(cls.__name__, 0) + len(chunk)
+        self.save()
+        return ids
+
+    def bulk_update(self, cls, rows, chunk_size=None):
+        """updates the rows of class cls (class or class name) with the
+        attributes of rows, dictionaries holding the id of a row, with one
+        UPDATE executemany per chunk of chunk_size rows, bypassing the
+        ORM; updated_at is set to the current time unless given; returns
+        the number of rows updated"""
+        if isinstance(cls, str):
+            cls = classes[cls]
+        table = cls.__table__
+        columns = set(table.columns.keys()) - {"id"}
+        now = datetime.utcnow()
+        count = 0
+        updated = set()
+        keys = [key.parent for key in table.foreign_keys]
+        for chunk in _chunks(rows, chunk_size or bulk_chunk):
+            if any(row.get("id") is None for row in chunk):
+                raise ValueError("bulk_update() rows need an id")
+            # the foreign keys before the update, for the listeners of
+            # the collections the rows leave
+            changed = [column for column in keys
+                       if any(column.name in row for row in chunk)]
+            old = {}
+            if changed:
+                old = {record.id: record._asdict() for record in
+                       self.__session.execute(select(table.c.id, *changed)
+                                              .where(table.c.id.in_(
+                                                  [row["id"]
+                                                   for row in chunk])))}
+            groups = {}
+            for row in chunk:
+                updated.add(row["id"])
+                self.__session.info.setdefault("changes", []).append(
+                    _row_change(cls, row, old.get(row["id"])))
+                values = {"b_id": row["id"], "b_updated_at": now}
+                for name, value in row.items():
+                    if name in ("created_at", "updated_at") and \
+                       type(value) is str:
+                        value = datetime.fromisoformat(value)
+                    if name in columns:
+                        values["b_" + name] = value
+                groups.setdefault(frozenset(values), []).append(values)
+            for names, values in groups.items():
+                statement = update(table).where(
+                    table.c.id == bindparam("b_id")).values({
+                        name[2:]: bindparam(name)
+                        for name in names if name != "b_id"})
+                count += self.__session.execute(statement, values).rowcount
+        for obj in list(self.__session.identity_map.values()):
+            if isinstance(obj, cls) and obj.id in updated:
+                self.__session.expire(obj)
+        self.save()
+        return count
+
+    def link(self, obj, others):
+        """inserts the rows of the link table linking obj to others,
+        objects of one class, such as the place_amenity rows of a Place
+        and Amenity objects, with one INSERT for those not linked yet,
+        bypassing the collections of the ORM, and commits; returns the
+        number of links made"""
+        if not others:
+            return 0
+        relationship, own, other, ids = self._link_rows(obj, others)
+        linked = set(self.__session.scalars(select(other).where(
+            own == obj.id, other.in_(ids))))
+        ids = [id for id in ids if id not in linked]
+        if ids:
+            self.__session.execute(insert(own.table), [
+                {own.name: obj.id, other.name: id} for id in ids])
+            self._relinked(obj, relationship, others, ids)
+        self.save()
+        return len(ids)
+
+    def unlink(self, obj, others):
+        """deletes the rows of the link table linking obj to others,
+        objects of one class, with one DELETE, and commits; returns the
+        number of links removed"""
+        if not others:
+            return 0
+        relationship, own, other, ids = self._link_rows(obj, others)
+        ids = list(self.__session.scalars(select(other).where(
+            own == obj.id, other.in_(ids))))
+        if ids:
+            self.__session.execute(own.table.delete().where(
+                own == obj.id, other.in_(ids)))
+            self._relinked(obj, relationship, others, ids)
+        self.save()
+        return len(ids)
+
+    def _link_rows(self, obj, others):
+        """returns the relationship of the class of obj with the class of
+        others, the (own, other) columns of its link table and the ids of
+        others, flushing the session so that they all have rows"""
+        cls = obj.__class__
+        relationship = _link_relationship(cls, others[0].__class__)
+        own, other = _link_columns(cls, relationship)
+        self.__session.flush()
+        return (relationship, own, other,
+                list(dict.fromkeys(o.id for o in others)))
+
+    def _relinked(self, obj, relationship, others, ids):
+        """records the change of the links of obj to the objects with ids
+        for the listeners, and expires the collections holding them"""
+        field = relationship.mapper.class_.__name__.lower() + "_ids"
+        self.__session.info.setdefault("changes", []).append(
+            (obj.__class__.__name__, obj.id, [(field, id) for id in ids]))
+        if obj in self.__session:
+            self.__session.expire(obj, [relationship.key])
+        for reverse in sqlalchemy.inspect(relationship.mapper.class_) \
+                .relationships:
+            if reverse.secondary is relationship.secondary:
+                for other in others:
+                    if other.id in ids and other in self.__session:
+                        self.__session.expire(other, [reverse.key])
+
     def new(self, obj):
         """add the object to the current database session"""
         self.__session.add(obj)
 
     def save(self):
-        """commit all changes of the current database session"""
-        self.__session.commit()
+        """commit all changes of the current database session, unless
+        inside batch() on this session"""
+        if not self.__session.info.get("batch"):
+            self.__session.commit()
+
+    @contextmanager
+    def batch(self):
+        """context in which save() calls of the current thread are
+        deferred to a single commit of its session on exit; on exception,
+        the session is rolled back instead"""
+        info = self.__session.info
+        if info.get("batch"):
+            yield self
+            return
+        info["batch"] = True
+        try:
+            yield self
+        except BaseException:
+            info.pop("batch", None)
+            self.__session.rollback()
+            raise
+        info.pop("batch", None)
+        try:
+            self.__session.commit()
+        except BaseException:
+            self.__session.rollback()
+            raise
 
     def delete(self, obj=None):
         """delete from the current database session obj if not None"""
@@ -65,12 +755,39 @@ class DBStorage:
             self.__session.delete(obj)
 
     def reload(self):
-        """reloads data from the database"""
+        """reloads data from the database, starting a new epoch of
+        versions; rows are counted again on the next count()"""
+        self.__versions.reset()
+        self.__counts = None
         Base.metadata.create_all(self.__engine)
         sess_factory = sessionmaker(bind=self.__engine, expire_on_commit=False)
+        event.listen(sess_factory, "after_flush", self._flushed)
+        event.listen(sess_factory, "before_commit", self._committing)
+        event.listen(sess_factory, "after_commit", self._committed)
+        event.listen(sess_factory, "after_transaction_end",
+                     self._transaction_ended)
+        event.listen(sess_factory, "after_rollback", self._rolled_back)
         Session = scoped_session(sess_factory)
         self.__session = Session
 
+    def stats(self):
+        """returns the counters of the connection pool"""
+        pool = self.__engine.pool
+        if not isinstance(pool, TimedQueuePool):
+            return {"pool": pool.status()}
+        with pool.stats_lock:
+            checkouts, timeouts, wait = (pool.checkouts, pool.timeouts,
+                                         pool.wait)
+        return {"pool_size": pool.size(),
+                "pool_checked_in": pool.checkedin(),
+                "pool_checked_out": pool.checkedout(),
+                "pool_overflow": max(pool.overflow(), 0),
+                "pool_checkouts": checkouts,
+                "pool_timeouts": timeouts,
+                "pool_wait_seconds": wait,
+                "pool_wait_seconds_average":
+                    wait / checkouts if checkouts else 0.0}
+
     def close(self):
         """call remove() method on the private session attribute"""
         self.__session.remove()
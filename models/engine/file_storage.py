@@ -3,10 +3,23 @@
 Contains the FileStorage class
 """
 
+from contextlib import contextmanager
+from datetime import datetime
 import json
+import mmap
+from os import getenv, path, remove, replace, stat
+from threading import Lock, Thread, local
+from time import perf_counter
+import re
+from types import MappingProxyType
 from models.amenity import Amenity
 from models.base_model import BaseModel
 from models.city import City
+from models.engine.codecs import codecs, JSONCodec
+from models.engine.compact import CompactModel, compact_class
+from models.engine.query import FileQuery, SortedIndex
+from models.engine.spatial import ClusterPyramid, GridIndex
+from models.engine.versions import Versions
 from models.place import Place
 from models.review import Review
 from models.state import State
@@ -14,57 +27,922 @@ from models.user import User
 
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
+# foreign keys with a reverse index, per class name; a list of ids is
+# indexed under each of them
+foreign_keys = {"City": ("state_id",),
+                "Place": ("city_id", "user_id", "amenity_ids"),
+                "Review": ("place_id", "user_id")}
+# many-to-many links, by class name: the list of ids naming the linked
+# objects, by their class name; the reverse index of the list gives the
+# objects linked to each of them
+links = {"Place": {"Amenity": "amenity_ids"}}
+# attributes holding the latitude and longitude of the objects of the
+# classes served by near() and within(), by class name
+spatial = {"Place": ("latitude", "longitude")}
+# attributes holding the latitude, longitude and price of the objects of
+# the classes served by clusters(), by class name
+clustered = {"Place": ("latitude", "longitude", "price_by_night")}
+# journal size in bytes past which it is folded into a new snapshot
+journal_max = int(getenv("HBNB_FILE_JOURNAL_MAX", 1 << 20))
+# one "key": {record} line of a JSON file written by FileStorage
+record_line = re.compile(rb'^"([^"\\\n]+)": (\{.*\}),?$', re.M)
+
+
+def fk_pairs(fields, values):
+    """yields the (foreign key, value) pairs of the foreign key values of
+    an object, one per id of a list of ids"""
+    for field, value in zip(fields, values):
+        if isinstance(value, tuple):
+            for id in value:
+                yield field, id
+        else:
+            yield field, value
 
 
 class FileStorage:
     """serializes instances to a JSON file & deserializes back to instances"""
 
+    # codec of the file, JSON unless HBNB_FILE_CODEC names another one
+    __codec = codecs[getenv("HBNB_FILE_CODEC", "json")]
     # string - path to the JSON file
-    __file_path = "file.json"
+    __file_path = "file" + __codec.extension
     # dictionary - empty but will store all objects by <class name>.id
     __objects = {}
+    # dictionary - per class name buckets of __objects, kept in step with it
+    __by_class = {}
+    # dictionary - objects by (class name, foreign key, value), then key
+    __related = {}
+    # dictionary - foreign key values each object is indexed under, by key
+    __fk_values = {}
+    # boolean - append changes to a journal instead of rewriting the file
+    __journal = getenv("HBNB_FILE_JOURNAL") == "1"
+    # sets - keys stored or deleted since the last save
+    __changed = set()
+    __deleted = set()
+    # guards the journal files against a running compaction
+    __lock = Lock()
+    __compactor = None
+    # dictionary - per class name, SortedIndex of its objects by attribute,
+    # built by the first keyset or range query on it (None if the values
+    # cannot be sorted)
+    __sorted = {}
+    # dictionary - per class name of spatial, GridIndex of its objects,
+    # built by the first near() or within() on it
+    __grids = {}
+    # dictionary - per class name of clustered, ClusterPyramid of its
+    # objects, built by the first clusters() on it
+    __pyramids = {}
+    # dictionary - (object, encoded "key": {record} JSON) of clean objects,
+    # reused by the journal and by saves with the JSON codec
+    __fragments = {}
+    # dictionary - records re-encoded and reused by save() so far, and
+    # objects and seconds taken by the last reload()
+    __stats = {"encoded": 0, "reused": 0, "reloaded": 0, "seconds": 0.0}
+    # tuple - (inode, size, mtime) of the files when last read or written
+    __signature = None
+    # boolean - only index the JSON file on reload, create objects on use
+    __lazy = getenv("HBNB_FILE_LAZY") == "1"
+    # dictionary - (mmap, start, end) of records not created yet, by key
+    __pending = {}
+    # dictionary - per class name buckets of __pending
+    __pending_by_class = {}
+    # boolean - keep objects as slotted instances of compact classes
+    __compact = getenv("HBNB_FILE_COMPACT") == "1"
+    # threading.local - per thread, inside its batch(), undo: dictionary
+    # of the (object, attributes, changed, deleted) of each key as it was
+    # before the batch changed it, and deferred: whether save() was called
+    __batch = local()
+    # list - functions called with (class name, id, foreign key values)
+    # of each object stored or removed
+    __listeners = []
+    # version numbers of the collections, bumped by _notify()
+    __versions = Versions()
 
-    def all(self, cls=None):
-        """returns the dictionary __objects"""
+    def all(self, cls=None, load=None):
+        """returns the dictionary __objects, or a read-only live view of
+        the objects of class cls (class or class name); load is accepted
+        for compatibility with DBStorage, relationships being served by
+        the reverse indexes"""
         if cls is not None:
-            new_dict = {}
-            for key, value in self.__objects.items():
-                if cls == value.__class__ or cls == value.__class__.__name__:
-                    new_dict[key] = value
-            return new_dict
+            if not isinstance(cls, str):
+                cls = cls.__name__
+            if self.__pending:
+                self._hydrate_class(cls)
+            return MappingProxyType(self.__by_class.setdefault(cls, {}))
+        if self.__pending:
+            for key in list(self.__pending):
+                self._hydrate(key)
         return self.__objects
 
+    def iter(self, cls=None, batch_size=None, load=None):
+        """yields the objects of class cls (class or class name), or all
+        objects, creating pending records one at a time in lazy mode;
+        batch_size and load are accepted for compatibility with
+        DBStorage"""
+        if cls is None:
+            names = list(self.__by_class) + [
+                name for name in self.__pending_by_class
+                if name not in self.__by_class]
+        else:
+            names = [cls if isinstance(cls, str) else cls.__name__]
+        for name in names:
+            for obj in list(self.__by_class.get(name, {}).values()):
+                yield obj
+            for key in list(self.__pending_by_class.get(name, ())):
+                if key in self.__pending:
+                    yield self._hydrate(key)
+
+    def on_change(self, listener):
+        """registers listener, called with the class name, the id and the
+        (foreign key, value) pairs, before and after the change, of each
+        object stored, updated or removed, such as ("City", id,
+        [("state_id", state_id)])"""
+        self.__listeners.append(listener)
+
+    def versions(self):
+        """returns the Versions of the collections of objects, see
+        models.engine.versions"""
+        return self.__versions
+
+    def _notify(self, key, obj, old=None):
+        """bumps the versions and calls the listeners on the change of obj
+        stored under key, old being the foreign key values it was indexed
+        under"""
+        name = obj.__class__.__name__
+        fields = foreign_keys.get(name, ())
+        related = list(fk_pairs(fields, self._fk_values(obj, fields)))
+        if old is not None:
+            related += [pair for pair in fk_pairs(fields, old)
+                        if pair not in related]
+        self.__versions.changed(name, obj.id, related)
+        for listener in self.__listeners:
+            listener(name, obj.id, related)
+
+    def query(self, cls):
+        """returns a query on the objects of class cls (class or class
+        name), see models.engine.query"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        return FileQuery(self, name, foreign_keys.get(name, ()),
+                         self._sorted_index)
+
+    def _sorted_index(self, name, field):
+        """returns the SortedIndex of attribute field of the objects of
+        class name, sorting them on first use, or None if their values
+        cannot be sorted; _index() and _unindex() keep it up to date"""
+        indexes = self.__sorted.setdefault(name, {})
+        if field not in indexes:
+            try:
+                indexes[field] = SortedIndex(field, self.iter(name))
+            except TypeError:
+                indexes[field] = None
+        return indexes[field]
+
+    def _reindex(self, obj):
+        """moves obj to its current values in the sorted indexes, the
+        spatial index and the cluster aggregates of its class"""
+        name = obj.__class__.__name__
+        for index in self.__sorted.get(name, {}).values():
+            if index is not None:
+                index.add(obj)
+        for indexes in (self.__grids, self.__pyramids):
+            index = indexes.get(name)
+            if index is not None:
+                index.add(obj)
+
+    def _reindex_changed(self):
+        """moves the objects changed since the last save, whose attributes
+        may have been set after new(), to their current values in the
+        sorted, spatial and cluster indexes"""
+        for key in list(self.__changed):
+            obj = self.__objects.get(key)
+            if obj is not None:
+                self._reindex(obj)
+
+    def _grid(self, name):
+        """returns the GridIndex of the objects of class name, building it
+        on first use; _index() and _unindex() keep it up to date"""
+        grid = self.__grids.get(name)
+        if grid is None:
+            grid = GridIndex(spatial[name], self.iter(name))
+            self.__grids[name] = grid
+        return grid
+
+    def clusters(self, cls, south, west, north, east, zoom):
+        """returns the aggregates of the objects of class cls (class or
+        class name) in the cells of the zoom level overlapping the box,
+        in degrees, see models.engine.spatial.cluster(); the aggregates
+        are built on first use and kept up to date as objects change"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        pyramid = self.__pyramids.get(name)
+        if pyramid is None:
+            pyramid = ClusterPyramid(clustered[name], self.iter(name))
+            self.__pyramids[name] = pyramid
+        return pyramid.clusters(south, west, north, east, zoom)
+
+    def near(self, cls, lat, lng, radius_km, limit=None):
+        """returns the (distance in km, object) pairs of the objects of
+        class cls (class or class name) within radius_km of (lat, lng),
+        nearest first, at most limit of them, read from the spatial
+        index"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        return [(distance, self.get(name, id)) for distance, id in
+                self._grid(name).near(lat, lng, radius_km, limit)]
+
+    def within(self, cls, south, west, north, east, limit=None):
+        """returns the (distance in km, object) pairs of the objects of
+        class cls (class or class name) within the box, in degrees,
+        nearest to its center first, at most limit of them, read from the
+        spatial index"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        return [(distance, self.get(name, id)) for distance, id in
+                self._grid(name).within(south, west, north, east, limit)]
+
+    def related(self, cls, field, value):
+        """returns a read-only view of the objects of class cls whose
+        foreign key field equals value, or whose list of ids field holds
+        it"""
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        if self.__pending:
+            self._hydrate_class(cls)
+        return MappingProxyType(self.__related.get((cls, field, value), {}))
+
+    def get(self, cls, id, load=None):
+        """returns the object of class cls (class or class name) with the
+        given id, or None if it is not stored; load is accepted for
+        compatibility with DBStorage"""
+        if id is None:
+            return None
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        key = cls + "." + id
+        obj = self.__objects.get(key)
+        if obj is None and key in self.__pending:
+            obj = self._hydrate(key)
+        return obj
+
+    def count(self, cls=None):
+        """returns the number of stored objects, or of objects of class
+        cls (class or class name)"""
+        if cls is None:
+            return len(self.__objects) + len(self.__pending)
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        return (len(self.__by_class.get(cls, ())) +
+                len(self.__pending_by_class.get(cls, ())))
+
     def new(self, obj):
         """sets in __objects the obj with key <obj class name>.id"""
         if obj is not None:
             key = obj.__class__.__name__ + "." + obj.id
-            self.__objects[key] = obj
+            self._remember(key)
+            self._unpend(key)
+            self._index(key, obj)
+            self.__changed.add(key)
+            self.__deleted.discard(key)
+
+    def mark_dirty(self, obj):
+        """records that a stored obj changed, so that the next save()
+        re-encodes and writes it"""
+        if isinstance(obj, CompactModel):
+            id = getattr(obj, "id", None)
+        else:
+            id = obj.__dict__.get("id")
+        if id is None:
+            return
+        key = obj.__class__.__name__ + "." + id
+        if self.__objects.get(key) is obj:
+            self._remember(key)
+            self.__fragments.pop(key, None)
+            self.__changed.add(key)
+
+    def bulk_new(self, cls, rows):
+        """stores new objects of class cls (class or class name) made from
+        rows, dictionaries of attributes, filling in id, created_at and
+        updated_at as BaseModel does, and saves them with one write;
+        returns their ids"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        records = [BaseModel.new_record(row) for row in rows]
+        for obj in self._model(name).from_records(records):
+            self.new(obj)
+        self.save()
+        return [record["id"] for record in records]
+
+    def bulk_update(self, cls, rows):
+        """sets the attributes of rows, dictionaries holding the id of a
+        stored object of class cls (class or class name), updated_at
+        being the current time unless given, and saves them with one
+        write; returns the number of objects updated"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        now = datetime.utcnow()
+        count = 0
+        for row in rows:
+            if row.get("id") is None:
+                raise ValueError("bulk_update() rows need an id")
+            obj = self.get(name, row["id"])
+            if obj is None:
+                continue
+            attrs = {key: value for key, value in row.items()
+                     if key != "__class__"}
+            for stamp in ("created_at", "updated_at"):
+                if type(attrs.get(stamp)) is str:
+                    attrs[stamp] = datetime.fromisoformat(attrs[stamp])
+            attrs.setdefault("updated_at", now)
+            self.mark_dirty(obj)
+            if isinstance(obj, CompactModel):
+                obj._assign(attrs)
+            else:
+                obj.__dict__.update(attrs)
+            key = name + "." + row["id"]
+            self._notify(key, obj, self.__fk_values.get(key))
+            self._index_fks(key, obj)
+            self._reindex(obj)
+            count += 1
+        self.save()
+        return count
+
+    def link(self, obj, others):
+        """adds the ids of others, objects of one class, to the list of ids
+        of obj naming the objects of that class, such as the amenity_ids
+        of a Place, and saves; each link is checked against the reverse
+        index, so the cost does not grow with the number of objects;
+        returns the number of links made"""
+        if not others:
+            return 0
+        name = obj.__class__.__name__
+        field = self._link_field(name, others)
+        key = name + "." + obj.id
+        ids = [id for id in dict.fromkeys(other.id for other in others)
+               if key not in self.related(name, field, id)]
+        if ids:
+            self._relink(obj, field, list(getattr(obj, field, None) or ()) +
+                         ids)
+            self.save()
+        return len(ids)
+
+    def unlink(self, obj, others):
+        """removes the ids of others, objects of one class, from the list
+        of ids of obj naming the objects of that class and saves; returns
+        the number of links removed"""
+        if not others:
+            return 0
+        name = obj.__class__.__name__
+        field = self._link_field(name, others)
+        key = name + "." + obj.id
+        ids = {other.id for other in others
+               if key in self.related(name, field, other.id)}
+        if ids:
+            self._relink(obj, field, [id for id in getattr(obj, field)
+                                      if id not in ids])
+            self.save()
+        return len(ids)
+
+    @staticmethod
+    def _link_field(name, others):
+        """returns the list of ids of the objects of class name linking
+        them to the objects of the class of others"""
+        other = others[0].__class__.__name__
+        field = links.get(name, {}).get(other)
+        if field is None:
+            raise ValueError("{} is not linked to {}".format(name, other))
+        return field
+
+    def _relink(self, obj, field, ids):
+        """sets the list of ids field of obj, a new list so that the
+        class-level default is never changed, and stores obj again"""
+        setattr(obj, field, ids)
+        obj.updated_at = datetime.utcnow()
+        self.new(obj)
+
+    @contextmanager
+    def batch(self):
+        """context in which save() calls are deferred to a single save()
+        on exit; on exception, the objects are brought back to how they
+        were when the outermost batch started and nothing is saved"""
+        batch = self.__batch
+        if getattr(batch, "undo", None) is not None:
+            yield self
+            return
+        batch.undo = {}
+        batch.deferred = False
+        try:
+            yield self
+        except BaseException:
+            undo = batch.undo
+            batch.undo = None
+            self._rollback(undo)
+            raise
+        batch.undo = None
+        if batch.deferred:
+            self.save()
+
+    def _remember(self, key):
+        """records the object stored under key as it is, before the first
+        change the current batch makes to it"""
+        undo = getattr(self.__batch, "undo", None)
+        if undo is None or key in undo:
+            return
+        if key in self.__pending:
+            self._hydrate(key)
+        obj = self.__objects.get(key)
+        if obj is None:
+            attrs = None
+        elif isinstance(obj, CompactModel):
+            attrs = obj._attrs()
+        else:
+            attrs = dict(obj.__dict__)
+        undo[key] = (obj, attrs, key in self.__changed, key in self.__deleted)
+
+    def _rollback(self, undo):
+        """brings back the objects recorded by _remember(); saves them
+        again when another thread saved the changes of the batch"""
+        saved = False
+        for key, (obj, attrs, changed, deleted) in undo.items():
+            touched = obj is not None or key in self.__objects
+            if (touched and key not in self.__changed and
+                    key not in self.__deleted):
+                # saved since the batch changed it, the file must be fixed
+                saved = True
+                changed, deleted = obj is not None, obj is None
+            if obj is None:
+                if key in self.__objects:
+                    self._unindex(key)
+            else:
+                if isinstance(obj, CompactModel):
+                    obj._reset(attrs)
+                else:
+                    obj.__dict__.clear()
+                    obj.__dict__.update(attrs)
+                self._index(key, obj)
+            for keys, was_in in ((self.__changed, changed),
+                                 (self.__deleted, deleted)):
+                if was_in:
+                    keys.add(key)
+                else:
+                    keys.discard(key)
+        if saved:
+            self.save()
+
+    def stats(self):
+        """returns the counters kept by the storage engine"""
+        stats = self.__stats
+        seconds = stats["seconds"]
+        return {"records_encoded": stats["encoded"],
+                "records_reused": stats["reused"],
+                "reload_objects": stats["reloaded"],
+                "reload_seconds": seconds,
+                "reload_objects_per_second":
+                    stats["reloaded"] / seconds if seconds else 0.0}
+
+    def _hydrate(self, key):
+        """creates and stores the object of the pending record of key"""
+        mm, start, end = self._unpend(key)
+        text = mm[start:end].decode()
+        record = json.loads(text)
+        obj = self._build(record)
+        self._index(key, obj, notify=False)
+        self.__fragments[key] = (obj, json.dumps(key) + ": " + text)
+        return obj
+
+    def _hydrate_class(self, name):
+        """creates and stores the objects of the pending records of the
+        class name"""
+        pending = self.__pending_by_class.get(name)
+        if pending:
+            for key in list(pending):
+                self._hydrate(key)
+
+    def _unpend(self, key):
+        """forgets the pending record of key, returning its location"""
+        if not self.__pending:
+            return None
+        span = self.__pending.pop(key, None)
+        if span is not None:
+            self.__pending_by_class[key.partition(".")[0]].pop(key, None)
+        return span
+
+    def _set_pending(self, spans):
+        """replaces the pending records with spans"""
+        FileStorage.__pending = spans
+        by_class = {}
+        for key in spans:
+            name = key.partition(".")[0]
+            if name not in by_class:
+                by_class[name] = {}
+            by_class[name][key] = None
+        FileStorage.__pending_by_class = by_class
+        FileStorage.__sorted = {}
+        FileStorage.__grids = {}
+        FileStorage.__pyramids = {}
+
+    def _lazy(self):
+        """tells whether reload() only indexes the file, which needs its
+        one record per line JSON layout"""
+        return self.__lazy and self.__codec.name == "json"
+
+    def _map_file(self):
+        """maps the JSON file in memory and returns where each of its
+        records lies by key, or None if it is not laid out one record per
+        line"""
+        try:
+            with open(self.__file_path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return {}
+        if mm[:2] != b"{\n":
+            return None
+        # every line between the braces must be a record, else the file
+        # was written in another layout, such as indented JSON
+        spans, end = {}, 1
+        for match in record_line.finditer(mm):
+            if mm[end:match.start()] != b"\n":
+                return None
+            start, stop = match.span(2)
+            spans[match.group(1).decode()] = (mm, start, stop)
+            end = match.end()
+        if mm[end:].strip() != b"}":
+            return None
+        return spans
+
+    def _index(self, key, obj, notify=True):
+        """stores obj under key in __objects and in its class bucket,
+        calling the listeners unless notify is False"""
+        self._reindex(obj)
+        if self.__compact and not isinstance(obj, CompactModel):
+            obj = self._compacted(key, obj)
+        self.__objects[key] = obj
+        self.__fragments.pop(key, None)
+        self.__by_class.setdefault(obj.__class__.__name__, {})[key] = obj
+        if notify:
+            self._notify(key, obj, self.__fk_values.get(key))
+        self._index_fks(key, obj)
+
+    def _compacted(self, key, obj):
+        """returns the compact instance holding the attributes of obj,
+        updating the one stored under key if there is one"""
+        stored = self.__objects.get(key)
+        if isinstance(stored, CompactModel) and stored._model is type(obj):
+            stored._reset(obj.__dict__)
+            return stored
+        return compact_class(type(obj)).from_records((obj.__dict__,))[0]
+
+    def _index_fks(self, key, obj):
+        """moves obj to the reverse index entries of its current foreign
+        key values"""
+        name = obj.__class__.__name__
+        fields = foreign_keys.get(name)
+        if fields is None:
+            return
+        values = self._fk_values(obj, fields)
+        old = self.__fk_values.get(key)
+        if old is not None and old != values:
+            self._unindex_fks(key, name, fields, old)
+        for field, value in fk_pairs(fields, values):
+            self.__related.setdefault((name, field, value), {})[key] = obj
+        self.__fk_values[key] = values
+
+    @staticmethod
+    def _fk_values(obj, fields):
+        """returns the tuple of the foreign key values of obj, lists of
+        ids as tuples"""
+        values = []
+        for field in fields:
+            value = getattr(obj, field, None)
+            values.append(tuple(value) if isinstance(value, list) else value)
+        return tuple(values)
+
+    def _unindex_fks(self, key, name, fields, values):
+        """removes key from the reverse index entries of values"""
+        for field, value in fk_pairs(fields, values):
+            entry = self.__related.get((name, field, value))
+            if entry is not None:
+                entry.pop(key, None)
+                if not entry:
+                    del self.__related[(name, field, value)]
+
+    def _unindex(self, key):
+        """removes the object stored under key from __objects and its
+        class bucket"""
+        obj = self.__objects.pop(key)
+        self.__fragments.pop(key, None)
+        name = obj.__class__.__name__
+        self.__by_class.get(name, {}).pop(key, None)
+        for index in self.__sorted.get(name, {}).values():
+            if index is not None:
+                index.discard(obj.id)
+        for indexes in (self.__grids, self.__pyramids):
+            if name in indexes:
+                indexes[name].discard(obj.id)
+        values = self.__fk_values.pop(key, None)
+        if values is not None:
+            self._unindex_fks(key, name, foreign_keys[name], values)
+        self._notify(key, obj, values)
+        return obj
 
     def save(self):
-        """serializes __objects to the JSON file (path: __file_path)"""
-        json_objects = {}
-        for key in self.__objects:
-            json_objects[key] = self.__objects[key].to_dict()
-        with open(self.__file_path, 'w') as f:
-            json.dump(json_objects, f)
+        """serializes __objects to the JSON file (path: __file_path), or
+        appends the changes since the last save to the journal; inside
+        batch(), only records that a save is due"""
+        self._reindex_changed()
+        if getattr(self.__batch, "undo", None) is not None:
+            self.__batch.deferred = True
+            return
+        if self.__journal:
+            self._append_journal()
+            return
+        if self.__codec.incremental:
+            fragments = [self._fragment(key, obj)
+                         for key, obj in self.__objects.items()]
+            for key, (mm, start, end) in self.__pending.items():
+                fragments.append(json.dumps(key) + ": " +
+                                 mm[start:end].decode())
+            data = self.__codec.join(fragments)
+        else:
+            records = []
+            for key, obj in self.__objects.items():
+                self._index_fks(key, obj)
+                records.append((key, obj.to_dict()))
+            self.__stats["encoded"] += len(records)
+            data = self.__codec.encode(records)
+        self._write_file(self.__file_path, data)
+        self.__changed.clear()
+        self.__deleted.clear()
+        with self.__lock:
+            for log in self._journal_paths():
+                if path.exists(log):
+                    remove(log)
+            self.__signature = self._signature()
+
+    @staticmethod
+    def _write_file(name, data):
+        """atomically replaces the content of the file name by data"""
+        tmp = name + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        replace(tmp, name)
+
+    def _signature(self):
+        """returns the (inode, size, mtime) of the JSON file and of its
+        journals, None for a missing file"""
+        signature = []
+        for name in (self.__file_path,) + self._journal_paths():
+            try:
+                st = stat(name)
+                signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _fragment(self, key, obj):
+        """returns the encoded "key": {record} JSON of obj, reusing the
+        cached one while obj is clean"""
+        cached = self.__fragments.get(key)
+        if cached is not None and cached[0] is obj:
+            self.__stats["reused"] += 1
+            return cached[1]
+        self._index_fks(key, obj)
+        fragment = JSONCodec.fragment(key, obj.to_dict())
+        self.__fragments[key] = (obj, fragment)
+        self.__stats["encoded"] += 1
+        return fragment
+
+    def _journal_paths(self):
+        """returns the paths of the rotated and the live journal, in the
+        order they are replayed"""
+        log = self.__file_path + ".log"
+        return (log + ".1", log)
+
+    def _append_journal(self):
+        """appends the objects stored or deleted since the last save to the
+        journal as one JSON line, and starts a compaction when the journal
+        grows past journal_max"""
+        changes = []
+        for key in self.__changed:
+            obj = self.__objects.get(key)
+            if obj is not None:
+                changes.append(self._fragment(key, obj))
+        for key in self.__deleted:
+            changes.append(json.dumps(key) + ": null")
+        self.__changed.clear()
+        self.__deleted.clear()
+        if not changes:
+            return
+        with self.__lock:
+            with open(self._journal_paths()[1], 'a') as f:
+                f.write("{" + ", ".join(changes) + "}\n")
+                size = f.tell()
+            self.__signature = self._signature()
+        if size > journal_max:
+            self.compact()
+
+    def compact(self, wait=False):
+        """rotates the journal and folds it into a new snapshot of the JSON
+        file in a background thread"""
+        rotated, log = self._journal_paths()
+        with self.__lock:
+            if self.__compactor is not None and self.__compactor.is_alive():
+                return
+            if not path.exists(log):
+                return
+            if path.exists(rotated):
+                with open(log, 'r') as f, open(rotated, 'a') as r:
+                    r.write(f.read())
+                remove(log)
+            else:
+                replace(log, rotated)
+            thread = Thread(target=self._fold_journal, daemon=True)
+            FileStorage.__compactor = thread
+            thread.start()
+        if wait:
+            thread.join()
+
+    def _fold_journal(self):
+        """writes the snapshot plus the rotated journal to a new snapshot,
+        then drops the rotated journal"""
+        rotated = self._journal_paths()[0]
+        records = self._records((rotated,))
+        tmp = self.__file_path + ".fold"
+        self._write_file(tmp, self.__codec.encode(records.items()))
+        with self.__lock:
+            current = self._signature() == self.__signature
+            replace(tmp, self.__file_path)
+            remove(rotated)
+            if current:
+                self.__signature = self._signature()
+
+    def _records(self, logs):
+        """returns the records of the JSON file with the given journals
+        replayed on top of them"""
+        try:
+            with open(self.__file_path, 'rb') as f:
+                records = self.__codec.decode(f.read())
+        except (OSError, ValueError):
+            records = {}
+        for log in logs:
+            for changes in self._read_journal(log):
+                for key, value in changes.items():
+                    if value is None:
+                        records.pop(key, None)
+                    else:
+                        records[key] = value
+        return records
+
+    @staticmethod
+    def _read_journal(log, offset=0):
+        """yields the changes recorded in a journal file from offset on,
+        stopping at a line left incomplete by an interrupted write"""
+        try:
+            with open(log, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        return
+        except OSError:
+            return
 
     def reload(self):
-        """deserializes the JSON file to __objects"""
+        """deserializes the JSON file and its journal to __objects; in
+        lazy mode only indexes the records of the JSON file; the objects
+        loaded start a new epoch of versions instead of notifying"""
+        start = perf_counter()
+        self.__versions.reset()
+        with self.__lock:
+            self.__signature = self._signature()
+            spans = self._map_file() if self._lazy() else None
+            if spans is not None:
+                self._set_pending(spans)
+                for log in self._journal_paths():
+                    for changes in self._read_journal(log):
+                        self._apply(changes)
+                self._time_reload(start, len(spans))
+                return
+            jo = self._records(self._journal_paths())
+        by_class = {}
+        for key, record in jo.items():
+            by_class.setdefault(record.get("__class__"), []).append(key)
         try:
-            with open(self.__file_path, 'r') as f:
-                jo = json.load(f)
-            for key in jo:
-                self.__objects[key] = classes[jo[key]["__class__"]](**jo[key])
+            for name, keys in by_class.items():
+                objs = self._model(name).from_records(jo[key] for key in keys)
+                for key, obj in zip(keys, objs):
+                    self._index(key, obj, notify=False)
         except:
             pass
+        self._time_reload(start, len(jo))
+
+    def _time_reload(self, start, count):
+        """records the number of objects and the time of a reload()"""
+        self.__stats["reloaded"] = count
+        self.__stats["seconds"] = perf_counter() - start
+
+    def _model(self, name):
+        """returns the class objects of the class name are stored as"""
+        if self.__compact:
+            return compact_class(classes[name])
+        return classes[name]
+
+    def _build(self, record):
+        """returns the object of a stored record"""
+        return self._model(record["__class__"]).from_records((record,))[0]
+
+    def _refresh(self):
+        """brings __objects up to date with the JSON file and its journal,
+        only re-instantiating records whose updated_at changed and
+        dropping clean objects that are no longer stored"""
+        with self.__lock:
+            spans = self._map_file() if self._lazy() else None
+            if spans is not None:
+                self._refresh_pending(spans)
+                return
+            records = self._records(self._journal_paths())
+        for key, value in records.items():
+            obj = self.__objects.get(key)
+            if obj is None or not self._is_current(obj, value):
+                self._index(key, self._build(value))
+        for key in [key for key in self.__objects
+                    if key not in records and key not in self.__changed]:
+            self._unindex(key)
+
+    def _refresh_pending(self, spans):
+        """lazy mode _refresh(): keeps the created objects whose record is
+        unchanged and leaves the other records pending"""
+        for key, obj in list(self.__objects.items()):
+            span = spans.pop(key, None)
+            if span is None:
+                if key not in self.__changed:
+                    self._unindex(key)
+                continue
+            mm, start, end = span
+            record = json.loads(mm[start:end])
+            if not self._is_current(obj, record):
+                self._index(key, self._build(record))
+        self._set_pending(spans)
+        for log in self._journal_paths():
+            for changes in self._read_journal(log):
+                self._apply(changes)
+
+    def _replay(self, offset):
+        """applies the changes appended to the live journal past offset"""
+        for changes in self._read_journal(self._journal_paths()[1], offset):
+            self._apply(changes)
+
+    def _apply(self, changes):
+        """applies one journal entry to __objects"""
+        for key, value in changes.items():
+            self._unpend(key)
+            if value is None:
+                if key in self.__objects:
+                    self._unindex(key)
+            else:
+                self._index(key, self._build(value))
+
+    @staticmethod
+    def _is_current(obj, record):
+        """tells whether obj already holds the stored record"""
+        updated_at = getattr(obj, "updated_at", None)
+        stored = record.get("updated_at")
+        if isinstance(stored, datetime):
+            return (obj.__class__.__name__ == record.get("__class__") and
+                    updated_at == stored)
+        return (obj.__class__.__name__ == record.get("__class__") and
+                isinstance(updated_at, datetime) and
+                updated_at.isoformat() == stored)
 
     def delete(self, obj=None):
-        """delete obj from __objects if it’s inside"""
+        """delete obj from __objects if it’s inside, unlinking it from the
+        objects linked to it"""
         if obj is not None:
+            name = obj.__class__.__name__
+            for owner, fields in links.items():
+                field = fields.get(name)
+                if field is not None:
+                    for linked in list(self.related(owner, field,
+                                                    obj.id).values()):
+                        self._relink(linked, field, [
+                            id for id in getattr(linked, field)
+                            if id != obj.id])
             key = obj.__class__.__name__ + '.' + obj.id
-            if key in self.__objects:
-                del self.__objects[key]
+            self._remember(key)
+            if key in self.__objects or self._unpend(key) is not None:
+                if key in self.__objects:
+                    self._unindex(key)
+                self.__deleted.add(key)
+                self.__changed.discard(key)
 
     def close(self):
-        """call reload() method for deserializing the JSON file to objects"""
-        self.reload()
+        """picks up what another process wrote to the JSON file or its
+        journal since this storage last read or wrote them; does nothing
+        when the files are unchanged"""
+        signature = self._signature()
+        old = self.__signature
+        if signature == old:
+            return
+        if (old is not None and signature[:2] == old[:2] and
+                old[2] is not None and signature[2] is not None and
+                signature[2][0] == old[2][0] and
+                signature[2][1] > old[2][1]):
+            self._replay(old[2][1])
+        else:
+            self._refresh()
+        self.__signature = signature
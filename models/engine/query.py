@@ -0,0 +1,586 @@
+#!/usr/bin/python3
+"""
+Contains the query builders returned by storage.query(cls)
+
+    storage.query(Place).filter(city_id=city.id, price_by_night__lt=100)
+                        .order_by("-price_by_night", "name")
+                        .limit(10).offset(20).all()
+
+filter() takes attribute=value conditions, the attribute name followed by
+__ne, __lt, __lte, __gt, __gte or __in for other comparisons than
+equality, or by __all for a list attribute holding all the given values
+(amenity_ids__all=[...] for the places having all those amenities);
+conditions are ANDed, filter() can be called several times; the
+conditions of filter_any() are ORed. The value of an __in condition can
+be another query, standing for the ids of its objects (a subquery in
+SQL):
+
+    cities = storage.query(City).filter_any(id__in=city_ids,
+                                            state_id__in=state_ids)
+    storage.query(Place).filter(city_id__in=cities)
+
+order_by() takes attribute names, prefixed by - for descending order.
+after() pages through the objects in (created_at, id) order, starting
+after the (created_at, id) of the last object of the previous page:
+
+    page = storage.query(State).after(None).limit(20).all()
+    page = storage.query(State).after((page[-1].created_at, page[-1].id))
+                               .limit(20).all()
+DBQuery compiles to SQL, FileQuery plans its reads of the FileStorage
+indexes from their sizes.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+import heapq
+import operator
+from operator import itemgetter
+from sqlalchemy import and_, func, or_, select, true
+
+# comparison of an attribute value and a condition value, by suffix
+operators = {"eq": operator.eq, "ne": operator.ne, "lt": operator.lt,
+             "lte": operator.le, "gt": operator.gt, "gte": operator.ge,
+             "in": lambda value, values: value in values,
+             "all": lambda value, values: all(v in value for v in values)}
+# comparisons a SortedIndex serves
+ranges = ("lt", "lte", "gt", "gte")
+# ordering of the keyset pages of after()
+keyset_order = [("created_at", False), ("id", False)]
+# a FileQuery intersects its candidates with the objects of another index
+# while the index holds at most this many times as many objects as there
+# are candidates left; past that, testing the candidates is cheaper
+intersect_ratio = 4
+
+
+class Query:
+    """conditions, order and window of a query on the objects of a class"""
+
+    def __init__(self, cls):
+        """Instantiate a query on the objects of class cls"""
+        self.cls = cls
+        # list - (attribute, operator name, value) tuples
+        self.conditions = []
+        # list - (attribute, descending) tuples
+        self.ordering = []
+        self.window = (0, None)
+        # tuple - (created_at, id) the objects are after, or None
+        self.keyset = None
+
+    def filter(self, **conditions):
+        """adds conditions the objects must meet, returns the query"""
+        for name, value in conditions.items():
+            self.conditions.append(self._condition(name, value))
+        return self
+
+    def filter_any(self, **conditions):
+        """adds conditions of which the objects must meet at least one,
+        returns the query"""
+        self.conditions.append((None, "any", [
+            self._condition(name, value)
+            for name, value in conditions.items()]))
+        return self
+
+    def _condition(self, name, value):
+        """returns the (attribute, operator name, value) of the condition
+        name=value"""
+        field, _, op = name.partition("__")
+        op = op or "eq"
+        if op not in operators:
+            raise ValueError("unknown comparison {} in {}".format(op, name))
+        if op in ("in", "all"):
+            value = self._listed(op, value)
+        return (field, op, value)
+
+    def _listed(self, op, value):
+        """returns the values of an in or all condition as a list, the ids
+        of the objects of value if it is a query"""
+        if isinstance(value, Query):
+            return [obj.id for obj in value]
+        return list(value)
+
+    def order_by(self, *fields):
+        """sets the attributes the objects are sorted by, names prefixed by
+        - sorting in descending order, returns the query"""
+        self.ordering = [(field.lstrip("-"), field.startswith("-"))
+                         for field in fields]
+        return self
+
+    def after(self, cursor):
+        """keeps the objects after cursor, a (created_at, id) tuple or None
+        for the first page, sorted by created_at then id, returns the
+        query"""
+        self.keyset = cursor
+        self.ordering = list(keyset_order)
+        return self
+
+    def limit(self, n):
+        """returns at most n objects, returns the query"""
+        self.window = (self.window[0], n)
+        return self
+
+    def offset(self, k):
+        """skips the first k objects, returns the query"""
+        self.window = (k, self.window[1])
+        return self
+
+    def all(self):
+        """returns the list of the objects"""
+        raise NotImplementedError
+
+    def count(self):
+        """returns the number of objects meeting the conditions, ignoring
+        limit() and offset()"""
+        raise NotImplementedError
+
+    def first(self):
+        """returns the first object, or None"""
+        start, size = self.window
+        self.window = (start, 1)
+        try:
+            objs = self.all()
+        finally:
+            self.window = (start, size)
+        return objs[0] if objs else None
+
+    def __iter__(self):
+        """iterates over the objects"""
+        return iter(self.all())
+
+
+class SortedIndex:
+    """values of one attribute of the objects of a class, kept as a sorted
+    list of (value, id) entries serving range conditions and keyset pages;
+    objects without a value are left out"""
+
+    def __init__(self, field, objs=()):
+        """Instantiate the index of attribute field of objs; raises
+        TypeError if their values cannot be sorted together"""
+        self.field = field
+        # dictionary - value each object is indexed under, by id
+        self.values = {}
+        entries = []
+        for obj in objs:
+            value = getattr(obj, field, None)
+            if value is not None:
+                entries.append((value, obj.id))
+                self.values[obj.id] = value
+        entries.sort()
+        self.entries = entries
+
+    def __len__(self):
+        """returns the number of objects indexed"""
+        return len(self.entries)
+
+    def add(self, obj):
+        """moves the entry of obj to its current value; an object whose
+        value cannot be compared with the others is left out"""
+        value = getattr(obj, self.field, None)
+        if obj.id in self.values:
+            if self.values[obj.id] == value:
+                return
+            self.discard(obj.id)
+        if value is None:
+            return
+        entries, entry = self.entries, (value, obj.id)
+        try:
+            if not entries or entries[-1] < entry:
+                entries.append(entry)
+            else:
+                insort(entries, entry)
+        except TypeError:
+            return
+        self.values[obj.id] = value
+
+    def discard(self, id):
+        """removes the entry of the object with that id"""
+        if id not in self.values:
+            return
+        entry = (self.values.pop(id), id)
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def span(self, conditions):
+        """returns the (first, last) positions of the entries meeting
+        conditions, (field, operator name, value) tuples with an operator
+        of ranges; raises TypeError if a value cannot be compared with the
+        indexed ones"""
+        first, last = 0, len(self.entries)
+        value = itemgetter(0)
+        for field, op, bound in conditions:
+            if op == "gt":
+                first = max(first, bisect_right(self.entries, bound,
+                                                key=value))
+            elif op == "gte":
+                first = max(first, bisect_left(self.entries, bound,
+                                               key=value))
+            elif op == "lt":
+                last = min(last, bisect_left(self.entries, bound, key=value))
+            else:
+                last = min(last, bisect_right(self.entries, bound,
+                                              key=value))
+        return first, max(first, last)
+
+    def ids(self, first, last):
+        """returns the ids of the entries from first to last"""
+        return [id for value, id in self.entries[first:last]]
+
+
+class FileQuery(Query):
+    """query on a FileStorage, planned from the sizes of the indexes
+    serving its conditions: it starts from the smallest one, intersects
+    it with the other small ones and tests the conditions left on the
+    remaining candidates"""
+
+    def __init__(self, storage, cls, foreign_keys=(), sorted_index=None):
+        """Instantiate a query on the objects of class cls in storage,
+        foreign_keys being the attributes with a reverse index, list
+        attributes being indexed by element, and sorted_index a function
+        returning the SortedIndex of an attribute of the objects of a
+        class, or None, which serves range conditions and keyset pages"""
+        super().__init__(cls)
+        self.storage = storage
+        self.foreign_keys = foreign_keys
+        self.sorted_index = sorted_index
+
+    def _sources(self):
+        """returns the (number of objects, function returning them by
+        key, conditions served) of each index serving conditions; the
+        conditions of filter_any() are served by the union of the indexes
+        of each of them, when they all have one"""
+        cls = self.cls
+        name = cls if isinstance(cls, str) else cls.__name__
+        sources, bounds = [], {}
+        for condition in self.conditions:
+            field, op, value = condition
+            if op == "any":
+                served = [self._source(name, c) for c in value]
+                if served and None not in served:
+                    sources.append((sum(size for size, fetch in served),
+                                    self._merged([fetch for size, fetch
+                                                  in served]),
+                                    [condition]))
+            elif op in ranges and self.sorted_index is not None:
+                bounds.setdefault(field, []).append(condition)
+            else:
+                served = self._source(name, condition)
+                if served is not None:
+                    sources.append(served + ([condition],))
+        for field, conditions in bounds.items():
+            served = self._range(name, field, conditions)
+            if served is not None:
+                sources.append(served + (conditions,))
+        return sources
+
+    def _source(self, name, condition):
+        """returns the (number of objects, function returning them by
+        key) of the index serving condition, or None"""
+        field, op, value = condition
+        if field == "id" and op in ("eq", "in"):
+            ids = [value] if op == "eq" else list(dict.fromkeys(value))
+            return (len(ids), self._by_id(name, ids))
+        if field in self.foreign_keys and op in ("eq", "in", "all"):
+            values = [value] if op == "eq" else dict.fromkeys(value)
+            buckets = [self.storage.related(self.cls, field, value)
+                       for value in values]
+            if op != "all":
+                return (sum(len(bucket) for bucket in buckets),
+                        self._union(buckets))
+            if buckets:
+                buckets.sort(key=len)
+                return (len(buckets[0]), self._intersection(buckets))
+            return None
+        if op in ranges and self.sorted_index is not None:
+            return self._range(name, field, [condition])
+        return None
+
+    def _range(self, name, field, conditions):
+        """returns the (number of objects, function returning them by
+        key) of the sorted index of field serving the range conditions,
+        or None"""
+        index = self.sorted_index(self.cls, field)
+        if index is None:
+            return None
+        try:
+            first, last = index.span(conditions)
+        except TypeError:
+            return None
+        return (last - first, self._by_key(name, index, first, last))
+
+    def _by_id(self, name, ids):
+        """returns the function returning the objects of class name with
+        ids by key, read one at a time"""
+        def fetch():
+            """objects by key"""
+            objs = {}
+            for id in ids:
+                obj = self.storage.get(name, id)
+                if obj is not None:
+                    objs[name + "." + id] = obj
+            return objs
+        return fetch
+
+    def _by_key(self, name, index, first, last):
+        """returns the function returning the objects of class name of
+        the entries of index from first to last by key, read from the
+        class bucket"""
+        def fetch():
+            """objects by key"""
+            objs = self.storage.all(name)
+            keys = [name + "." + id for id in index.ids(first, last)]
+            return {key: objs[key] for key in keys if key in objs}
+        return fetch
+
+    @staticmethod
+    def _union(buckets):
+        """returns the function returning the objects of any of buckets
+        by key"""
+        def fetch():
+            """objects by key"""
+            objs = {}
+            for bucket in buckets:
+                objs.update(bucket)
+            return objs
+        return fetch
+
+    @staticmethod
+    def _merged(fetches):
+        """returns the function returning the objects returned by any of
+        fetches by key"""
+        def fetch():
+            """objects by key"""
+            objs = {}
+            for each in fetches:
+                objs.update(each())
+            return objs
+        return fetch
+
+    @staticmethod
+    def _intersection(buckets):
+        """returns the function returning the objects of all of buckets,
+        smallest first, by key"""
+        def fetch():
+            """objects by key"""
+            return {key: obj for key, obj in buckets[0].items()
+                    if all(key in bucket for bucket in buckets[1:])}
+        return fetch
+
+    def _candidates(self):
+        """returns the objects to test the conditions on, and the
+        conditions left to test"""
+        sources = sorted(self._sources(), key=itemgetter(0))
+        if not sources:
+            return self.storage.all(self.cls).values(), self.conditions
+        size, fetch, served = sources[0]
+        candidates = fetch()
+        served = list(served)
+        for size, fetch, conditions in sources[1:]:
+            if size > intersect_ratio * len(candidates):
+                break
+            objs = fetch()
+            candidates = {key: obj for key, obj in candidates.items()
+                          if key in objs}
+            served += conditions
+        served = set(map(id, served))
+        return candidates.values(), [c for c in self.conditions
+                                     if id(c) not in served]
+
+    def _matches(self):
+        """yields the objects meeting the conditions"""
+        candidates, conditions = self._candidates()
+        tests = [(field, self._test(field, op), value)
+                 for field, op, value in conditions]
+        if self.keyset is not None:
+            tests.append(("created_at", operators["gte"], self.keyset[0]))
+        missing = object()
+        for obj in candidates:
+            for field, test, value in tests:
+                attr = obj if field is None else getattr(obj, field, missing)
+                try:
+                    if attr is missing or not test(attr, value):
+                        break
+                except TypeError:
+                    break
+            else:
+                if (self.keyset is None or
+                        (obj.created_at, obj.id) > self.keyset):
+                    yield obj
+
+    def all(self):
+        """returns the list of the objects"""
+        start, size = self.window
+        if (self.sorted_index is not None and not self.conditions and
+                self.ordering == keyset_order):
+            timeline = self.sorted_index(self.cls, "created_at")
+            if timeline is not None:
+                return self._page(timeline, start, size)
+        objs = self._matches()
+        if not self.ordering:
+            objs = list(objs)
+        elif len(self.ordering) == 1 and size is not None:
+            field, descending = self.ordering[0]
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            objs = pick(start + size, objs, key=self._key(field, descending))
+        else:
+            objs = list(objs)
+            for field, descending in reversed(self.ordering):
+                objs.sort(key=self._key(field, descending),
+                          reverse=descending)
+        return objs[start:None if size is None else start + size]
+
+    def _page(self, timeline, start, size):
+        """returns the objects of the window in (created_at, id) order,
+        after the keyset, read from timeline, the SortedIndex of the
+        created_at of the class"""
+        first = start
+        if self.keyset is not None:
+            first += bisect_right(timeline.entries, tuple(self.keyset))
+        last = None if size is None else first + size
+        get = self.storage.get
+        return [get(self.cls, id) for id in timeline.ids(first, last)]
+
+    def count(self):
+        """returns the number of objects meeting the conditions, ignoring
+        limit() and offset()"""
+        if self.keyset is not None:
+            return sum(1 for obj in self._matches())
+        if not self.conditions:
+            return self.storage.count(self.cls)
+        return sum(1 for obj in self._matches())
+
+    def _test(self, field, op):
+        """returns the comparison of op, matching the list of ids of a
+        many-to-many foreign key if any of them does; the test of the
+        conditions of filter_any() takes the object itself"""
+        if op == "any":
+            return self._any
+        test = operators[op]
+        if field not in self.foreign_keys or op not in ("eq", "in"):
+            return test
+
+        def holds(attr, value):
+            """test on attr or on any of its elements"""
+            if isinstance(attr, (list, tuple)):
+                return any(test(item, value) for item in attr)
+            return test(attr, value)
+        return holds
+
+    def _any(self, obj, conditions):
+        """tells whether obj meets any of conditions"""
+        for field, op, value in conditions:
+            attr = getattr(obj, field, None)
+            try:
+                if attr is not None and self._test(field, op)(attr, value):
+                    return True
+            except TypeError:
+                continue
+        return False
+
+    @staticmethod
+    def _key(field, descending=False):
+        """returns the sort key of field, putting objects without a value
+        last in either order"""
+        def key(obj):
+            """sort key of obj"""
+            value = getattr(obj, field, None)
+            if value is None:
+                return (not descending, 0)
+            return (descending, value)
+        return key
+
+
+class DBQuery(Query):
+    """query on a DBStorage session, compiled to a SQL statement"""
+
+    def __init__(self, session, cls, links=None):
+        """Instantiate a query on the objects of class cls, run in the
+        SQLAlchemy session; links gives the (column of cls, column of the
+        other class) of the link table of each many-to-many relationship,
+        by the name of the list of ids it stands for, such as
+        "amenity_ids" for a Place"""
+        super().__init__(cls)
+        self.session = session
+        self.links = links or {}
+
+    def statement(self):
+        """returns the SQLAlchemy select() of the query; rows without a
+        value sort last in either order, as in a FileQuery, where MySQL
+        and SQLite would put them first in ascending order"""
+        statement = select(self.cls).where(*self._criteria())
+        for field, descending in self.ordering:
+            column = getattr(self.cls, field)
+            statement = statement.order_by(column.is_(None),
+                                           column.desc() if descending
+                                           else column)
+        start, size = self.window
+        if start:
+            statement = statement.offset(start)
+        if size is not None:
+            statement = statement.limit(size)
+        return statement
+
+    def _criteria(self):
+        """returns the SQL expressions of the conditions"""
+        criteria = []
+        if self.keyset is not None:
+            created_at, id = self.keyset
+            # the row value (created_at, id) > (...), spelled out so that
+            # MySQL and SQLite use the created_at index
+            criteria.append(or_(self.cls.created_at > created_at,
+                                and_(self.cls.created_at == created_at,
+                                     self.cls.id > id)))
+        for field, op, value in self.conditions:
+            criteria.append(self._criterion(field, op, value))
+        return criteria
+
+    def _criterion(self, field, op, value):
+        """returns the SQL expression of a condition"""
+        if op == "any":
+            return or_(*[self._criterion(*condition) for condition in value])
+        if field in self.links:
+            return self._linked(field, op, value)
+        column = getattr(self.cls, field)
+        if op == "in":
+            if isinstance(value, DBQuery):
+                return column.in_(value.subquery())
+            return column.in_(value)
+        return operators[op](column, value)
+
+    def _listed(self, op, value):
+        """returns the values of an in or all condition as a list, or the
+        query value of an in condition, compiled to a subquery"""
+        if op == "in" and isinstance(value, DBQuery):
+            return value
+        return super()._listed(op, value)
+
+    def subquery(self):
+        """returns the select() of the ids of the rows, for the in
+        conditions of other queries"""
+        return select(self.cls.id).where(*self._criteria())
+
+    def _linked(self, field, op, value):
+        """returns the SQL expression of a condition on the ids linked to
+        an object through the link table of field, a semi-join on it"""
+        own, other = self.links[field]
+        if op not in ("eq", "in", "all"):
+            raise ValueError("cannot compare {} with {}".format(field, op))
+        if isinstance(value, DBQuery):
+            return self.cls.id.in_(select(own).where(
+                other.in_(value.subquery())))
+        values = [value] if op == "eq" else list(dict.fromkeys(value))
+        if op == "all" and not values:
+            return true()
+        linked = select(own).where(other.in_(values))
+        if op == "all":
+            linked = linked.group_by(own).having(
+                func.count(other) == len(values))
+        return self.cls.id.in_(linked)
+
+    def all(self):
+        """returns the list of the objects"""
+        return list(self.session.scalars(self.statement()))
+
+    def count(self):
+        """returns the number of objects meeting the conditions, ignoring
+        limit() and offset()"""
+        return self.session.scalar(select(func.count()).select_from(
+            self.cls).where(*self._criteria()))
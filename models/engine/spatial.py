@@ -0,0 +1,408 @@
+#!/usr/bin/python3
+"""
+Contains the GridIndex class, the spatial index FileStorage keeps of the
+places, the ClusterPyramid class, its aggregates of the places for maps,
+and the distance functions both storage engines rank places with
+
+The earth is cut into cells of cell_degrees of latitude by cell_degrees
+of longitude. Each cell keeps the ids of its objects and their latitude,
+longitude (in radians) and cosine of latitude in parallel arrays, so that
+a query reads the few cells around a point and computes the distances of
+a whole cell at once over the arrays, without touching the objects.
+Distances are great circle (haversine) distances in kilometers; points
+farther than the radius are dropped before the arcsine is taken.
+
+A ClusterPyramid keeps, for each zoom level from 0 to cluster_zoom, the
+count, sums of coordinates and prices and minimum price of the objects of
+each cell of cluster_degrees(level), cells halving at each level so that
+four cells of a level make one of the level above. Moving an object
+updates one cell per level; a minimum price gone is found again from the
+prices of the finest cell, then from the four cells below.
+
+Longitudes west of -180 or east of 180 in a bounding box wrap around the
+antimeridian, so that (170, 190) spans from 170 to -170. The position of
+an object is read from the object itself: a file storage Place created
+without coordinates only has the 0.0 defaults of its class, and is left
+out as the NULL columns of a database are.
+"""
+
+from array import array
+import heapq
+from math import asin, cos, degrees, floor, pi, radians, sin, sqrt
+from os import getenv
+from types import MemberDescriptorType
+
+# mean radius of the earth
+earth_radius_km = 6371.0088
+# size of the cells of a GridIndex, in degrees
+cell_degrees = float(getenv("HBNB_GRID_DEGREES", 0.25))
+# finest zoom level of a ClusterPyramid; higher zooms use its cells
+cluster_zoom = int(getenv("HBNB_CLUSTER_ZOOM", 10))
+
+
+def own_value(obj, field):
+    """returns the attribute field set on obj itself, in its __dict__ or
+    its slot, or None if obj only has the default of its class"""
+    slot = getattr(type(obj), field, None)
+    if isinstance(slot, MemberDescriptorType):
+        try:
+            return slot.__get__(obj)
+        except AttributeError:
+            return None
+    return getattr(obj, "__dict__", {}).get(field)
+
+
+def cluster_degrees(level):
+    """returns the size in degrees of the cells of a zoom level, 8 cells
+    around the earth at level 0, about 32 pixels each on a web map"""
+    return 360.0 / 2 ** (level + 3)
+
+
+def cluster_level(zoom):
+    """returns the level of a ClusterPyramid serving a zoom"""
+    return max(0, min(int(zoom), cluster_zoom))
+
+
+def merge(aggregate, other):
+    """adds the aggregate other, a [count, sum of latitudes, sum of
+    longitudes, count of prices, sum of prices, minimum price] list, to
+    aggregate"""
+    for i in range(5):
+        aggregate[i] += other[i]
+    if other[5] is not None and (aggregate[5] is None or
+                                 other[5] < aggregate[5]):
+        aggregate[5] = other[5]
+
+
+def cluster(level, key, aggregate):
+    """returns the dictionary sent for the aggregate of the cell key of a
+    zoom level: count, centroid, minimum and average price, and the
+    [west, south, east, north] bounds of the cell"""
+    size = cluster_degrees(level)
+    count, lats, lngs, priced, prices, low = aggregate
+    row, col = key
+    return {"count": count,
+            "latitude": round(lats / count, 6),
+            "longitude": round(lngs / count, 6),
+            "min_price": low,
+            "avg_price": round(prices / priced, 2) if priced else None,
+            "bbox": [col * size - 180, max(row * size - 90, -90.0),
+                     (col + 1) * size - 180, min((row + 1) * size - 90,
+                                                 90.0)]}
+
+
+def bounding_box(lat, lng, radius_km):
+    """returns the (south, west, north, east) box, in degrees, holding the
+    points within radius_km of (lat, lng); west and east are -180 and 180
+    when the circle holds a pole or spans all longitudes"""
+    angle = degrees(radius_km / earth_radius_km)
+    south, north = max(lat - angle, -90.0), min(lat + angle, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+    # widest longitude span of the circle, at the latitude of its tangents
+    ratio = sin(radians(angle)) / cos(radians(lat))
+    if ratio >= 1:
+        return south, -180.0, north, 180.0
+    span = degrees(asin(ratio))
+    return south, lng - span, north, lng + span
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """returns the great circle distance in km between two points given
+    in degrees"""
+    phi1, phi2 = radians(lat1), radians(lat2)
+    hav = sin((phi2 - phi1) / 2) ** 2 + \
+        cos(phi1) * cos(phi2) * sin(radians(lng2 - lng1) / 2) ** 2
+    return 2 * earth_radius_km * asin(sqrt(min(hav, 1.0)))
+
+
+def in_longitudes(lng, west, east):
+    """tells whether lng, in [-180, 180], lies between west and east,
+    which wrap around the antimeridian"""
+    if east - west >= 360:
+        return True
+    return west <= lng <= east or west <= lng + 360 <= east or \
+        west <= lng - 360 <= east
+
+
+def rank(lat, lng, ids, lats, lngs, coss, radius_km=None):
+    """returns the (distance in km, id) pairs of ids, at the latitudes and
+    longitudes lats and lngs in radians, coss being the cosines of lats,
+    within radius_km of (lat, lng) if it is not None"""
+    phi, lam = radians(lat), radians(lng)
+    cos_phi = cos(phi)
+    limit = 1.0
+    if radius_km is not None:
+        limit = sin(min(radius_km / earth_radius_km, pi) / 2) ** 2
+    # haversine of the central angle of each point, a cell at a time
+    hav = [sin((la - phi) / 2) ** 2 + cos_phi * c * sin((lo - lam) / 2) ** 2
+           for la, lo, c in zip(lats, lngs, coss)]
+    scale = 2 * earth_radius_km
+    return [(scale * asin(sqrt(min(h, 1.0))), id)
+            for h, id in zip(hav, ids) if h <= limit]
+
+
+def nearest(pairs, limit=None):
+    """returns the (distance, id) pairs sorted by distance, the first
+    limit of them if limit is not None"""
+    if limit is not None:
+        return heapq.nsmallest(limit, pairs)
+    return sorted(pairs)
+
+
+def cell_of(size, lat, lng):
+    """returns the (row, column) of the cell of (lat, lng) in a grid of
+    cells of size degrees"""
+    row = min(int(floor((lat + 90) / size)), int(floor(180 / size)) - 1)
+    col = int(floor((lng + 180) / size)) % int(round(360 / size))
+    return row, col
+
+
+def cell_range(size, south, west, north, east):
+    """returns the first and last rows and the list of the columns of the
+    cells of size degrees overlapping the box"""
+    first, last = cell_of(size, south, 0)[0], cell_of(size, north, 0)[0]
+    total = int(round(360 / size))
+    if east - west >= 360:
+        return first, last, list(range(total))
+    start = int(floor((west + 180) / size))
+    stop = int(floor((east + 180) / size)) + 1
+    return first, last, sorted(set(col % total
+                                   for col in range(start, stop)))
+
+
+def cells_in(cells, size, south, west, north, east):
+    """yields the (row, column) and the value of the cells of the
+    dictionary cells, of size degrees, overlapping the box; reads the
+    cells held if there are fewer of them than in the box"""
+    first, last, cols = cell_range(size, south, west, north, east)
+    if (last - first + 1) * len(cols) > len(cells):
+        cols = set(cols)
+        for key, value in cells.items():
+            if first <= key[0] <= last and key[1] in cols:
+                yield key, value
+        return
+    for row in range(first, last + 1):
+        for col in cols:
+            value = cells.get((row, col))
+            if value is not None:
+                yield (row, col), value
+
+
+class Cell:
+    """the objects of a cell of a GridIndex, in parallel arrays"""
+    __slots__ = ("ids", "lats", "lngs", "coss")
+
+    def __init__(self):
+        """Instantiate an empty cell"""
+        self.ids = []
+        self.lats = array("d")
+        self.lngs = array("d")
+        self.coss = array("d")
+
+
+class GridIndex:
+    """positions of the objects of a class, by cell of the earth, serving
+    the objects within a distance of a point or within a box"""
+
+    def __init__(self, fields=("latitude", "longitude"), objs=()):
+        """Instantiate the index of objs, fields naming the attributes
+        holding their latitude and longitude in degrees"""
+        self.fields = fields
+        # dictionary - Cell by (row, column)
+        self.cells = {}
+        # dictionary - (cell, position in it, latitude, longitude) by id
+        self.where = {}
+        for obj in objs:
+            self.add(obj)
+
+    def __len__(self):
+        """returns the number of objects indexed"""
+        return len(self.where)
+
+    def add(self, obj):
+        """moves obj to its current position; an object without a valid
+        latitude and longitude is left out"""
+        lat, lng = (own_value(obj, field) for field in self.fields)
+        place = self.where.get(obj.id)
+        if place is not None:
+            if place[2] == lat and place[3] == lng:
+                return
+            self.discard(obj.id)
+        if type(lat) not in (int, float) or type(lng) not in (int, float) \
+                or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+            return
+        key = cell_of(cell_degrees, lat, lng)
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = Cell()
+        self.where[obj.id] = (key, len(cell.ids), lat, lng)
+        phi = radians(lat)
+        cell.ids.append(obj.id)
+        cell.lats.append(phi)
+        cell.lngs.append(radians(lng))
+        cell.coss.append(cos(phi))
+
+    def discard(self, id):
+        """removes the object with that id, moving the last object of its
+        cell into its place"""
+        place = self.where.pop(id, None)
+        if place is None:
+            return
+        key, i = place[0], place[1]
+        cell = self.cells[key]
+        last = len(cell.ids) - 1
+        if i != last:
+            moved = cell.ids[last]
+            cell.ids[i] = moved
+            for column in (cell.lats, cell.lngs, cell.coss):
+                column[i] = column[last]
+            self.where[moved] = (key, i) + self.where[moved][2:]
+        for column in (cell.ids, cell.lats, cell.lngs, cell.coss):
+            column.pop()
+        if not cell.ids:
+            del self.cells[key]
+
+    def near(self, lat, lng, radius_km, limit=None):
+        """returns the (distance in km, id) pairs of the objects within
+        radius_km of (lat, lng), nearest first, at most limit of them"""
+        pairs = []
+        box = bounding_box(lat, lng, radius_km)
+        for key, cell in cells_in(self.cells, cell_degrees, *box):
+            pairs += rank(lat, lng, cell.ids, cell.lats, cell.lngs,
+                          cell.coss, radius_km)
+        return nearest(pairs, limit)
+
+    def within(self, south, west, north, east, limit=None):
+        """returns the (distance in km, id) pairs of the objects within
+        the box, nearest to its center first, at most limit of them"""
+        where = self.where
+        center = ((south + north) / 2, (west + east) / 2)
+        pairs = []
+        for key, cell in cells_in(self.cells, cell_degrees, south, west,
+                                  north, east):
+            pairs += [pair for pair in rank(center[0], center[1], cell.ids,
+                                            cell.lats, cell.lngs, cell.coss)
+                      if south <= where[pair[1]][2] <= north and
+                      in_longitudes(where[pair[1]][3], west, east)]
+        return nearest(pairs, limit)
+
+
+class ClusterPyramid:
+    """count, centroid and price aggregates of the objects of a class by
+    cell, at each zoom level from 0 to cluster_zoom"""
+
+    def __init__(self, fields=("latitude", "longitude", "price_by_night"),
+                 objs=()):
+        """Instantiate the aggregates of objs, fields naming the
+        attributes holding their latitude, longitude and price"""
+        self.fields = fields
+        # list - per level, aggregate lists by (row, column)
+        self.levels = [{} for level in range(cluster_zoom + 1)]
+        # dictionary - per cell of the finest level, counts by price
+        self.prices = {}
+        # dictionary - (latitude, longitude, price) by id
+        self.where = {}
+        finest = self.levels[-1]
+        for obj in objs:
+            values = self._values(obj)
+            if values is not None:
+                self.where[obj.id] = values
+                self._add(cluster_zoom, finest, values)
+        # each level above sums the cells of the level below
+        for level in range(cluster_zoom - 1, -1, -1):
+            cells = self.levels[level]
+            for (row, col), aggregate in self.levels[level + 1].items():
+                parent = cells.get((row // 2, col // 2))
+                if parent is None:
+                    cells[(row // 2, col // 2)] = list(aggregate)
+                else:
+                    merge(parent, aggregate)
+
+    def __len__(self):
+        """returns the number of objects aggregated"""
+        return len(self.where)
+
+    def _values(self, obj):
+        """returns the (latitude, longitude, price) of obj, price being
+        None if it is not a number, or None if obj has no valid
+        position"""
+        lat, lng = (own_value(obj, field) for field in self.fields[:2])
+        price = getattr(obj, self.fields[2], None)
+        if type(lat) not in (int, float) or type(lng) not in (int, float) \
+                or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+            return None
+        if type(price) not in (int, float):
+            price = None
+        return lat, lng, price
+
+    def _add(self, level, cells, values):
+        """adds the object of values to its cell of level in cells"""
+        lat, lng, price = values
+        key = cell_of(cluster_degrees(level), lat, lng)
+        aggregate = cells.get(key)
+        if aggregate is None:
+            aggregate = cells[key] = [0, 0.0, 0.0, 0, 0, None]
+        merge(aggregate, [1, lat, lng, price is not None, price or 0,
+                          price])
+        if level == cluster_zoom and price is not None:
+            counts = self.prices.setdefault(key, {})
+            counts[price] = counts.get(price, 0) + 1
+
+    def add(self, obj):
+        """moves obj to its current position and price"""
+        values = self._values(obj)
+        old = self.where.get(obj.id)
+        if old == values:
+            return
+        if old is not None:
+            self.discard(obj.id)
+        if values is None:
+            return
+        self.where[obj.id] = values
+        for level, cells in enumerate(self.levels):
+            self._add(level, cells, values)
+
+    def discard(self, id):
+        """removes the object with that id, from the finest level up"""
+        values = self.where.pop(id, None)
+        if values is None:
+            return
+        lat, lng, price = values
+        for level in range(cluster_zoom, -1, -1):
+            cells = self.levels[level]
+            key = cell_of(cluster_degrees(level), lat, lng)
+            aggregate = cells[key]
+            if aggregate[0] == 1:
+                del cells[key]
+                if level == cluster_zoom:
+                    self.prices.pop(key, None)
+                continue
+            aggregate[0] -= 1
+            aggregate[1] -= lat
+            aggregate[2] -= lng
+            if price is None:
+                continue
+            aggregate[3] -= 1
+            aggregate[4] -= price
+            if level == cluster_zoom:
+                counts = self.prices[key]
+                counts[price] -= 1
+                if not counts[price]:
+                    del counts[price]
+                aggregate[5] = min(counts) if counts else None
+            elif price == aggregate[5]:
+                below = self.levels[level + 1]
+                lows = [below[child][5] for child in
+                        ((key[0] * 2 + i, key[1] * 2 + j)
+                         for i in (0, 1) for j in (0, 1))
+                        if child in below and below[child][5] is not None]
+                aggregate[5] = min(lows) if lows else None
+
+    def clusters(self, south, west, north, east, zoom):
+        """returns the aggregates of the cells of the level of zoom
+        overlapping the box, see cluster()"""
+        level = cluster_level(zoom)
+        return [cluster(level, key, aggregate) for key, aggregate in
+                cells_in(self.levels[level], cluster_degrees(level), south,
+                         west, north, east)]
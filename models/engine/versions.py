@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""
+Contains the Versions class, the version numbers of collections of objects
+kept by the storage engines
+
+A collection is named by a tag: ("City",) for all the cities, ("City",
+"state_id", id) for the cities of a state. Each change of an object bumps
+the tags of its class and of its foreign key values, before and after the
+change, to the next number of a sequence starting over with each reload(),
+which gets a new epoch. Only the changes made through this process are
+counted.
+
+At most max_tags tags are kept, the least recently changed being dropped
+first. A dropped tag takes the number and time of the last change dropped,
+so that its version never goes back to one a client may hold.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from os import getenv
+from threading import Lock
+from uuid import uuid4
+
+# tags whose last change is kept
+max_tags = int(getenv("HBNB_VERSIONS_MAX", 100000))
+
+
+class Versions:
+    """version number and time of the last change of each collection"""
+
+    def __init__(self):
+        """Instantiate the versions of a newly loaded storage"""
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """forgets the changes counted so far and starts a new epoch"""
+        with self.lock:
+            self.epoch = uuid4().hex[:12]
+            self.started = datetime.utcnow()
+            self.sequence = 0
+            # dictionary - (sequence number, time) of the last change of
+            # each tag, least recently changed first
+            self.changes = OrderedDict()
+            # (sequence number, time) of the tags without a change kept
+            self.floor = (0, self.started)
+
+    def changed(self, name, id, related):
+        """bumps the tags of the object of class name with that id and
+        the (foreign key, value) pairs related, a storage listener"""
+        now = datetime.utcnow()
+        with self.lock:
+            self.sequence += 1
+            change = (self.sequence, now)
+            for tag in [(name,)] + [(name, field, value)
+                                    for field, value in related]:
+                self.changes[tag] = change
+                self.changes.move_to_end(tag)
+            while len(self.changes) > max_tags:
+                self.floor = max(self.floor,
+                                 self.changes.popitem(last=False)[1])
+
+    def version(self, *tags):
+        """returns the version of the collections named by tags, a string
+        which changes with any of them"""
+        changes, floor = self.changes, self.floor
+        number = max([changes.get(tag, floor)[0] for tag in tags] or [0])
+        return "{}-{}".format(self.epoch, number)
+
+    def modified(self, *tags):
+        """returns the time of the last change of the collections named by
+        tags, or the time of the last reset() if they did not change"""
+        changes, floor = self.changes, self.floor
+        return max([changes.get(tag, floor)[1] for tag in tags] or
+                   [self.started])
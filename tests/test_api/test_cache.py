@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""
+Contains the TestCacheDocs, TestResponseCache and TestCachedRequests
+classes
+"""
+
+from api.v1 import cache as cache_module
+from api.v1.app import app
+from api.v1.cache import ResponseCache, cache
+import inspect
+from models import storage
+from models.state import State
+import pep8
+import unittest
+from unittest import mock
+
+
+class TestCacheDocs(unittest.TestCase):
+    """Tests to check the documentation and style of the response cache"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.cache_f = inspect.getmembers(cache_module, inspect.isfunction)
+        cls.cache_f += inspect.getmembers(ResponseCache, inspect.isfunction)
+
+    def test_pep8_conformance_cache(self):
+        """Test that api/v1/cache.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['api/v1/cache.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_cache(self):
+        """Test tests/test_api/test_cache.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_api/test_cache.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_cache_func_docstrings(self):
+        """Test for the presence of docstrings in cache functions"""
+        for func in self.cache_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test the LRU eviction, expiry and invalidation of a ResponseCache"""
+    def put(self, cache, path, *tags):
+        """caches the response "<path>" for path with tags"""
+        cache.put(path, path.encode(), frozenset(tags), cache.generation)
+
+    def test_put_get(self):
+        """Test that get() returns what put() cached, and counts hits and
+        misses"""
+        cache = ResponseCache(size=4)
+        self.assertIsNone(cache.get("/a"))
+        self.put(cache, "/a", ("State",))
+        self.assertEqual(cache.get("/a"), b"/a")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]),
+                         (1, 1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_evict(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ResponseCache(size=2)
+        self.put(cache, "/a", ("State",))
+        self.put(cache, "/b", ("State",))
+        cache.get("/a")
+        self.put(cache, "/c", ("State",))
+        self.assertIsNone(cache.get("/b"))
+        self.assertEqual(cache.get("/a"), b"/a")
+        self.assertEqual(cache.get("/c"), b"/c")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertNotIn("/b", cache.tagged[("State",)])
+
+    def test_expire(self):
+        """Test that an entry older than the time to live is dropped"""
+        cache = ResponseCache(size=2, ttl=10)
+        with mock.patch.object(cache_module, "monotonic", return_value=100):
+            self.put(cache, "/a", ("State",))
+        with mock.patch.object(cache_module, "monotonic", return_value=105):
+            self.assertEqual(cache.get("/a"), b"/a")
+        with mock.patch.object(cache_module, "monotonic", return_value=111):
+            self.assertIsNone(cache.get("/a"))
+        self.assertEqual(cache.tagged, {})
+
+    def test_invalidate(self):
+        """Test that invalidate() and on_change() drop the entries of
+        their tags only"""
+        cache = ResponseCache(size=8)
+        self.put(cache, "/states", ("State",))
+        self.put(cache, "/states/s1", ("State", "s1"))
+        self.put(cache, "/states/s1/cities", ("City", "state_id", "s1"))
+        self.put(cache, "/amenities", ("Amenity",))
+        cache.invalidate([("State", "s1")])
+        self.assertIsNone(cache.get("/states/s1"))
+        self.assertEqual(cache.get("/states"), b"/states")
+        cache.on_change("City", "c1", [("state_id", "s1")])
+        self.assertIsNone(cache.get("/states/s1/cities"))
+        self.assertEqual(cache.get("/amenities"), b"/amenities")
+        self.assertEqual(cache.stats()["invalidations"], 2)
+
+    def test_generation(self):
+        """Test that a response built while an invalidation happened, or
+        declared uncacheable, is not cached"""
+        cache = ResponseCache(size=4)
+        generation = cache.generation
+        cache.invalidate([("State",)])
+        cache.put("/a", b"/a", frozenset([("State",)]), generation)
+        self.assertIsNone(cache.get("/a"))
+        cache.put("/b", b"/b", frozenset([("State",), None]),
+                  cache.generation)
+        self.assertIsNone(cache.get("/b"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+@unittest.skipIf(not cache.size, "response cache disabled")
+class TestCachedRequests(unittest.TestCase):
+    """Test the response cache through the API"""
+    def setUp(self):
+        """Store a state, empty the response cache and get a test
+        client"""
+        self.state = State(name="Cached")
+        storage.new(self.state)
+        storage.save()
+        cache.clear()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Delete the state"""
+        storage.delete(storage.get(State, self.state.id))
+        storage.save()
+        storage.close()
+
+    def get(self, url):
+        """returns the X-Cache header and the json of a GET of url"""
+        response = self.client.get(url)
+        return response.headers.get("X-Cache"), response.get_json()
+
+    def test_hit_miss(self):
+        """Test that a GET is served from the cache until an object it was
+        built from changes"""
+        url = "/api/v1/states/" + self.state.id
+        self.assertEqual(self.get(url)[0], "MISS")
+        self.assertEqual(self.get(url), ("HIT", self.state.to_dict()))
+        self.assertEqual(self.get("/api/v1/states")[0], "MISS")
+        self.assertEqual(self.get("/api/v1/states")[0], "HIT")
+        state = storage.get(State, self.state.id)
+        state.name = "Renamed"
+        state.save()
+        hit, found = self.get(url)
+        self.assertEqual((hit, found["name"]), ("MISS", "Renamed"))
+        self.assertEqual(self.get("/api/v1/states")[0], "MISS")
+        stats = self.get("/api/v1/stats/cache")[1]
+        self.assertEqual(stats["hits"], 2)
+        self.assertGreaterEqual(stats["invalidations"], 2)
@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+"""
+Contains the TestViewsDocs, TestRoutes, TestCursor and TestStreaming
+classes
+"""
+
+from api.v1.app import app
+from api.v1 import views
+from api.v1.cache import cache
+from base64 import urlsafe_b64encode
+import inspect
+import json
+from models import storage
+from models.state import State
+import pep8
+import unittest
+from unittest import mock
+import zlib
+
+
+def cursor(created_at, id):
+    """returns the opaque cursor of (created_at, id)"""
+    value = json.dumps([created_at, id]).encode()
+    return urlsafe_b64encode(value).decode().rstrip("=")
+
+
+class TestViewsDocs(unittest.TestCase):
+    """Tests to check the documentation and style of the views helpers"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.views_f = inspect.getmembers(views, inspect.isfunction)
+
+    def test_pep8_conformance_test_views(self):
+        """Test tests/test_api/test_views.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_api/test_views.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_views_func_docstrings(self):
+        """Test for the presence of docstrings in the views helpers"""
+        for func in self.views_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+
+class TestRoutes(unittest.TestCase):
+    """Test the URLs and methods the views are routed to"""
+    def test_routes(self):
+        """Test that the places of a city are under /cities like its other
+        routes, and that places and states are updated with PUT"""
+        adapter = app.url_map.bind("localhost")
+        for method, path, endpoint in [
+                ("GET", "/cities/c1/places", "places_by_city"),
+                ("POST", "/cities/c1/places", "create_place"),
+                ("PUT", "/places/p1", "update_place"),
+                ("PUT", "/states/s1", "update_state")]:
+            self.assertEqual(adapter.match("/api/v1" + path, method)[0],
+                             "app_views." + endpoint)
+
+
+class TestCursor(unittest.TestCase):
+    """Test the cursors of the pages of GET /api/v1/states"""
+    def setUp(self):
+        """Store a few states, created after all the others, and get a
+        test client"""
+        created = "2099-01-01T00:00:0{}.000000"
+        self.states = [State(name="Cursor {}".format(i),
+                             created_at=created.format(i)) for i in range(3)]
+        for state in self.states:
+            storage.new(state)
+        storage.save()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Delete the states"""
+        for state in self.states:
+            storage.delete(storage.get(State, state.id))
+        storage.save()
+        storage.close()
+
+    def test_next_page(self):
+        """Test that the cursor of a page gets the next page"""
+        first = self.states[0]
+        response = self.client.get("/api/v1/states?limit=1&after=" + cursor(
+            first.created_at.isoformat(), first.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s["id"] for s in response.get_json()],
+                         [self.states[1].id])
+        response = self.client.get("/api/v1/states?limit=1&after=" +
+                                   response.headers["X-Next-Cursor"])
+        self.assertEqual([s["id"] for s in response.get_json()],
+                         [self.states[2].id])
+        self.assertNotIn("X-Next-Cursor", response.headers)
+
+    def test_invalid_cursor(self):
+        """Test that cursors which are not ones, or hold a time with a UTC
+        offset, get 400"""
+        for value in ["not a cursor",
+                      cursor("2026-10-18T00:00:00+00:00", "x"),
+                      cursor("yesterday", "x")]:
+            response = self.client.get("/api/v1/states?after=" + value)
+            self.assertEqual(response.status_code, 400, value)
+
+
+class TestStreaming(unittest.TestCase):
+    """Test the representations of the collections streamed by
+    jsonify_list(), and the caching of their bodies"""
+    def setUp(self):
+        """Store a few states, empty the response cache and get a test
+        client"""
+        self.states = [State(name="Streamed {}".format(i)) for i in range(3)]
+        for state in self.states:
+            storage.new(state)
+        storage.save()
+        cache.clear()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Delete the states"""
+        for state in self.states:
+            storage.delete(storage.get(State, state.id))
+        storage.save()
+        storage.close()
+
+    def ids(self, states):
+        """returns the ids of the states of setUp among states"""
+        ours = {state.id for state in self.states}
+        return sorted(state["id"] for state in states if state["id"] in ours)
+
+    def test_json(self):
+        """Test that a collection is a JSON list by default"""
+        response = self.client.get("/api/v1/states")
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertIsNone(response.content_encoding)
+        self.assertEqual(self.ids(json.loads(response.get_data())),
+                         sorted(state.id for state in self.states))
+        self.assertTrue({"Accept", "Accept-Encoding"} <=
+                        set(response.vary))
+
+    def test_ndjson(self):
+        """Test that a client accepting NDJSON gets one object per line"""
+        response = self.client.get("/api/v1/states", headers={
+            "Accept": "application/x-ndjson"})
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(self.ids(json.loads(line) for line in lines),
+                         sorted(state.id for state in self.states))
+
+    def test_gzip(self):
+        """Test that a client accepting gzip gets the JSON list compressed,
+        with an ETag of its own"""
+        plain = self.client.get("/api/v1/states")
+        response = self.client.get("/api/v1/states", headers={
+            "Accept-Encoding": "gzip"})
+        self.assertEqual(response.content_encoding, "gzip")
+        self.assertIn("Accept-Encoding", response.vary)
+        body = zlib.decompress(response.get_data(), 16 + zlib.MAX_WBITS)
+        self.assertEqual(json.loads(body), json.loads(plain.get_data()))
+        self.assertNotEqual(response.get_etag(), plain.get_etag())
+
+    @unittest.skipIf(not cache.size, "response cache disabled")
+    def test_large_body_not_cached(self):
+        """Test that a streamed body larger than max_bytes is sent but not
+        cached"""
+        with mock.patch.object(cache, "max_bytes", 100):
+            for i in range(2):
+                response = self.client.get("/api/v1/states")
+                self.assertEqual(response.headers["X-Cache"], "MISS")
+                self.assertEqual(len(self.ids(response.get_json())), 3)
@@ -1,12 +1,15 @@
 #!/usr/bin/python3
 """
-Contains the class TestConsoleDocs
+Contains the classes TestConsoleDocs and TestConsoleDB
 """
 
 import console
 import inspect
+import io
+import models
 import pep8
 import unittest
+from unittest import mock
 HBNBCommand = console.HBNBCommand
 
 
@@ -39,3 +42,14 @@ class TestConsoleDocs(unittest.TestCase):
                          "HBNBCommand class needs a docstring")
         self.assertTrue(len(HBNBCommand.__doc__) >= 1,
                         "HBNBCommand class needs a docstring")
+
+
+class TestConsoleDB(unittest.TestCase):
+    """Class for testing the console on database storage"""
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_all_unmapped_class(self):
+        """Test that all prints no instances of BaseModel, which has no
+        table"""
+        with mock.patch("sys.stdout", new=io.StringIO()) as out:
+            HBNBCommand().onecmd("all BaseModel")
+        self.assertEqual(out.getvalue(), "[]\n")
@@ -158,3 +158,16 @@ class TestBaseModel(unittest.TestCase):
         self.assertEqual(old_created_at, new_created_at)
         self.assertTrue(mock_storage.new.called)
         self.assertTrue(mock_storage.save.called)
+
+    def test_from_records(self):
+        """Test that from_records rebuilds instances from to_dict()"""
+        inst = BaseModel()
+        inst.name = "Holberton"
+        records = [inst.to_dict(), {"name": "Betty"}]
+        copy, new = BaseModel.from_records(records)
+        self.assertIs(type(copy), BaseModel)
+        self.assertEqual(copy.__dict__, inst.__dict__)
+        self.assertNotIn("__class__", copy.__dict__)
+        self.assertEqual(new.name, "Betty")
+        self.assertIs(type(new.created_at), datetime)
+        self.assertIs(type(new.id), str)
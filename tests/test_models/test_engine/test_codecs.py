@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+"""
+Contains the TestCodecsDocs and TestCodecs classes
+"""
+
+from datetime import datetime
+import inspect
+from models.engine import codecs
+from models.place import Place
+from models.state import State
+import os
+import pep8
+import unittest
+
+
+class TestCodecsDocs(unittest.TestCase):
+    """Tests to check the documentation and style of the codecs"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.codec_f = []
+        for codec in (codecs.JSONCodec, codecs.BinaryCodec):
+            cls.codec_f += inspect.getmembers(codec, inspect.isfunction)
+
+    def test_pep8_conformance_codecs(self):
+        """Test that models/engine/codecs.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/codecs.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_codecs(self):
+        """Test tests/test_models/test_engine/test_codecs.py conforms to
+        PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_models/test_engine/\
+test_codecs.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_codecs_module_docstring(self):
+        """Test for the codecs.py module docstring"""
+        self.assertIsNot(codecs.__doc__, None,
+                         "codecs.py needs a docstring")
+        self.assertTrue(len(codecs.__doc__) >= 1,
+                        "codecs.py needs a docstring")
+
+    def test_codecs_func_docstrings(self):
+        """Test for the presence of docstrings in codec methods"""
+        for func in self.codec_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+
+class TestCodecs(unittest.TestCase):
+    """Test the codecs"""
+    def records(self):
+        """Returns the (key, record) pairs of a few objects"""
+        place = Place(name="Chez Ève", price_by_night=80, latitude=37.7,
+                      description=None, amenity_ids=["a", "b"])
+        state = State(name="California")
+        state.created_at = datetime(2017, 9, 28, 21, 3, 54)
+        return [("Place." + place.id, place.to_dict()),
+                ("State." + state.id, state.to_dict())]
+
+    def test_round_trip(self):
+        """Test that each codec decodes what it encodes"""
+        records = self.records()
+        for codec in codecs.codecs.values():
+            with self.subTest(codec=codec.name):
+                decoded = codec.decode(codec.encode(records))
+                self.assertEqual(len(decoded), len(records))
+                for key, record in records:
+                    for name, value in decoded[key].items():
+                        if isinstance(value, datetime):
+                            value = value.strftime(codecs.time)
+                        self.assertEqual(value, record[name])
+
+    def test_binary_is_smaller(self):
+        """Test that the binary codec stores repeated strings once"""
+        records = self.records()
+        records += [(key.replace(record["id"], str(i)),
+                     dict(record, id=str(i))) for i in range(50)
+                    for key, record in records[:1]]
+        json_size = len(codecs.codecs["json"].encode(records))
+        binary_size = len(codecs.codecs["binary"].encode(records))
+        self.assertLess(binary_size * 2, json_size)
+
+    def test_convert(self):
+        """Test conversion between codecs by file extension"""
+        records = dict(self.records())
+        with open("test_convert.json", "wb") as f:
+            f.write(codecs.codecs["json"].encode(records.items()))
+        try:
+            self.assertEqual(codecs.convert("test_convert.json",
+                                            "test_convert.hbnb"), 2)
+            with open("test_convert.hbnb", "rb") as f:
+                decoded = codecs.codecs["binary"].decode(f.read())
+            self.assertEqual(set(decoded), set(records))
+        finally:
+            for name in ("test_convert.json", "test_convert.hbnb"):
+                if os.path.exists(name):
+                    os.remove(name)
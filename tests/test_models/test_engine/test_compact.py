@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+"""
+Contains the TestCompactDocs and TestCompact classes
+"""
+
+from datetime import datetime
+import inspect
+import models
+from models.engine import compact
+from models.place import Place
+import pep8
+import unittest
+
+
+class TestCompactDocs(unittest.TestCase):
+    """Tests to check the documentation and style of compact models"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.compact_f = inspect.getmembers(compact, inspect.isfunction)
+        cls.compact_f += inspect.getmembers(compact.CompactModel,
+                                            inspect.isfunction)
+
+    def test_pep8_conformance_compact(self):
+        """Test that models/engine/compact.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/compact.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_compact(self):
+        """Test tests/test_models/test_engine/test_compact.py conforms to
+        PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_models/test_engine/\
+test_compact.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_compact_module_docstring(self):
+        """Test for the compact.py module docstring"""
+        self.assertIsNot(compact.__doc__, None,
+                         "compact.py needs a docstring")
+        self.assertTrue(len(compact.__doc__) >= 1,
+                        "compact.py needs a docstring")
+
+    def test_compact_func_docstrings(self):
+        """Test for the presence of docstrings in compact functions"""
+        for func in self.compact_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestCompact(unittest.TestCase):
+    """Test the compact model classes"""
+    def test_compact_place(self):
+        """Test that a compact Place holds the attributes of a Place"""
+        place = Place(name="Loft", city_id="c1", user_id="u1",
+                      number_rooms=2)
+        stored = compact.compact_class(Place).from_records(
+            (place.to_dict(),))[0]
+        self.assertIs(type(stored), compact.compact_class(Place))
+        self.assertEqual(stored.to_dict(), place.to_dict())
+        self.assertTrue(str(stored).startswith(
+            "[Place] ({}) {{".format(place.id)))
+        self.assertIn("'name': 'Loft'", str(stored))
+        self.assertEqual(stored.price_by_night, 0)
+        self.assertEqual(stored.amenity_ids, [])
+        self.assertIsInstance(stored.updated_at, datetime)
+        self.assertEqual(stored.updated_at, place.updated_at)
+        self.assertRaises(AttributeError, getattr, stored, "missing")
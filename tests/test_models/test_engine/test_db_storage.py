@@ -3,7 +3,7 @@
 Contains the TestDBStorageDocs and TestDBStorage classes
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 import inspect
 import models
 from models.engine import db_storage
@@ -17,7 +17,11 @@ from models.user import User
 import json
 import os
 import pep8
+import sqlalchemy
+from sqlalchemy.dialects import mysql
+from threading import Thread
 import unittest
+from unittest import mock
 DBStorage = db_storage.DBStorage
 classes = {"Amenity": Amenity, "City": City, "Place": Place,
            "Review": Review, "State": State, "User": User}
@@ -86,3 +90,447 @@ class TestFileStorage(unittest.TestCase):
     @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
     def test_save(self):
         """Test that save properly saves objects to file.json"""
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_bulk_new_and_update(self):
+        """Test that bulk_new and bulk_update insert and update rows"""
+        ids = models.storage.bulk_new(State, [{"name": "Bulk"}] * 3,
+                                      chunk_size=2)
+        self.assertEqual(len(set(ids)), 3)
+        state = models.storage.get(State, ids[0])
+        self.assertEqual(state.name, "Bulk")
+        self.assertIsInstance(state.created_at, datetime)
+        self.assertEqual(models.storage.bulk_update(
+            State, [{"id": id, "name": "Renamed"} for id in ids]), 3)
+        self.assertEqual(models.storage.get(State, ids[2]).name, "Renamed")
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_iter(self):
+        """Test that iter yields the rows of a class in batches"""
+        ids = models.storage.bulk_new(State, [{"name": "Iter"}] * 5)
+        states = models.storage.iter(State, batch_size=2)
+        found = [state.id for state in states]
+        self.assertTrue(set(ids) <= set(found))
+        self.assertEqual(len(found), models.storage.count(State))
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_stats(self):
+        """Test that stats reports the connection pool"""
+        models.storage.count(State)
+        stats = models.storage.stats()
+        self.assertIs(type(stats), dict)
+        if "pool_checkouts" in stats:
+            self.assertGreater(stats["pool_checkouts"], 0)
+            self.assertGreaterEqual(stats["pool_wait_seconds"], 0)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_count_cached(self):
+        """Test that count follows the commits without querying"""
+        before = models.storage.count(State)
+        engine = models.storage._DBStorage__engine
+        queries = []
+
+        def count(*args):
+            """Counts the statements sent to the database"""
+            queries.append(args[2])
+        sqlalchemy.event.listen(engine, "before_cursor_execute", count)
+        self.addCleanup(sqlalchemy.event.remove, engine,
+                        "before_cursor_execute", count)
+        state = State(name="Counted")
+        models.storage.new(state)
+        models.storage.save()
+        models.storage.bulk_new(State, [{"name": "Counted"}] * 3)
+        del queries[:]
+        self.assertEqual(models.storage.count(State), before + 4)
+        self.assertEqual(queries, [])
+        models.storage.delete(state)
+        models.storage.save()
+        self.assertEqual(models.storage.count(State), before + 3)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_count_races(self):
+        """Test that a commit landing while the rows are counted, first
+        or in the background, is counted once"""
+        with mock.patch.dict(os.environ,
+                             {"HBNB_DB_URL": "sqlite:///test_count.db"}):
+            storage = db_storage.DBStorage()
+        storage.reload()
+        self.addCleanup(os.remove, "test_count.db")
+        self.addCleanup(storage.close)
+        storage.new(State(name="Counted"))
+        storage.save()
+        threads = []
+
+        def commit_state():
+            """stores a state from another thread"""
+            storage.new(State(name="Raced"))
+            storage.save()
+            storage.close()
+
+        def race(conn, cursor, statement, *args):
+            """starts a commit during the first count of a round"""
+            if "count(" in statement.lower() and len(threads) < rounds:
+                threads.append(Thread(target=commit_state))
+                threads[-1].start()
+                threads[-1].join(0.2)
+        engine = storage._DBStorage__engine
+        sqlalchemy.event.listen(engine, "before_cursor_execute", race)
+        self.addCleanup(sqlalchemy.event.remove, engine,
+                        "before_cursor_execute", race)
+        rounds = 1
+        self.assertIn(storage.count(State), (1, 2))
+        threads[-1].join()
+        self.assertEqual(storage.count(State), 2)
+        rounds = 2
+        storage._recount_background()
+        threads[-1].join()
+        self.assertEqual(storage.count(State), 3)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_count_without_blocking(self):
+        """Test that commits go on while the rows are counted, a class
+        whose commits overlapped its count being counted again, at most
+        count_retries times"""
+        with mock.patch.dict(os.environ,
+                             {"HBNB_DB_URL": "sqlite:///test_count.db"}):
+            storage = db_storage.DBStorage()
+        storage.reload()
+        self.addCleanup(os.remove, "test_count.db")
+        self.addCleanup(storage.close)
+        storage.new(State(name="Counted"))
+        storage.save()
+        counted = []
+
+        def commit_state():
+            """stores a state from another thread"""
+            storage.new(State(name="Raced"))
+            storage.save()
+            storage.close()
+
+        def race(conn, cursor, statement, *args):
+            """commits a state during the counts of states"""
+            if "count(" in statement.lower() and "states" in statement:
+                counted.append(statement)
+                if len(counted) <= rounds:
+                    thread = Thread(target=commit_state)
+                    thread.start()
+                    thread.join(5)
+                    self.assertFalse(thread.is_alive())
+        engine = storage._DBStorage__engine
+        sqlalchemy.event.listen(engine, "before_cursor_execute", race)
+        self.addCleanup(sqlalchemy.event.remove, engine,
+                        "before_cursor_execute", race)
+        rounds = 1
+        self.assertEqual(storage.count(State), 2)
+        self.assertEqual(len(counted), 2)
+        del counted[:]
+        rounds = 100
+        storage._recount_background()
+        self.assertEqual(len(counted), db_storage.count_retries + 1)
+        self.assertEqual(storage.count(State), 2 + len(counted))
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_load_query_count(self):
+        """Test that load fetches relationships in a fixed number of
+        queries, whatever the number of rows"""
+        ids = models.storage.bulk_new(State, [{"name": "Load"}] * 4)
+        models.storage.bulk_new(City, [{"name": "City", "state_id": id}
+                                       for id in ids for i in range(3)])
+        engine = models.storage._DBStorage__engine
+        queries = []
+
+        def count(*args):
+            """Counts the statements sent to the database"""
+            queries.append(args[2])
+        sqlalchemy.event.listen(engine, "before_cursor_execute", count)
+        self.addCleanup(sqlalchemy.event.remove, engine,
+                        "before_cursor_execute", count)
+        models.storage.close()
+        states = models.storage.all(State, load=["cities"]).values()
+        self.assertGreaterEqual(sum(len(s.cities) for s in states), 12)
+        self.assertEqual(len(queries), 2)
+        models.storage.close()
+        del queries[:]
+        state = models.storage.get(State, ids[0], load=["cities.places"])
+        self.assertEqual(sum(len(city.places) for city in state.cities), 0)
+        self.assertEqual(len(queries), 3)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_query(self):
+        """Test that query filters, sorts and pages in SQL"""
+        ids = models.storage.bulk_new(State, [{"name": "Q{:02d}".format(i)}
+                                              for i in range(10)])
+        query = models.storage.query(State).filter(id__in=ids)
+        self.assertEqual(query.count(), 10)
+        names = [s.name for s in query.order_by("-name").limit(2).offset(1)]
+        self.assertEqual(names, ["Q08", "Q07"])
+        self.assertIn("LIMIT", str(query.statement()))
+        self.assertEqual(models.storage.query(State).filter(
+            id__in=ids, name__lt="Q03").count(), 3)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_query_order_missing(self):
+        """Test that rows without a value sort last in either order, with
+        or without a limit, in SQLite and MySQL"""
+        ids = models.storage.bulk_new(User, [
+            {"email": "u{}@hbnb".format(i), "password": "pwd",
+             "first_name": "F{}".format(i)} for i in range(3)] + [
+            {"email": "anonymous@hbnb", "password": "pwd"}])
+        query = models.storage.query(User).filter(id__in=ids)
+        self.assertEqual([u.email for u in query.order_by("first_name")],
+                         ["u0@hbnb", "u1@hbnb", "u2@hbnb", "anonymous@hbnb"])
+        self.assertEqual([u.email for u in query.order_by("-first_name")],
+                         ["u2@hbnb", "u1@hbnb", "u0@hbnb", "anonymous@hbnb"])
+        self.assertEqual([u.email for u in query.order_by("first_name")
+                          .limit(2).offset(2)], ["u2@hbnb", "anonymous@hbnb"])
+        self.assertEqual([u.email for u in query.order_by("-first_name")
+                          .limit(2).offset(2)], ["u0@hbnb", "anonymous@hbnb"])
+        sql = str(query.statement().compile(dialect=mysql.dialect()))
+        self.assertIn("ORDER BY users.first_name IS NULL, "
+                      "users.first_name DESC", sql)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_query_links(self):
+        """Test that conditions on the amenity ids of places run as
+        semi-joins on place_amenity"""
+        storage = models.storage
+        state = State(name="Linked")
+        city = City(name="Linked", state_id=state.id)
+        user = User(email="linked@hbnb.io", password="pwd")
+        wifi, pool = Amenity(name="Wifi"), Amenity(name="Pool")
+        for obj in (state, city, user, wifi, pool):
+            storage.new(obj)
+        places = []
+        for i in range(6):
+            place = Place(name="L{}".format(i), city_id=city.id,
+                          user_id=user.id, price_by_night=i * 10)
+            place.amenities = [wifi] + ([pool] if i % 2 else [])
+            storage.new(place)
+            places.append(place)
+        storage.save()
+        query = storage.query(Place).filter(city_id=city.id,
+                                            amenity_ids__all=[wifi.id,
+                                                              pool.id],
+                                            price_by_night__gte=20)
+        self.assertIn("place_amenity", str(query.statement()))
+        self.assertEqual(sorted(p.name for p in query), ["L3", "L5"])
+        self.assertEqual(storage.query(Place).filter(
+            amenity_ids=wifi.id, city_id=city.id).count(), 6)
+        self.assertEqual(storage.query(Place).filter(
+            amenity_ids__all=[], city_id=city.id).count(), 6)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_query_subquery(self):
+        """Test that a query as the value of an in condition runs as a
+        subquery of one SELECT, and that filter_any() ORs conditions"""
+        storage = models.storage
+        states = [State(name="Sub{}".format(i)) for i in range(3)]
+        cities = [City(name="Sub{}".format(i), state_id=states[i].id)
+                  for i in range(3)]
+        user = User(email="sub@hbnb.io", password="pwd")
+        for obj in states + cities + [user]:
+            storage.new(obj)
+        for i, city in enumerate(cities):
+            storage.new(Place(name="S{}".format(i), city_id=city.id,
+                              user_id=user.id))
+        storage.save()
+        query = storage.query(Place).filter(
+            city_id__in=storage.query(City).filter_any(
+                id__in=[cities[0].id], state_id__in=[states[2].id]))
+        engine = storage._DBStorage__engine
+        statements = []
+
+        def record(*args):
+            """Records the statements sent to the database"""
+            statements.append(args[2])
+        sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+        self.addCleanup(sqlalchemy.event.remove, engine,
+                        "before_cursor_execute", record)
+        self.assertEqual(sorted(p.name for p in query), ["S0", "S2"])
+        self.assertEqual(len(statements), 1)
+        self.assertIn("cities", statements[0])
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_links(self):
+        """Test that link() and unlink() write place_amenity rows and
+        expire the collections of both sides"""
+        storage = models.storage
+        state = State(name="Links")
+        city = City(name="Links", state_id=state.id)
+        user = User(email="links@hbnb.io", password="pwd")
+        place = Place(name="P", city_id=city.id, user_id=user.id)
+        wifi, pool = Amenity(name="Wifi"), Amenity(name="Pool")
+        for obj in (state, city, user, place, wifi, pool):
+            storage.new(obj)
+        storage.save()
+        self.assertEqual(place.amenities, [])
+        changes = []
+
+        def listener(*change):
+            """records the changes"""
+            changes.append(change)
+        storage.on_change(listener)
+        self.addCleanup(storage._DBStorage__listeners.remove, listener)
+        self.assertEqual(storage.link(place, [wifi, pool, wifi]), 2)
+        self.assertEqual(storage.link(place, [wifi]), 0)
+        self.assertEqual(changes, [("Place", place.id,
+                                    [("amenity_ids", wifi.id),
+                                     ("amenity_ids", pool.id)])])
+        self.assertEqual(sorted(a.name for a in place.amenities),
+                         ["Pool", "Wifi"])
+        self.assertEqual(pool.place_amenities, [place])
+        self.assertEqual(storage.unlink(place, [pool]), 1)
+        self.assertEqual(storage.unlink(place, [pool]), 0)
+        self.assertEqual([a.name for a in place.amenities], ["Wifi"])
+        self.assertEqual(pool.place_amenities, [])
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_near(self):
+        """Test that near() and within() select the bounding box in SQL
+        and rank the rows by distance"""
+        storage = models.storage
+        state = State(name="Near")
+        city = City(name="Near", state_id=state.id)
+        user = User(email="near@hbnb.io", password="pwd")
+        for obj in (state, city, user):
+            storage.new(obj)
+        storage.save()
+        longitudes = [179.97, 179.985, 179.99, -179.99, -179.975, -179.97]
+        storage.bulk_new(Place, [{"name": "N{}".format(i), "city_id": city.id,
+                                  "user_id": user.id, "latitude": -20,
+                                  "longitude": lng}
+                                 for i, lng in enumerate(longitudes)])
+        near = storage.near(Place, -20, -179.993, 2)
+        self.assertEqual([p.name for d, p in near], ["N3", "N2", "N4"])
+        self.assertAlmostEqual(near[0][0], 0.313, places=3)
+        within = storage.within(Place, -21, 179.98, -19, 180.028)
+        self.assertEqual(sorted(p.name for d, p in within),
+                         ["N1", "N2", "N3", "N4"])
+        self.assertEqual([p.name for d, p in storage.within(
+            Place, -21, 179.98, -19, 180.028, limit=1)], ["N3"])
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_batch_threads(self):
+        """Test that a batch only defers the saves of its own thread, each
+        thread having its own session"""
+        with mock.patch.dict(os.environ,
+                             {"HBNB_DB_URL": "sqlite:///test_batch.db"}):
+            storage = db_storage.DBStorage()
+        storage.reload()
+        self.addCleanup(os.remove, "test_batch.db")
+        self.addCleanup(storage.close)
+
+        def save_state():
+            """stores a state from another thread"""
+            storage.new(State(name="Other"))
+            storage.save()
+            storage.close()
+        with self.assertRaises(KeyError):
+            with storage.batch():
+                storage.new(State(name="Batched"))
+                storage.save()
+                thread = Thread(target=save_state)
+                thread.start()
+                thread.join()
+                raise KeyError("abort")
+        self.assertEqual([s.name for s in storage.all(State).values()],
+                         ["Other"])
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_clusters(self):
+        """Test that clusters() groups the rows of the box by cell, across
+        the antimeridian"""
+        storage = models.storage
+        state = State(name="Clusters")
+        city = City(name="Clusters", state_id=state.id)
+        user = User(email="clusters@hbnb.io", password="pwd")
+        for obj in (state, city, user):
+            storage.new(obj)
+        storage.save()
+        places = [(10, 179.5, 100), (10.5, 179.9, 50), (10, -179.5, 30),
+                  (10.2, -179.9, 20), (60, 0, 10)]
+        storage.bulk_new(Place, [{"name": "C{}".format(i), "city_id": city.id,
+                                  "user_id": user.id, "latitude": lat,
+                                  "longitude": lng, "price_by_night": price}
+                                 for i, (lat, lng, price) in
+                                 enumerate(places)])
+        clusters = sorted(storage.clusters(Place, 5, 170, 15, 190, 0),
+                          key=lambda c: c["bbox"])
+        self.assertEqual([(c["bbox"], c["count"], c["min_price"],
+                           c["avg_price"]) for c in clusters],
+                         [([-180, 0, -135, 45], 2, 20, 25),
+                          ([135, 0, 180, 45], 2, 50, 75)])
+        clusters = storage.clusters(Place, 5, 179, 15, 181, 20)
+        self.assertEqual(sorted(c["count"] for c in clusters), [1, 1, 1, 1])
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_on_change(self):
+        """Test that listeners get the committed changes only"""
+        changes = []
+
+        def listener(*change):
+            """records the changes"""
+            changes.append(change)
+        models.storage.on_change(listener)
+        self.addCleanup(models.storage._DBStorage__listeners.remove,
+                        listener)
+        state = State(name="Listened")
+        models.storage.new(state)
+        models.storage.all(State)
+        self.assertEqual(changes, [])
+        models.storage.save()
+        self.assertEqual(changes, [("State", state.id, [])])
+        city = City(name="Listened", state_id=state.id)
+        models.storage.new(city)
+        models.storage.all(City)
+        models.storage.close()
+        models.storage.save()
+        self.assertEqual(len(changes), 1)
+        ids = models.storage.bulk_new(City, [{"name": "Bulk",
+                                              "state_id": state.id}])
+        self.assertEqual(changes[-1], ("City", ids[0],
+                                       [("state_id", state.id)]))
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_versions(self):
+        """Test that the versions are bumped by commits"""
+        versions = models.storage.versions()
+        before = versions.version(("State",))
+        models.storage.new(State(name="Versioned"))
+        models.storage.all(State)
+        self.assertEqual(versions.version(("State",)), before)
+        models.storage.save()
+        self.assertNotEqual(versions.version(("State",)), before)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_bulk_update_versions(self):
+        """Test that bulk_update bumps the collections of the old and the
+        new foreign key values"""
+        states = [State(name="From"), State(name="To")]
+        for state in states:
+            models.storage.new(state)
+        models.storage.save()
+        ids = models.storage.bulk_new(City, [{"name": "Moved",
+                                              "state_id": states[0].id}])
+        versions = models.storage.versions()
+        tags = [("City", "state_id", state.id) for state in states]
+        before = [versions.version(tag) for tag in tags]
+        models.storage.bulk_update(City, [{"id": ids[0],
+                                           "state_id": states[1].id}])
+        for tag, version in zip(tags, before):
+            self.assertNotEqual(versions.version(tag), version)
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_keyset_pages(self):
+        """Test that after() pages in (created_at, id) order in SQL"""
+        start = datetime(2001, 1, 1)
+        times = [start + timedelta(seconds=i // 2) for i in range(6)]
+        ids = models.storage.bulk_new(State, [{"name": "K", "created_at": t}
+                                              for t in times])
+        keys = sorted(zip(times, ids))
+        query = models.storage.query(State).filter(id__in=ids)
+        self.assertEqual([s.id for s in query.after(None).limit(3)],
+                         [id for t, id in keys[:3]])
+        query = models.storage.query(State).filter(id__in=ids)
+        self.assertEqual([s.id for s in query.after(keys[2])],
+                         [id for t, id in keys[3:]])
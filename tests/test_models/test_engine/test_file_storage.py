@@ -3,10 +3,12 @@
 Contains the TestFileStorageDocs classes
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 import inspect
 import models
 from models.engine import file_storage
+from models.engine.codecs import codecs
+from models.engine.compact import CompactModel
 from models.amenity import Amenity
 from models.base_model import BaseModel
 from models.city import City
@@ -17,6 +19,7 @@ from models.user import User
 import json
 import os
 import pep8
+from threading import Thread
 import unittest
 FileStorage = file_storage.FileStorage
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
@@ -113,3 +116,644 @@ class TestFileStorage(unittest.TestCase):
         with open("file.json", "r") as f:
             js = f.read()
         self.assertEqual(json.loads(string), json.loads(js))
+
+
+class TestFileStorageIndexes(unittest.TestCase):
+    """Test the indexes, journal and lazy loading of FileStorage"""
+    state = ["objects", "by_class", "related", "fk_values", "changed",
+             "deleted", "fragments", "pending", "pending_by_class",
+             "sorted", "grids", "pyramids", "listeners"]
+
+    def isolate(self, file_path, **modes):
+        """Swaps the class-level state of FileStorage for an empty one,
+        with file_path as JSON file and the given modes, for the duration
+        of the test"""
+        names = ["_FileStorage__" + name for name in self.state]
+        saved = {name: getattr(FileStorage, name) for name in names}
+        for name in names:
+            setattr(FileStorage, name, type(saved[name])())
+        for name, value in [("file_path", file_path)] + list(modes.items()):
+            saved["_FileStorage__" + name] = getattr(FileStorage,
+                                                     "_FileStorage__" + name)
+            setattr(FileStorage, "_FileStorage__" + name, value)
+
+        def restore():
+            """Restores the saved state and removes the test files"""
+            for name, value in saved.items():
+                setattr(FileStorage, name, value)
+            for name in (file_path, file_path + ".log"):
+                if os.path.exists(name):
+                    os.remove(name)
+        self.addCleanup(restore)
+        return FileStorage()
+
+    def clear(self):
+        """Empties the class-level state of FileStorage, as in a newly
+        started process"""
+        for name in self.state:
+            value = getattr(FileStorage, "_FileStorage__" + name)
+            setattr(FileStorage, "_FileStorage__" + name, type(value)())
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_all_cls_is_class_bucket(self):
+        """Test that all(cls) is a read-only view of the objects of cls"""
+        storage = self.isolate("test_index.json")
+        state = State()
+        city = City()
+        storage.new(state)
+        storage.new(city)
+        key = "State." + state.id
+        states = storage.all(State)
+        self.assertEqual(dict(states), {key: state})
+        self.assertIs(storage.all("State")[key], state)
+        with self.assertRaises(TypeError):
+            states[key] = city
+        storage.delete(state)
+        self.assertNotIn(key, states)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_related_follows_foreign_keys(self):
+        """Test that the reverse indexes follow new, save and delete"""
+        storage = self.isolate("test_index.json")
+        state1 = State()
+        state2 = State()
+        city = City(state_id=state1.id)
+        storage.new(city)
+        self.assertEqual(list(storage.related(City, "state_id",
+                                              state1.id).values()), [city])
+        city.state_id = state2.id
+        storage.save()
+        self.assertEqual(len(storage.related(City, "state_id", state1.id)),
+                         0)
+        self.assertIs(storage.related("City", "state_id",
+                                      state2.id)["City." + city.id], city)
+        storage.delete(city)
+        self.assertEqual(len(storage.related(City, "state_id", state2.id)),
+                         0)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_get_and_count(self):
+        """Test that get looks objects up by key and count by class"""
+        storage = self.isolate("test_index.json")
+        state = State()
+        storage.new(state)
+        storage.new(City())
+        self.assertIs(storage.get(State, state.id), state)
+        self.assertIs(storage.get("State", state.id), state)
+        self.assertIsNone(storage.get(City, state.id))
+        self.assertIsNone(storage.get(State, None))
+        self.assertEqual(storage.count(), 2)
+        self.assertEqual(storage.count("State"), 1)
+        storage.delete(state)
+        self.assertEqual(storage.count(State), 0)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_journal(self):
+        """Test that journaled saves append changes and are replayed"""
+        storage = self.isolate("test_journal.json", journal=True)
+        state = State(name="California")
+        city = City(name="Fremont")
+        storage.new(state)
+        storage.new(city)
+        storage.save()
+        storage.delete(city)
+        state.name = "Nevada"
+        storage.save()
+        self.assertFalse(os.path.exists("test_journal.json"))
+        with open("test_journal.json.log", "r") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[1], {"City." + city.id: None,
+                                    "State." + state.id: state.to_dict()})
+        self.clear()
+        storage.reload()
+        self.assertEqual(list(storage.all()), ["State." + state.id])
+        self.assertEqual(storage.all()["State." + state.id].name, "Nevada")
+        storage.compact(wait=True)
+        self.assertFalse(os.path.exists("test_journal.json.log"))
+        with open("test_journal.json", "r") as f:
+            self.assertEqual(json.load(f),
+                             {"State." + state.id: state.to_dict()})
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_save_reuses_clean_records(self):
+        """Test that save only re-encodes objects changed since last save"""
+        storage = self.isolate("test_index.json")
+        states = [State(name="State{}".format(i)) for i in range(3)]
+        for state in states:
+            storage.new(state)
+        storage.save()
+        before = storage.stats()
+        states[1].name = "Changed"
+        storage.save()
+        after = storage.stats()
+        self.assertEqual(after["records_encoded"] -
+                         before["records_encoded"], 1)
+        self.assertEqual(after["records_reused"] -
+                         before["records_reused"], 2)
+        with open("test_index.json", "r") as f:
+            js = json.load(f)
+        self.assertEqual(js["State." + states[1].id]["name"], "Changed")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_close_only_reloads_changes(self):
+        """Test that close skips an unchanged file and only re-creates the
+        objects another writer changed"""
+        storage = self.isolate("test_close.json")
+        state1 = State(name="California")
+        state2 = State(name="Nevada")
+        storage.new(state1)
+        storage.new(state2)
+        storage.save()
+        storage.close()
+        self.assertIs(storage.all()["State." + state1.id], state1)
+        with open("test_close.json", "r") as f:
+            records = json.load(f)
+        del records["State." + state2.id]
+        records["State." + state1.id]["name"] = "Oregon"
+        records["State." + state1.id]["updated_at"] = \
+            "2030-01-01T00:00:00.000001"
+        with open("test_close.json", "w") as f:
+            json.dump(records, f)
+        storage.close()
+        self.assertEqual(list(storage.all()), ["State." + state1.id])
+        self.assertEqual(storage.get(State, state1.id).name, "Oregon")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_lazy_reload(self):
+        """Test that lazy reload only creates objects on first use"""
+        storage = self.isolate("test_lazy.json", lazy=True)
+        state = State(name="California")
+        city = City(name="Fremont", state_id=state.id)
+        storage.new(state)
+        storage.new(city)
+        storage.save()
+        self.clear()
+        storage.reload()
+        self.assertEqual(storage._FileStorage__objects, {})
+        self.assertEqual(storage.count(State), 1)
+        self.assertEqual(storage.get(State, state.id).name, "California")
+        self.assertEqual(list(storage._FileStorage__objects),
+                         ["State." + state.id])
+        cities = storage.related(City, "state_id", state.id)
+        self.assertEqual(cities["City." + city.id].name, "Fremont")
+        storage.save()
+        with open("test_lazy.json", "r") as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_lazy_reload_other_layout(self):
+        """Test that lazy reload loads a JSON file written in another
+        layout eagerly instead of as an empty store"""
+        storage = self.isolate("test_lazy.json", lazy=True)
+        states = [State(name="S{}".format(i)) for i in range(2)]
+        with open("test_lazy.json", "w") as f:
+            json.dump({"State." + state.id: state.to_dict()
+                       for state in states}, f, indent=4)
+        storage.reload()
+        self.assertEqual(storage.count(State), 2)
+        self.assertEqual(storage.get(State, states[1].id).name, "S1")
+        storage.save()
+        with open("test_lazy.json", "r") as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_binary_codec(self):
+        """Test that objects survive a save and reload in binary"""
+        storage = self.isolate("test_binary.hbnb", codec=codecs["binary"])
+        state = State(name="California")
+        storage.new(state)
+        storage.save()
+        with open("test_binary.hbnb", "rb") as f:
+            self.assertEqual(f.read(4), b"HBNB")
+        self.clear()
+        storage.reload()
+        reloaded = storage.get(State, state.id)
+        self.assertEqual(reloaded.to_dict(), state.to_dict())
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_batch(self):
+        """Test that a batch saves once on exit, or rolls back"""
+        storage = self.isolate("test_batch.json")
+        with storage.batch():
+            states = [State(name="State {}".format(i)) for i in range(3)]
+            for state in states:
+                state.save()
+            self.assertFalse(os.path.exists("test_batch.json"))
+        with open("test_batch.json") as f:
+            self.assertEqual(len(json.load(f)), 3)
+        with self.assertRaises(KeyError):
+            with storage.batch():
+                states[0].name = "Renamed"
+                states[0].save()
+                storage.delete(states[1])
+                City(name="Fremont", state_id=states[0].id).save()
+                raise KeyError("abort")
+        self.assertEqual(states[0].name, "State 0")
+        self.assertIs(storage.get(State, states[1].id), states[1])
+        self.assertEqual(storage.count(), 3)
+        self.assertEqual(len(storage.related(City, "state_id",
+                                             states[0].id)), 0)
+        with open("test_batch.json") as f:
+            self.assertEqual(json.load(f)["State." + states[0].id]["name"],
+                             "State 0")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_batch_threads(self):
+        """Test that a batch only defers and rolls back the changes of its
+        own thread"""
+        storage = self.isolate("test_batch_threads.json")
+        kept = State(name="Kept")
+        storage.new(kept)
+        storage.save()
+
+        def save_state():
+            """stores a state from another thread"""
+            State(name="Other").save()
+        with self.assertRaises(KeyError):
+            with storage.batch():
+                kept.name = "Renamed"
+                kept.save()
+                State(name="Batched").save()
+                thread = Thread(target=save_state)
+                thread.start()
+                thread.join()
+                with open("test_batch_threads.json") as f:
+                    self.assertEqual(len(json.load(f)), 3)
+                raise KeyError("abort")
+        self.assertEqual(sorted(s.name for s in storage.all(State).values()),
+                         ["Kept", "Other"])
+        with open("test_batch_threads.json") as f:
+            self.assertEqual(sorted(record["name"] for record in
+                                    json.load(f).values()),
+                             ["Kept", "Other"])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_bulk_new_and_update(self):
+        """Test that bulk_new and bulk_update store objects in one write"""
+        storage = self.isolate("test_bulk.json")
+        ids = storage.bulk_new(City, [{"name": "City {}".format(i),
+                                       "state_id": "s1"} for i in range(5)])
+        self.assertEqual(storage.count(City), 5)
+        city = storage.get(City, ids[0])
+        self.assertIsInstance(city.created_at, datetime)
+        self.assertEqual(len(storage.related(City, "state_id", "s1")), 5)
+        updated = storage.bulk_update(City, [{"id": ids[0], "state_id": "s2"},
+                                             {"id": "missing", "name": ""}])
+        self.assertEqual(updated, 1)
+        self.assertGreater(city.updated_at, city.created_at)
+        self.assertEqual(list(storage.related(City, "state_id", "s2")),
+                         ["City." + ids[0]])
+        with open("test_bulk.json") as f:
+            records = json.load(f)
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records["City." + ids[0]]["state_id"], "s2")
+        self.assertRaises(ValueError, storage.bulk_update, City,
+                          [{"name": "no id"}])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_iter(self):
+        """Test that iter yields the objects of a class, one at a time in
+        lazy mode"""
+        storage = self.isolate("test_iter.json", lazy=True)
+        ids = storage.bulk_new(State, [{"name": "S"}] * 3)
+        storage.bulk_new(User, [{"email": "e", "password": "p"}])
+        self.assertEqual(sorted(state.id for state in storage.iter(State)),
+                         sorted(ids))
+        self.clear()
+        storage.reload()
+        states = storage.iter("State", batch_size=1)
+        self.assertIsInstance(next(states), State)
+        self.assertEqual(len(storage._FileStorage__objects), 1)
+        self.assertEqual(len(list(states)), 2)
+        self.assertEqual(len(list(storage.iter())), 4)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query(self):
+        """Test that query filters, sorts and pages, intersecting the
+        reverse indexes and the sorted indexes"""
+        storage = self.isolate("test_query.json")
+        storage.bulk_new(Place, [{"name": "P{:02d}".format(i),
+                                  "city_id": "c{}".format(i % 3),
+                                  "user_id": "u", "price_by_night": i * 10}
+                                 for i in range(20)])
+        query = storage.query(Place).filter(city_id="c1",
+                                            price_by_night__lt=100)
+        candidates, conditions = query._candidates()
+        self.assertEqual(len(candidates), 3)
+        self.assertEqual(conditions, [])
+        self.assertEqual([p.name for p in query.order_by("-price_by_night")],
+                         ["P07", "P04", "P01"])
+        self.assertEqual([p.name for p in storage.query("Place").order_by(
+            "-price_by_night").limit(3).offset(2)], ["P17", "P16", "P15"])
+        self.assertEqual(storage.query(Place).filter(
+            price_by_night__gte=150).count(), 5)
+        self.assertEqual(storage.query(Place).filter(
+            name__in=["P01", "P05"], city_id__ne="c1").first().name, "P05")
+        self.assertIsNone(storage.query(Place).filter(name="none").first())
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query_subquery(self):
+        """Test that a query as the value of an in condition stands for
+        the ids of its objects, and that filter_any() ORs conditions"""
+        storage = self.isolate("test_subquery.json")
+        storage.bulk_new(City, [{"id": "c{}".format(i),
+                                 "state_id": "s{}".format(i)}
+                                for i in range(3)])
+        storage.bulk_new(Place, [{"name": "P{}".format(i),
+                                  "city_id": "c{}".format(i)}
+                                 for i in range(3)])
+        cities = storage.query(City).filter_any(id__in=["c0"],
+                                                state_id__in=["s2"])
+        self.assertEqual(sorted(p.name for p in storage.query(Place).filter(
+            city_id__in=cities)), ["P0", "P2"])
+        self.assertEqual(storage.query(Place).filter_any(
+            name="P1", city_id="c2").order_by("name").all()[1].name, "P2")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query_plan_any(self):
+        """Test that the conditions of filter_any() start from the union
+        of the indexes of each of them"""
+        storage = self.isolate("test_query_any.json")
+        storage.bulk_new(City, [{"id": "c{:03d}".format(i),
+                                 "state_id": "s{}".format(i % 100)}
+                                for i in range(1000)])
+        query = storage.query(City).filter_any(id__in=["c001", "c002"],
+                                               state_id__in=["s5"])
+        candidates, conditions = query._candidates()
+        self.assertEqual(len(candidates), 12)
+        self.assertEqual(conditions, [])
+        self.assertEqual(len(query.all()), 12)
+        query = storage.query(City).filter_any(id="c001", name="none")
+        candidates, conditions = query._candidates()
+        self.assertEqual(len(candidates), 1000)
+        self.assertEqual(len(query.all()), 1)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query_order_missing(self):
+        """Test that objects without a value sort last in either order,
+        with or without a limit"""
+        storage = self.isolate("test_order.json")
+        storage.bulk_new(State, [{"name": "S{}".format(i), "rank": i}
+                                 for i in range(3)])
+        storage.new(State(name="Unranked"))
+        query = storage.query(State)
+        self.assertEqual([s.name for s in query.order_by("rank")],
+                         ["S0", "S1", "S2", "Unranked"])
+        self.assertEqual([s.name for s in query.order_by("-rank")],
+                         ["S2", "S1", "S0", "Unranked"])
+        self.assertEqual([s.name for s in query.order_by("rank").limit(2)
+                          .offset(2)], ["S2", "Unranked"])
+        self.assertEqual([s.name for s in query.order_by("-rank").limit(2)
+                          .offset(2)], ["S0", "Unranked"])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query_plan(self):
+        """Test that query starts from the smallest of the reverse, amenity
+        and sorted indexes, intersecting it with the other small ones"""
+        storage = self.isolate("test_query_plan.json")
+        storage.bulk_new(Place, [{"name": "P{:02d}".format(i),
+                                  "city_id": "c{}".format(i % 2),
+                                  "price_by_night": i,
+                                  "amenity_ids": ["a0"] + (
+                                      ["a1"] if i % 10 == 0 else [])}
+                                 for i in range(100)])
+        query = storage.query(Place).filter(city_id="c0",
+                                            amenity_ids__all=["a0", "a1"],
+                                            price_by_night__lt=30)
+        candidates, conditions = query._candidates()
+        self.assertEqual(sorted(p.name for p in candidates),
+                         ["P00", "P10", "P20"])
+        self.assertEqual(conditions, [("city_id", "eq", "c0")])
+        self.assertEqual(len(query.all()), 3)
+        query = storage.query(Place).filter(price_by_night__gt=95,
+                                            price_by_night__lte=97)
+        self.assertEqual([p.name for p in query.order_by("name")],
+                         ["P96", "P97"])
+        place = storage.get(Place, query.first().id)
+        place.price_by_night = 5
+        place.amenity_ids = ["a2"]
+        storage.new(place)
+        self.assertEqual(query.count(), 1)
+        self.assertEqual(storage.query(Place).filter(
+            amenity_ids="a2").first(), place)
+        self.assertEqual(storage.query(Place).filter(
+            amenity_ids__all=["a0", "a2"]).count(), 0)
+        self.assertEqual(storage.query(Place).filter(
+            price_by_night__lte=5).count(), 7)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_reindex_on_save(self):
+        """Test that save() moves objects whose attributes were set after
+        they were stored to their new values in the sorted, spatial and
+        cluster indexes"""
+        for compact in (False, True):
+            storage = self.isolate("test_reindex.json", compact=compact)
+            place = Place(name="P", latitude=48.8, longitude=2.3)
+            place.price_by_night = 10
+            place.save()
+            place = storage.get(Place, place.id)
+            self.assertEqual(storage.query(Place).filter(
+                price_by_night__lt=50).count(), 1)
+            self.assertEqual(len(storage.near(Place, 48.8, 2.3, 1)), 1)
+            self.assertEqual([c["min_price"] for c in storage.clusters(
+                Place, 48, 2, 49, 3, 4)], [10])
+            place.price_by_night = 100
+            place.latitude = 10.0
+            storage.save()
+            self.assertEqual(storage.query(Place).filter(
+                price_by_night__gte=50).all(), [place])
+            self.assertEqual(storage.query(Place).filter(
+                price_by_night__lt=50).all(), [])
+            self.assertEqual(storage.near(Place, 48.8, 2.3, 1), [])
+            self.assertEqual([c["min_price"] for c in storage.clusters(
+                Place, 0, 0, 20, 20, 4)], [100])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_links(self):
+        """Test that link() and unlink() keep the amenity ids of places and
+        the places of amenities in step, and that deleting an amenity
+        unlinks it"""
+        storage = self.isolate("test_links.json")
+        place, other = Place(name="P"), Place(name="O")
+        wifi, pool = Amenity(name="Wifi"), Amenity(name="Pool")
+        for obj in (place, other, wifi, pool):
+            storage.new(obj)
+        self.assertEqual(storage.link(place, [wifi, pool, wifi]), 2)
+        self.assertEqual(storage.link(place, [wifi]), 0)
+        self.assertEqual(storage.link(other, [pool]), 1)
+        self.assertEqual(Place.amenity_ids, [])
+        self.assertEqual(place.amenity_ids, [wifi.id, pool.id])
+        self.assertEqual(sorted(p.name for p in pool.place_amenities),
+                         ["O", "P"])
+        self.assertEqual(storage.unlink(place, [pool]), 1)
+        self.assertEqual(storage.unlink(place, [pool]), 0)
+        self.assertEqual([p.name for p in pool.place_amenities], ["O"])
+        self.assertEqual([a.name for a in place.amenities], ["Wifi"])
+        storage.delete(wifi)
+        self.assertEqual(place.amenity_ids, [])
+        self.assertEqual(len(storage.related(Place, "amenity_ids",
+                                             wifi.id)), 0)
+        with self.assertRaises(ValueError):
+            storage.link(place, [other])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_near(self):
+        """Test that near() and within() read the spatial index, kept up
+        to date as places are stored, moved and deleted"""
+        storage = self.isolate("test_near.json")
+        storage.bulk_new(Place, [{"name": "P{}".format(i),
+                                  "latitude": 48.8 + i / 100,
+                                  "longitude": 2.3} for i in range(10)])
+        near = storage.near(Place, 48.8, 2.3, 4)
+        self.assertEqual([p.name for d, p in near], ["P0", "P1", "P2", "P3"])
+        self.assertAlmostEqual(near[1][0], 1.112, places=3)
+        moved = near[0][1]
+        moved.latitude = 48.9
+        storage.new(moved)
+        storage.delete(near[1][1])
+        storage.new(Place(name="New", latitude=48.8, longitude=2.3))
+        self.assertEqual([p.name for d, p in storage.near(Place, 48.8, 2.3,
+                                                          5, limit=3)],
+                         ["New", "P2", "P3"])
+        self.assertEqual([p.name for d, p in storage.within(
+            Place, 48.875, 2.2, 48.9, 2.4)], ["P9", "P8", "P0"])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_near_without_position(self):
+        """Test that places without coordinates, which only have the 0.0
+        defaults of the class, are not located at (0, 0)"""
+        for compact in (False, True):
+            storage = self.isolate("test_unlocated.json", compact=compact)
+            storage.new(Place(name="Nowhere"))
+            storage.new(Place(name="Origin", latitude=0.0, longitude=0.0))
+            self.assertEqual([p.name for d, p in storage.near(Place, 0, 0,
+                                                              1)],
+                             ["Origin"])
+            self.assertEqual([c["count"] for c in storage.clusters(
+                Place, -90, -180, 90, 180, 0)], [1])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_clusters(self):
+        """Test that clusters() reads the aggregates kept up to date as
+        places are stored, moved, repriced and deleted"""
+        storage = self.isolate("test_clusters.json")
+        storage.bulk_new(Place, [{"name": "P{}".format(i),
+                                  "latitude": 48.8 + i / 100,
+                                  "longitude": 2.3,
+                                  "price_by_night": 10 * (i + 1)}
+                                 for i in range(4)])
+        clusters = storage.clusters(Place, 48, 2, 49, 3, 4)
+        self.assertEqual([(c["count"], c["min_price"], c["avg_price"])
+                          for c in clusters], [(4, 10, 25)])
+        self.assertAlmostEqual(clusters[0]["latitude"], 48.815)
+        first = storage.all(Place)["Place." + storage.query(Place).filter(
+            name="P0").first().id]
+        first.price_by_night = 50
+        storage.new(first)
+        storage.delete(storage.query(Place).filter(name="P1").first())
+        moved = storage.query(Place).filter(name="P2").first()
+        moved.longitude = -70
+        storage.new(moved)
+        self.assertEqual([(c["count"], c["min_price"], c["avg_price"])
+                          for c in storage.clusters(Place, 48, 2, 49, 3, 4)],
+                         [(2, 40, 45)])
+        self.assertEqual(len(storage.clusters(Place, -90, -180, 90, 180,
+                                              0)), 2)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_keyset_pages(self):
+        """Test that after() pages in (created_at, id) order, reading the
+        index of created_at kept sorted as objects are stored and deleted"""
+        storage = self.isolate("test_keyset.json")
+        start = datetime(2020, 1, 1, 0, 0, 0, 1)
+        storage.bulk_new(City, [{"id": "c{:02d}".format(i),
+                                 "state_id": "s{}".format(i % 2),
+                                 "created_at": (start + timedelta(
+                                     seconds=i // 2)).isoformat()}
+                                for i in range(10)])
+        ids = [c.id for c in storage.query(City).after(None).limit(4)]
+        self.assertEqual(ids, ["c00", "c01", "c02", "c03"])
+        last = storage.get(City, "c03")
+        ids = [c.id for c in storage.query(City).after(
+            (last.created_at, last.id)).limit(3)]
+        self.assertEqual(ids, ["c04", "c05", "c06"])
+        storage.delete(storage.get(City, "c04"))
+        storage.new(City(id="c00b", created_at=start.isoformat()))
+        ids = [c.id for c in storage.query(City).after(
+            (start, "c00")).limit(3)]
+        self.assertEqual(ids, ["c00b", "c01", "c02"])
+        self.assertEqual([c.id for c in storage.query(City).after(
+            (last.created_at, last.id))], ["c05", "c06", "c07", "c08", "c09"])
+        ids = [c.id for c in storage.query(City).filter(
+            state_id="s1").after((last.created_at, last.id)).limit(2)]
+        self.assertEqual(ids, ["c05", "c07"])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_on_change(self):
+        """Test that listeners get the objects stored and deleted, with
+        their foreign key values before and after the change"""
+        storage = self.isolate("test_on_change.json")
+        changes = []
+        storage.on_change(lambda *change: changes.append(change))
+        city = City(state_id="s1")
+        storage.new(city)
+        self.assertEqual(changes, [("City", city.id, [("state_id", "s1")])])
+        city.state_id = "s2"
+        storage.new(city)
+        self.assertEqual(changes[-1], ("City", city.id, [("state_id", "s2"),
+                                                         ("state_id", "s1")]))
+        storage.delete(city)
+        self.assertEqual(changes[-1], ("City", city.id, [("state_id", "s2")]))
+        del changes[:]
+        storage.bulk_update(City, [{"id": city.id}])
+        self.assertEqual(changes, [])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_versions(self):
+        """Test that storing a city bumps the versions of the cities and of
+        the cities of its state"""
+        storage = self.isolate("test_versions.json")
+        versions = storage.versions()
+        cities = versions.version(("City",))
+        state = versions.version(("City", "state_id", "s1"))
+        other = versions.version(("City", "state_id", "s2"))
+        storage.new(City(state_id="s1"))
+        self.assertNotEqual(versions.version(("City",)), cities)
+        self.assertNotEqual(versions.version(("City", "state_id", "s1")),
+                            state)
+        self.assertEqual(versions.version(("City", "state_id", "s2")), other)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_compact_mode(self):
+        """Test that compact objects behave as the models they hold"""
+        storage = self.isolate("test_compact.json", compact=True)
+        state = State(name="California")
+        city = City(name="Fremont", state_id=state.id)
+        storage.new(state)
+        storage.new(city)
+        storage.save()
+        self.clear()
+        storage.reload()
+        stored = storage.get(City, city.id)
+        self.assertIsInstance(stored, City)
+        self.assertIsInstance(stored, CompactModel)
+        self.assertEqual(stored.__class__.__name__, "City")
+        self.assertEqual(stored.to_dict(), city.to_dict())
+        self.assertEqual(stored.created_at, city.created_at)
+        self.assertIn("({})".format(city.id), str(stored))
+        self.assertIs(stored.state_id, storage.get(State, state.id).id)
+        self.assertEqual(list(storage.get(State, state.id).cities),
+                         [stored])
+        stored.name = "Oakland"
+        stored.rooftop = True
+        storage.save()
+        self.clear()
+        storage.reload()
+        stored = storage.get(City, city.id)
+        self.assertEqual(stored.name, "Oakland")
+        self.assertTrue(stored.rooftop)
+        city.name = "Berkeley"
+        storage.new(city)
+        self.assertIs(storage.get(City, city.id), stored)
+        self.assertEqual(stored.name, "Berkeley")
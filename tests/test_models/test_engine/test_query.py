@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+"""
+Contains the TestQueryDocs class
+"""
+
+import inspect
+from models.engine import query
+import pep8
+import unittest
+
+
+class TestQueryDocs(unittest.TestCase):
+    """Tests to check the documentation and style of the query builders"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.query_f = []
+        for builder in (query.Query, query.FileQuery, query.DBQuery,
+                        query.SortedIndex):
+            cls.query_f += inspect.getmembers(builder, inspect.isfunction)
+
+    def test_pep8_conformance_query(self):
+        """Test that models/engine/query.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/query.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_query(self):
+        """Test tests/test_models/test_engine/test_query.py conforms to
+        PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_models/test_engine/\
+test_query.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_query_module_docstring(self):
+        """Test for the query.py module docstring"""
+        self.assertIsNot(query.__doc__, None,
+                         "query.py needs a docstring")
+        self.assertTrue(len(query.__doc__) >= 1,
+                        "query.py needs a docstring")
+
+    def test_query_func_docstrings(self):
+        """Test for the presence of docstrings in query methods"""
+        for func in self.query_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+    def test_unknown_comparison(self):
+        """Test that filter rejects unknown comparisons"""
+        self.assertRaises(ValueError, query.Query(object).filter,
+                          name__like="a%")
@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+"""
+Contains the TestSpatialDocs, TestGridIndex and TestClusterPyramid
+classes
+"""
+
+import inspect
+from math import asin, cos, radians, sin, sqrt
+from models.engine import spatial
+import pep8
+import random
+import unittest
+
+
+class Point:
+    """object located by a latitude and a longitude"""
+    def __init__(self, id, latitude, longitude):
+        """Instantiate the point id at (latitude, longitude)"""
+        self.id = id
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+def distance(a, b):
+    """returns the haversine distance in km between points a and b"""
+    lat1, lng1, lat2, lng2 = map(radians, (a.latitude, a.longitude,
+                                           b.latitude, b.longitude))
+    hav = sin((lat2 - lat1) / 2) ** 2 + \
+        cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 2 * spatial.earth_radius_km * asin(sqrt(hav))
+
+
+class TestSpatialDocs(unittest.TestCase):
+    """Tests to check the documentation and style of the spatial index"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.spatial_f = inspect.getmembers(spatial, inspect.isfunction)
+        for index in (spatial.Cell, spatial.GridIndex,
+                      spatial.ClusterPyramid):
+            cls.spatial_f += inspect.getmembers(index, inspect.isfunction)
+
+    def test_pep8_conformance_spatial(self):
+        """Test that models/engine/spatial.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/spatial.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_spatial(self):
+        """Test tests/test_models/test_engine/test_spatial.py conforms to
+        PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_models/test_engine/\
+test_spatial.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_spatial_module_docstring(self):
+        """Test for the spatial.py module docstring"""
+        self.assertIsNot(spatial.__doc__, None,
+                         "spatial.py needs a docstring")
+        self.assertTrue(len(spatial.__doc__) >= 1,
+                        "spatial.py needs a docstring")
+
+    def test_spatial_func_docstrings(self):
+        """Test for the presence of docstrings in spatial functions"""
+        for func in self.spatial_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+
+class TestGridIndex(unittest.TestCase):
+    """Test the grid index against distances computed one by one"""
+    def setUp(self):
+        """Index points spread over the earth, around Paris and across
+        the antimeridian"""
+        rand = random.Random(24)
+        self.points = []
+        for i in range(1500):
+            if i < 500:
+                lat, lng = rand.uniform(48, 49.5), rand.uniform(1.5, 3)
+            elif i < 600:
+                lat, lng = rand.uniform(-5, 5), rand.uniform(179.8, 180)
+            else:
+                lat, lng = rand.uniform(-90, 90), rand.uniform(-180, 180)
+            self.points.append(Point(str(i), lat, lng))
+        self.grid = spatial.GridIndex(objs=self.points)
+
+    def expected(self, center, radius_km):
+        """returns the ids of the points within radius_km of center,
+        nearest first"""
+        pairs = [(distance(center, p), p.id) for p in self.points]
+        return [id for d, id in sorted(pairs) if d <= radius_km]
+
+    def test_near(self):
+        """Test that near() finds the points within the radius, nearest
+        first, across the antimeridian and around the poles"""
+        for lat, lng, radius_km in [(48.85, 2.35, 20), (0, -180, 60),
+                                    (89, 0, 800), (-30, 100, 5000)]:
+            center = Point("c", lat, lng)
+            found = [id for d, id in self.grid.near(lat, lng, radius_km)]
+            self.assertEqual(found, self.expected(center, radius_km))
+        self.assertEqual(len(self.grid.near(48.85, 2.35, 50, limit=5)), 5)
+
+    def test_within(self):
+        """Test that within() finds the points in the box, across the
+        antimeridian when east is past 180"""
+        found = {id for d, id in self.grid.within(-5, 179.9, 5, 180.1)}
+        self.assertEqual(found, {p.id for p in self.points
+                                 if -5 <= p.latitude <= 5 and
+                                 (p.longitude >= 179.9 or
+                                  p.longitude <= -179.9)})
+        pairs = self.grid.within(48, 1.5, 49.5, 3)
+        self.assertGreaterEqual(len(pairs), 500)
+        self.assertEqual(pairs, sorted(pairs))
+
+    def test_moves(self):
+        """Test that add() moves a point and discard() removes it"""
+        point = self.points[0]
+        point.latitude, point.longitude = -33.86, 151.2
+        self.grid.add(point)
+        self.assertEqual(self.grid.near(-33.86, 151.2, 1)[0][1], point.id)
+        self.assertNotIn(point.id, [id for d, id in
+                                    self.grid.near(48.85, 2.35, 200)])
+        for p in self.points[1:500]:
+            self.grid.discard(p.id)
+        self.assertEqual(self.grid.within(48, 1.5, 49.5, 3), [])
+        self.assertEqual(len(self.grid), 1001)
+        point.latitude = None
+        self.grid.add(point)
+        self.assertEqual(len(self.grid), 1000)
+
+
+class TestClusterPyramid(unittest.TestCase):
+    """Test the cluster aggregates against aggregates computed from all
+    the points"""
+    def setUp(self):
+        """Aggregate priced points spread over the earth and around
+        Paris, some of them without a price"""
+        rand = random.Random(25)
+        self.points = []
+        for i in range(1000):
+            if i < 400:
+                lat, lng = rand.gauss(48.85, 0.3), rand.gauss(2.35, 0.3)
+            else:
+                lat, lng = rand.uniform(-90, 90), rand.uniform(-180, 180)
+            point = Point(str(i), lat, lng)
+            point.price_by_night = rand.randint(10, 300) if i % 7 else None
+            self.points.append(point)
+        self.pyramid = spatial.ClusterPyramid(objs=self.points)
+
+    def expected(self, zoom):
+        """returns the (bbox, count, min price, average price) of the
+        cells of zoom holding points, computed from all the points"""
+        size = spatial.cluster_degrees(spatial.cluster_level(zoom))
+        cells = {}
+        for p in self.points:
+            key = spatial.cell_of(size, p.latitude, p.longitude)
+            cells.setdefault(key, []).append(p.price_by_night)
+        found = []
+        for key, prices in cells.items():
+            bbox = spatial.cluster(spatial.cluster_level(zoom), key,
+                                   [1, 0, 0, 0, 0, None])["bbox"]
+            prices = [price for price in prices if price is not None]
+            found.append((bbox, len(cells[key]),
+                          min(prices) if prices else None,
+                          round(sum(prices) / len(prices), 2)
+                          if prices else None))
+        return sorted(found)
+
+    def found(self, zoom):
+        """returns the (bbox, count, min price, average price) of the
+        clusters of zoom over the whole earth"""
+        return sorted((c["bbox"], c["count"], c["min_price"], c["avg_price"])
+                      for c in self.pyramid.clusters(-90, -180, 90, 180,
+                                                     zoom))
+
+    def test_clusters(self):
+        """Test that each level sums the points of its cells, and that
+        zooms past cluster_zoom read the finest level"""
+        for zoom in (0, 3, 8, spatial.cluster_zoom + 4):
+            self.assertEqual(self.found(zoom), self.expected(zoom))
+        clusters = self.pyramid.clusters(48, 2, 49.5, 3, 0)
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]["bbox"], [0, 45, 45, 90])
+        self.assertEqual(clusters[0]["count"], len(
+            [p for p in self.points
+             if 45 <= p.latitude and 0 <= p.longitude < 45]))
+
+    def test_changes(self):
+        """Test that add() moves and reprices a point and discard()
+        removes it, the minimum price following"""
+        for point in self.points[:200]:
+            self.pyramid.discard(point.id)
+        del self.points[:200]
+        for point in self.points[:100]:
+            point.latitude, point.longitude = -33.86, 151.2
+            point.price_by_night = 5 if point.price_by_night else None
+            self.pyramid.add(point)
+        for zoom in (0, 5, spatial.cluster_zoom):
+            self.assertEqual(self.found(zoom), self.expected(zoom))
+        self.points[-1].latitude = None
+        self.pyramid.add(self.points.pop())
+        self.assertEqual(self.found(2), self.expected(2))
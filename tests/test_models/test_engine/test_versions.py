@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+"""
+Contains the TestVersionsDocs and TestVersions classes
+"""
+
+import inspect
+from models.engine import versions
+import pep8
+import unittest
+from unittest import mock
+
+
+class TestVersionsDocs(unittest.TestCase):
+    """Tests to check the documentation and style of the versions"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.versions_f = inspect.getmembers(versions.Versions,
+                                            inspect.isfunction)
+
+    def test_pep8_conformance_versions(self):
+        """Test that models/engine/versions.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/versions.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_versions(self):
+        """Test tests/test_models/test_engine/test_versions.py conforms to
+        PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_models/test_engine/\
+test_versions.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_versions_module_docstring(self):
+        """Test for the versions.py module docstring"""
+        self.assertIsNot(versions.__doc__, None,
+                         "versions.py needs a docstring")
+        self.assertTrue(len(versions.__doc__) >= 1,
+                        "versions.py needs a docstring")
+
+    def test_versions_func_docstrings(self):
+        """Test for the presence of docstrings in Versions methods"""
+        for func in self.versions_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+
+class TestVersions(unittest.TestCase):
+    """Test the version numbers of collections"""
+    def test_changed(self):
+        """Test that a change bumps its class and its parents only"""
+        tracked = versions.Versions()
+        before = tracked.version(("City",))
+        tracked.changed("City", "c1", [("state_id", "s1"),
+                                       ("state_id", "s2")])
+        self.assertNotEqual(tracked.version(("City",)), before)
+        state = tracked.version(("City", "state_id", "s1"))
+        self.assertEqual(state, tracked.version(("City", "state_id", "s2")))
+        tracked.changed("City", "c2", [("state_id", "s2")])
+        self.assertEqual(tracked.version(("City", "state_id", "s1")), state)
+        self.assertEqual(tracked.version(("City", "state_id", "s1"),
+                                         ("City", "state_id", "s2")),
+                         tracked.version(("City",)))
+        self.assertEqual(tracked.modified(("State",)), tracked.started)
+        self.assertGreaterEqual(tracked.modified(("City",)),
+                                tracked.started)
+        tracked.reset()
+        self.assertNotEqual(tracked.version(("City",)), state)
+
+    def test_bounded(self):
+        """Test that only the max_tags most recently changed tags are kept,
+        and that a dropped tag does not go back to an older version"""
+        tracked = versions.Versions()
+        with mock.patch.object(versions, "max_tags", 3):
+            tracked.changed("City", "c1", [("state_id", "s1")])
+            state = tracked.version(("City", "state_id", "s1"))
+            modified = tracked.modified(("City", "state_id", "s1"))
+            for i in range(2, 5):
+                tracked.changed("City", "c" + str(i),
+                                [("state_id", "s" + str(i))])
+        self.assertEqual(len(tracked.changes), 3)
+        self.assertNotIn(("City", "state_id", "s1"), tracked.changes)
+        dropped = tracked.version(("City", "state_id", "s1"))
+        self.assertGreater(int(dropped.split("-")[1]),
+                           int(state.split("-")[1]))
+        self.assertGreaterEqual(tracked.modified(("City", "state_id",
+                                                  "s1")), modified)
+        self.assertEqual(tracked.version(("City", "state_id", "s4")),
+                         tracked.version(("City",)))
+        self.assertEqual(tracked.version(("State",)), dropped)